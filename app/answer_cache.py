@@ -0,0 +1,232 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from bin.config import AnswerCacheConfig
+from .manifest import content_hash, point_id
+
+# SQLite erlaubt nur eine begrenzte Anzahl an Parametern pro Statement
+_SQL_CHUNK = 500
+
+# metadata["source"] der Dokumente -> kind für point_id
+_SOURCE_KIND = {"incident": "incidents", "kb": "kb"}
+
+
+def _doc_key(doc: Document) -> tuple[str, str]:
+    """
+    (Point-ID, Content-Hash) eines abgerufenen Dokuments. Die von den Vectorstores
+    ergänzten Felder (_id, _collection_name) zählen nicht zum Inhalt.
+    """
+    meta = {k: v for k, v in (doc.metadata or {}).items() if not k.startswith("_")}
+    clean = Document(page_content=doc.page_content, metadata=meta)
+    pid = (doc.metadata or {}).get("_id") or point_id(_SOURCE_KIND.get(meta.get("source"), "kb"), clean)
+    return str(pid), content_hash(clean)
+
+
+def doc_signature(docs: Sequence[Document]) -> tuple[str, List[str]]:
+    """
+    Signatur über die Menge der abgerufenen Dokumente inkl. Content-Hashes
+    (unabhängig von der Reihenfolge) und die zugehörigen Point-IDs.
+    """
+    keys = sorted({_doc_key(d) for d in docs})
+    h = hashlib.sha256()
+    for pid, digest in keys:
+        h.update(f"{pid}:{digest}\n".encode("utf-8"))
+    return h.hexdigest(), [pid for pid, _ in keys]
+
+
+class AnswerCache:
+    """
+    Semantischer Antwort-Cache vor dem LLM.
+
+    Ein Treffer braucht dasselbe Modell, dieselben abgerufenen Dokumente (Point-IDs und
+    Content-Hashes) und eine Query, deren normalisiertes Embedding mindestens
+    threshold Cosine-Similarity zu einer gespeicherten Query hat. Einträge verfallen
+    nach ttl_s, bei Überschreiten von max_entries werden die am längsten nicht
+    genutzten verdrängt (LRU). invalidate() entfernt alle Antworten, die ein
+    geändertes oder gelöschtes Dokument zitieren.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        threshold: float = 0.95,
+        ttl_s: float = 86400.0,
+        max_entries: int = 5000,
+    ):
+        if max_entries <= 0:
+            raise ValueError("max_entries muss > 0 sein")
+
+        self.path = path
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                model TEXT NOT NULL,
+                doc_signature TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_answers_lookup ON answers(model, doc_signature);
+            CREATE INDEX IF NOT EXISTS idx_answers_last_access ON answers(last_access);
+            CREATE TABLE IF NOT EXISTS answer_docs (
+                answer_id INTEGER NOT NULL REFERENCES answers(id) ON DELETE CASCADE,
+                point_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_answer_docs_point ON answer_docs(point_id);
+            CREATE INDEX IF NOT EXISTS idx_answer_docs_answer ON answer_docs(answer_id);
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        arr = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(arr)
+        return arr / norm if norm > 0 else arr
+
+    def get(self, model: str, query_vector: Sequence[float], docs: Sequence[Document]) -> Optional[str]:
+        """
+        Liefert die gecachte Antwort oder None.
+        """
+        signature, _ = doc_signature(docs)
+        query = self._normalize(query_vector)
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, embedding, answer FROM answers "
+                "WHERE model = ? AND doc_signature = ? AND created >= ?",
+                (model, signature, time.time() - self.ttl_s),
+            ).fetchall()
+
+            best_id, best_answer, best_score = None, None, self.threshold
+            for answer_id, blob, answer in rows:
+                score = float(np.frombuffer(blob, dtype=np.float32) @ query)
+                if score >= best_score:
+                    best_id, best_answer, best_score = answer_id, answer, score
+
+            if best_id is not None:
+                self._conn.execute(
+                    "UPDATE answers SET last_access = ? WHERE id = ?", (time.time(), best_id)
+                )
+                self._conn.commit()
+
+            # Zähler unter dem Lock, sonst gehen bei parallelen Aufrufen Inkremente verloren
+            if best_id is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return best_answer
+
+    def put(self, model: str, query_vector: Sequence[float], docs: Sequence[Document], answer: str) -> None:
+        signature, point_ids = doc_signature(docs)
+        now = time.time()
+
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO answers (model, doc_signature, embedding, answer, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (model, signature, self._normalize(query_vector).tobytes(), answer, now, now),
+            )
+            self._conn.executemany(
+                "INSERT INTO answer_docs (answer_id, point_id) VALUES (?, ?)",
+                [(cur.lastrowid, pid) for pid in point_ids],
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def invalidate(self, point_ids: Iterable[str]) -> int:
+        """
+        Entfernt alle Antworten, die eines der Dokumente zitieren. Liefert die Anzahl.
+        """
+        point_ids = list(dict.fromkeys(point_ids))
+        removed = 0
+        with self._lock:
+            for i in range(0, len(point_ids), _SQL_CHUNK):
+                chunk = point_ids[i : i + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                cur = self._conn.execute(
+                    f"DELETE FROM answers WHERE id IN ("
+                    f"SELECT answer_id FROM answer_docs WHERE point_id IN ({placeholders}))",
+                    chunk,
+                )
+                removed += cur.rowcount
+            self._conn.commit()
+        return removed
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl_s,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_access LIMIT ?)",
+                (overflow,),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+        return count
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": (hits / total) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_cache: AnswerCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache | None:
+    """
+    Prozessweiter Antwort-Cache; None, wenn per ANSWER_CACHE_ENABLED abgeschaltet.
+    """
+    global _cache
+    cfg = AnswerCacheConfig()
+    if not cfg.enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache(cfg.path, cfg.threshold, cfg.ttl_s, cfg.max_entries)
+        return _cache
+
+
+def close_answer_cache() -> None:
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = None
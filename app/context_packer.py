@@ -0,0 +1,111 @@
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Sequence
+
+from langchain_core.documents import Document
+
+from bin.config import ContextConfig
+
+# Wörter/Zahlen bzw. einzelne Satzzeichen; Grundlage der Token-Schätzung
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_WORD_RE = re.compile(r"\w+")
+
+# Zeichen pro Token für lange Wörter (BPE-Tokenizer zerlegen Komposita in Teilstücke)
+_CHARS_PER_TOKEN = 4
+
+
+def _piece_tokens(piece: str) -> int:
+    return max(1, math.ceil(len(piece) / _CHARS_PER_TOKEN))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Schnelle Token-Schätzung ohne Tokenizer: jedes Satzzeichen ein Token,
+    Wörter ein Token pro angefangene 4 Zeichen. Schätzt für deutsche Texte
+    eher zu hoch als zu niedrig, damit num_ctx nicht überläuft.
+    """
+    return sum(_piece_tokens(p) for p in _PIECE_RE.findall(text))
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Kürzt text an einer Wortgrenze auf höchstens max_tokens (geschätzt).
+    """
+    used = 0
+    for match in _PIECE_RE.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > max_tokens:
+            return text[: match.start()].rstrip() + " …"
+    return text
+
+
+def _jaccard(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class PackedContext:
+    docs: list[Document] = field(default_factory=list)
+    # Retrieval-Score je Eintrag in docs
+    scores: list[float] = field(default_factory=list)
+    num_ctx: int = 0
+    prompt_tokens: int = 0
+    # Statistik für Logging/Benchmarks
+    dropped_duplicates: int = 0
+    dropped_budget: int = 0
+    trimmed: int = 0
+
+
+def pack_context(
+    hits: Sequence[tuple[Document, float]],
+    build_prompt: Callable[[list[Document]], str],
+    cfg: ContextConfig | None = None,
+) -> PackedContext:
+    """
+    Packt die Treffer in ein Token-Budget:
+    1. Reihenfolge der Retriever übernehmen (pro Quelle bester Treffer zuerst); nicht nach
+       Score sortieren, denn je nach QDRANT_DISTANCE (Euclid) ist ein kleinerer Score besser
+    2. nahezu identische Dokumente (Jaccard der Wortmengen) verwerfen
+    3. jeden Block auf das Budget seiner Quelle (incident/kb) kürzen
+    4. Blöcke aufnehmen, solange der Prompt in das grösste num_ctx passt
+    5. das kleinste num_ctx wählen, in das Prompt + Antwort-Reserve passen
+
+    build_prompt baut aus einer Dokumentliste den fertigen Prompt (für den Overhead).
+    """
+    cfg = cfg or ContextConfig()
+    sizes = sorted(cfg.num_ctx_options)
+    packed = PackedContext()
+
+    overhead = estimate_tokens(build_prompt([]))
+    # Trennzeichen + Header pro Block grob mit einrechnen
+    per_block_overhead = estimate_tokens("\n\n-----\n\n[INC 00000000-0000, Status: Offen]\n")
+    limit = sizes[-1] - cfg.answer_reserve
+    used = overhead
+
+    kept_words: list[set[str]] = []
+    for doc, score in hits:
+        words = set(_WORD_RE.findall(doc.page_content.casefold()))
+        if any(_jaccard(words, other) >= cfg.dedup_threshold for other in kept_words):
+            packed.dropped_duplicates += 1
+            continue
+
+        budget = cfg.budget_incident if doc.metadata.get("source") == "incident" else cfg.budget_kb
+        content = trim_to_tokens(doc.page_content, budget)
+        tokens = estimate_tokens(content) + per_block_overhead
+        if used + tokens > limit:
+            packed.dropped_budget += 1
+            continue
+
+        if content != doc.page_content:
+            packed.trimmed += 1
+        kept_words.append(words)
+        packed.docs.append(Document(page_content=content, metadata=doc.metadata))
+        packed.scores.append(score)
+        used += tokens
+
+    packed.prompt_tokens = used
+    packed.num_ctx = next((n for n in sizes if used + cfg.answer_reserve <= n), sizes[-1])
+    return packed
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+# SQLite erlaubt nur eine begrenzte Anzahl an Parametern pro Statement
+_SQL_CHUNK = 500
+
+
+class EmbeddingCache:
+    """
+    Persistenter, inhaltsadressierter Cache für Embeddings.
+
+    Key ist (model, sha256(text)), der Vektor wird als float32-BLOB in SQLite
+    abgelegt. Bei Überschreiten von max_entries werden die am längsten nicht
+    genutzten Einträge verdrängt (LRU über last_access).
+    """
+
+    def __init__(self, path: str, max_entries: int = 200_000):
+        if max_entries <= 0:
+            raise ValueError("max_entries muss > 0 sein")
+
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _encode(vector: Sequence[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _decode(blob: bytes) -> List[float]:
+        vec = array("f")
+        vec.frombytes(blob)
+        return vec.tolist()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Liefert die Vektoren in der Reihenfolge von texts; None für Cache-Misses.
+        """
+        hashes = [self.text_hash(t) for t in texts]
+        found: Dict[str, List[float]] = {}
+
+        with self._lock:
+            unique = list(dict.fromkeys(hashes))
+            for i in range(0, len(unique), _SQL_CHUNK):
+                chunk = unique[i : i + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = self._decode(blob)
+
+            # LRU: Zugriffszeit der Treffer aktualisieren
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+
+            result = [found.get(h) for h in hashes]
+            hits = sum(1 for v in result if v is not None)
+            # Zähler unter dem Lock, sonst gehen bei parallelen Aufrufen Inkremente verloren
+            self.hits += hits
+            self.misses += len(result) - hits
+        return result
+
+    def put_many(
+        self,
+        model: str,
+        texts: Sequence[str],
+        vectors: Sequence[Sequence[float]],
+    ) -> None:
+        if len(texts) != len(vectors):
+            raise ValueError("texts und vectors müssen gleich lang sein")
+
+        now = time.time()
+        rows = [
+            (model, self.text_hash(t), self._encode(v), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        self._conn.execute(
+            """
+            DELETE FROM embeddings WHERE (model, text_hash) IN (
+                SELECT model, text_hash FROM embeddings ORDER BY last_access LIMIT ?
+            )
+            """,
+            (overflow,),
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": (hits / total) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,20 +1,58 @@
-from typing import List
+import threading
+from typing import List, Optional
 import requests
+from requests.adapters import HTTPAdapter
 from langchain_core.embeddings import Embeddings
 from bin.config import EmbeddingConfig
+from .embedding_cache import EmbeddingCache
+
+# Prozessweite HTTP-Session mit Connection-Pooling (Keep-Alive) für den Embedding-Endpoint
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size: int = 16) -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def close_session() -> None:
+    """
+    Schliesst die geteilte Session (z.B. in Tests oder beim Herunterfahren).
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
 
 
 class Embeddings(Embeddings):
     """
     Embedding-Wrapper.
     Nutzt /v1/embeddings mit Key 'input' und 'model'.
+    Bereits bekannte Texte kommen aus dem EmbeddingCache, nur Misses gehen über die Leitung.
     """
-s
-    def __init__(self, config: EmbeddingConfig | None = None):
+
+    def __init__(
+        self,
+        config: EmbeddingConfig | None = None,
+        cache: Optional[EmbeddingCache] = None,
+    ):
         self.config = config or EmbeddingConfig()
+        if cache is None and self.config.cache_enabled:
+            cache = EmbeddingCache(self.config.cache_path, self.config.cache_max_entries)
+        self.cache = cache
 
-    def _embed(self, texts: List[str]) -> List[List[float]]:
-        resp = requests.post(
+    def _post(self, texts: List[str]) -> List[List[float]]:
+        resp = get_session().post(
             self.config.base_url,
             json={"input": texts, "model": self.config.model},
             timeout=120,
@@ -23,6 +61,25 @@ s
         data = resp.json()["data"]
         return [item["embedding"] for item in data]
 
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if self.cache is None:
+            return self._post(texts)
+
+        vectors = self.cache.get_many(self.config.model, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            # Duplikate innerhalb des Batches nur einmal anfragen
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            fresh = dict(zip(unique, self._post(unique)))
+            self.cache.put_many(self.config.model, unique, [fresh[t] for t in unique])
+            for i in missing:
+                vectors[i] = fresh[texts[i]]
+
+        return vectors
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats() if self.cache is not None else {}
+
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         # LangChain ruft das beim Ingest auf
         return self._embed(texts)
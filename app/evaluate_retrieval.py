@@ -0,0 +1,326 @@
+"""
+Retrieval-Evaluation gegen die gold_kb_id der synthetischen Tickets:
+Titel + Beschreibung jedes Tickets werden als Query gegen die KB-Collection gestellt
+und mit Recall@K, nDCG@K und MRR pro Kategorie und gesamt bewertet.
+Queries werden in Batches embedded und gesucht; berichtet werden auch Queries/s
+und die Zeit pro Stage.
+
+Mit --run-out werden die Rankings (Top-depth pro Query) als Run-File gespeichert;
+--from-run bewertet ein gespeichertes Run-File ohne Embedding-Server und Qdrant.
+Im Modus hybrid entstehen zusätzlich <name>.dense.tsv und <name>.lexical.tsv mit den
+Rankings der einzelnen Quellen; mehrere Run-Files bei --from-run werden per RRF
+fusioniert (--rrf-k, --weights), so lassen sich Gewichte ohne neue Suche vergleichen.
+
+Aufruf:
+  python -m app.evaluate_retrieval
+  python -m app.evaluate_retrieval --csv generator/output/synthetic_incidents_with_kb.csv --k 1 5 10 --mode hybrid
+  python -m app.evaluate_retrieval --depth 100 --run-out cache/runs/dense.tsv
+  python -m app.evaluate_retrieval --from-run cache/runs/dense.tsv --k 1 5 10 20 50
+  python -m app.evaluate_retrieval --mode hybrid --depth 100 --run-out cache/runs/hybrid.tsv
+  python -m app.evaluate_retrieval --from-run cache/runs/hybrid.dense.tsv cache/runs/hybrid.lexical.tsv --weights 1 0.5
+"""
+
+import argparse
+import csv
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from bin.config import DataConfig, RetrievalConfig
+from bin.logging_utils import get_logger
+from metrics.retrievalquaility.runs import Run, RunHit, fuse_runs, read_run, score_run, write_qrels, write_run
+from .lexical import reciprocal_rank_fusion
+from .sparse import server_hybrid_search
+from .vectorstore import get_lexical_index, get_search_params, get_vectorstore, search_batch, supports_server_hybrid
+
+logger = get_logger("evaluate_retrieval")
+
+# Schlüssel für die Gesamtwerte in EvalReport.metrics
+OVERALL = "ALL"
+
+
+@dataclass
+class EvalQuery:
+    query_id: str
+    text: str
+    category: str
+    gold_kb_id: str
+
+
+@dataclass
+class EvalReport:
+    queries: int = 0
+    ks: tuple[int, ...] = ()
+    # Kategorie (bzw. OVERALL) -> Metrik -> Mittelwert
+    metrics: dict[str, dict[str, float]] = field(default_factory=dict)
+    counts: dict[str, int] = field(default_factory=dict)
+    # Stage -> Sekunden (load, embed, search, score)
+    timings: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def queries_per_s(self) -> float:
+        retrieval_s = self.timings.get("embed", 0.0) + self.timings.get("search", 0.0)
+        return self.queries / retrieval_s if retrieval_s > 0 else 0.0
+
+
+def load_eval_queries(path: str, limit: int | None = None) -> list[EvalQuery]:
+    """
+    Liest Tickets mit gesetzter gold_kb_id; Query = Titel + Beschreibung.
+    """
+    queries: list[EvalQuery] = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            gold = (row.get("gold_kb_id") or "").strip()
+            if not gold:
+                continue
+            queries.append(EvalQuery(
+                query_id=row.get("ticket_id") or str(len(queries)),
+                text=f"{row.get('title', '')}\n\n{row.get('description', '')}".strip(),
+                category=row.get("category") or "unbekannt",
+                gold_kb_id=gold,
+            ))
+            if limit is not None and len(queries) >= limit:
+                break
+    return queries
+
+
+def _chunks(items: Sequence, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def retrieve(
+    queries: Sequence[EvalQuery],
+    k: int,
+    batch_size: int = 64,
+    mode: str = "dense",
+    hnsw_ef: int | None = None,
+    timings: dict[str, float] | None = None,
+    per_source: dict[str, list[list[tuple[Document, float]]]] | None = None,
+) -> list[list[tuple[Document, float]]]:
+    """
+    Embedded alle Queries chunkweise und sucht sie als Batch in der KB-Collection.
+    mode wie in query_demo: dense, hybrid (lokaler BM25 + RRF) oder server_hybrid.
+    per_source: erhält im Modus hybrid die ungefusten Rankings unter "dense" und "lexical".
+    """
+    timings = {} if timings is None else timings
+    vs = get_vectorstore("kb")
+    if mode == "server_hybrid" and not supports_server_hybrid(vs):
+        mode = "hybrid"
+    search_params = get_search_params(hnsw_ef)
+    texts = [q.text for q in queries]
+
+    t0 = time.perf_counter()
+    vectors: list[list[float]] = []
+    for chunk in _chunks(texts, batch_size):
+        vectors.extend(vs.embeddings.embed_documents(list(chunk)))
+    timings["embed"] = timings.get("embed", 0.0) + time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    results: list[list[tuple[Document, float]]] = []
+    if mode == "server_hybrid":
+        # Prefetch + Fusion lassen sich nicht batchen, daher eine Query pro Ticket
+        candidates = max(k, RetrievalConfig().hybrid_candidates)
+        for text, vector in zip(texts, vectors):
+            results.append(server_hybrid_search(
+                vs, vector, text, k=k, candidates=candidates, search_params=search_params
+            ))
+    else:
+        n = max(k, RetrievalConfig().hybrid_candidates) if mode == "hybrid" else k
+        for chunk in _chunks(vectors, batch_size):
+            results.extend(search_batch(vs, list(chunk), k=n, search_params=search_params))
+        if mode == "hybrid":
+            index = get_lexical_index("kb")
+            lexical = [index.search(text, n) for text in texts]
+            if per_source is not None:
+                per_source.update(dense=results, lexical=lexical)
+            rrf_k = RetrievalConfig().rrf_k
+            results = [
+                reciprocal_rank_fusion([dense, sparse], k=rrf_k, limit=k)
+                for dense, sparse in zip(results, lexical)
+            ]
+    timings["search"] = timings.get("search", 0.0) + time.perf_counter() - t0
+    return results
+
+
+def to_run(
+    queries: Sequence[EvalQuery],
+    results: Sequence[Sequence[tuple[Document, float]]],
+    source: str | None = None,
+) -> Run:
+    """
+    source: Wert der source-Spalte, sonst die Collection des Treffers.
+    """
+    return {
+        query.query_id: [
+            RunHit(
+                doc_id=doc.metadata.get("kb_id", ""),
+                rank=rank,
+                score=float(score),
+                source=source or doc.metadata.get("_collection_name", "kb"),
+            )
+            for rank, (doc, score) in enumerate(hits, start=1)
+        ]
+        for query, hits in zip(queries, results)
+    }
+
+
+def qrels_for(queries: Sequence[EvalQuery]) -> dict[str, set[str]]:
+    return {q.query_id: {q.gold_kb_id} for q in queries}
+
+
+def score(
+    queries: Sequence[EvalQuery],
+    run: Run,
+    ks: Sequence[int],
+) -> tuple[dict[str, dict[str, float]], dict[str, int]]:
+    """
+    Mittelwerte von Recall@K, nDCG@K (je k) und MRR@max(k), pro Kategorie und gesamt.
+    Recall und nDCG werden für alle Queries und k in einem NumPy-Durchlauf berechnet.
+    """
+    query_ids, per_query = score_run(run, qrels_for(queries), ks)
+    category_of = {q.query_id: q.category for q in queries}
+    categories = np.array([category_of[qid] for qid in query_ids], dtype=object)
+
+    groups = {OVERALL: np.ones(len(query_ids), dtype=bool)}
+    for category in sorted(set(categories)):
+        groups[category] = categories == category
+
+    metrics = {
+        group: {name: float(values[mask].mean()) for name, values in per_query.items()}
+        for group, mask in groups.items()
+    }
+    counts = {group: int(mask.sum()) for group, mask in groups.items()}
+    return metrics, counts
+
+
+def evaluate(
+    path: str,
+    ks: Sequence[int] = (1, 3, 5, 10),
+    batch_size: int = 64,
+    mode: str = "dense",
+    hnsw_ef: int | None = None,
+    limit: int | None = None,
+    depth: int | None = None,
+    run_out: str | None = None,
+    from_run: str | Sequence[str] | None = None,
+    rrf_k: int | None = None,
+    weights: Sequence[float] | None = None,
+) -> EvalReport:
+    """
+    depth: Treffer pro Query, die abgerufen (und ins Run-File geschrieben) werden, mind. max(ks).
+    run_out: Run-File (TSV) schreiben, daneben <name>.qrels.tsv mit den gold_kb_ids und im
+      Modus hybrid <name>.dense.tsv / <name>.lexical.tsv mit den Rankings pro Quelle.
+    from_run: gespeichertes Run-File bewerten statt neu zu suchen; mehrere Run-Files werden
+      mit RRF (rrf_k, weights) fusioniert.
+    """
+    if isinstance(from_run, str):
+        from_run = [from_run]
+    report = EvalReport(ks=tuple(sorted(ks)))
+
+    t0 = time.perf_counter()
+    queries = load_eval_queries(path, limit=limit)
+    report.timings["load"] = time.perf_counter() - t0
+    report.queries = len(queries)
+    if not queries:
+        logger.warning("Keine Tickets mit gold_kb_id in %s gefunden.", path)
+        return report
+
+    # Rankings der einzelnen Quellen (nur hybrid), für das Run-File pro Quelle
+    per_source: dict[str, list[list[tuple[Document, float]]]] = {}
+    if from_run:
+        t0 = time.perf_counter()
+        runs = [read_run(run_path) for run_path in from_run]
+        if len(runs) == 1:
+            run = runs[0]
+        else:
+            run = fuse_runs(runs, k=rrf_k or RetrievalConfig().rrf_k, weights=weights)
+        report.timings["read_run"] = time.perf_counter() - t0
+    else:
+        depth = max(depth or 0, max(ks))
+        results = retrieve(queries, depth, batch_size, mode, hnsw_ef, report.timings, per_source)
+        run = to_run(queries, results)
+
+    if run_out:
+        os.makedirs(os.path.dirname(run_out) or ".", exist_ok=True)
+        stem = os.path.splitext(run_out)[0]
+        write_run(run_out, run)
+        write_qrels(stem + ".qrels.tsv", qrels_for(queries))
+        for source, source_results in per_source.items():
+            write_run(f"{stem}.{source}.tsv", to_run(queries, source_results, source=source))
+        logger.info("Run-File geschrieben: %s (Quellen: %s)", run_out, ", ".join(per_source) or "-")
+
+    t0 = time.perf_counter()
+    report.metrics, report.counts = score(queries, run, report.ks)
+    report.timings["score"] = time.perf_counter() - t0
+
+    logger.info(
+        "Evaluation (%s): %s Queries, %.1f Queries/s, %s",
+        "run " + " + ".join(from_run) if from_run else mode,
+        report.queries,
+        report.queries_per_s,
+        report.metrics[OVERALL],
+    )
+    return report
+
+
+def print_report(report: EvalReport) -> None:
+    if not report.metrics:
+        print("Keine Queries ausgewertet.")
+        return
+
+    names = list(report.metrics[OVERALL])
+    groups = sorted(g for g in report.metrics if g != OVERALL) + [OVERALL]
+    width = max(len(g) for g in groups) + 2
+
+    print(f"{'Kategorie':<{width}}{'n':>6}" + "".join(f"{n:>11}" for n in names))
+    for group in groups:
+        values = report.metrics[group]
+        print(f"{group:<{width}}{report.counts[group]:>6}" + "".join(f"{values[n]:>11.4f}" for n in names))
+
+    print()
+    for stage, seconds in report.timings.items():
+        per_query_ms = seconds / report.queries * 1000 if report.queries else 0.0
+        print(f"{stage:<8} {seconds:8.2f}s  ({per_query_ms:.2f} ms/Query)")
+    if report.queries_per_s:
+        print(f"Durchsatz: {report.queries_per_s:.1f} Queries/s (Embedding + Suche)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval-Qualität gegen gold_kb_id messen")
+    parser.add_argument("--csv", default=DataConfig().incident_path, help="Tickets mit gold_kb_id")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--mode", choices=["dense", "hybrid", "server_hybrid"], default="dense")
+    parser.add_argument("--hnsw-ef", type=int, default=None)
+    parser.add_argument("--limit", type=int, default=None, help="nur die ersten N Tickets")
+    parser.add_argument("--depth", type=int, default=None, help="Treffer pro Query (Standard: max k)")
+    parser.add_argument("--run-out", default=None, help="Rankings als Run-File (TSV) speichern")
+    parser.add_argument("--from-run", nargs="+", default=None,
+                        help="gespeicherte Run-Files bewerten statt zu suchen (mehrere: RRF-Fusion)")
+    parser.add_argument("--rrf-k", type=int, default=None, help="RRF-Konstante für --from-run mit mehreren Files")
+    parser.add_argument("--weights", type=float, nargs="+", default=None, help="RRF-Gewichte pro Run-File")
+    args = parser.parse_args()
+
+    report = evaluate(
+        args.csv,
+        ks=args.k,
+        batch_size=args.batch_size,
+        mode=args.mode,
+        hnsw_ef=args.hnsw_ef,
+        limit=args.limit,
+        depth=args.depth,
+        run_out=args.run_out,
+        from_run=args.from_run,
+        rrf_k=args.rrf_k,
+        weights=args.weights,
+    )
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Sequence
+
+import numpy as np
+from qdrant_client.http import models
+
+# Payload-Key, unter dem langchain_qdrant die Metadaten ablegt
+METADATA_KEY = "metadata"
+
+
+def _match(key: str, value: str | Sequence[str]) -> models.FieldCondition:
+    if isinstance(value, str):
+        return models.FieldCondition(key=key, match=models.MatchValue(value=value))
+    return models.FieldCondition(key=key, match=models.MatchAny(any=list(value)))
+
+
+@dataclass
+class IncidentFilter:
+    """
+    Filter auf Incident-Metadaten, wird zu einem Qdrant-Filter kompiliert und
+    damit direkt in der HNSW-Suche angewendet (statt Over-Fetching + Nachfiltern).
+
+    Beispiel: nur gelöste Network-Incidents der letzten 90 Tage
+      IncidentFilter(status="Gelöst", category="Network", max_age_days=90)
+    """
+    status: str | Sequence[str] | None = None
+    category: str | Sequence[str] | None = None
+    max_impact: int | None = None
+    max_urgency: int | None = None
+    created_after: datetime | None = None
+    max_age_days: int | None = None
+
+    def to_qdrant(self, metadata_key: str = METADATA_KEY) -> models.Filter | None:
+        must: list[models.Condition] = []
+
+        if self.status is not None:
+            must.append(_match(f"{metadata_key}.status", self.status))
+        if self.category is not None:
+            must.append(_match(f"{metadata_key}.category", self.category))
+        if self.max_impact is not None:
+            must.append(models.FieldCondition(
+                key=f"{metadata_key}.impact", range=models.Range(lte=self.max_impact)
+            ))
+        if self.max_urgency is not None:
+            must.append(models.FieldCondition(
+                key=f"{metadata_key}.urgency", range=models.Range(lte=self.max_urgency)
+            ))
+
+        created_after = self.created_after
+        if self.max_age_days is not None:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=self.max_age_days)
+            created_after = max(created_after, cutoff) if created_after else cutoff
+        if created_after is not None:
+            must.append(models.FieldCondition(
+                key=f"{metadata_key}.created_at", range=models.DatetimeRange(gte=created_after)
+            ))
+
+        return models.Filter(must=must) if must else None
+
+
+# ----------------------------------------------------------------------
+# Auswertung der Filter ohne Qdrant (NumpyVectorStore, BM25-Index)
+# ----------------------------------------------------------------------
+
+def _parse_datetime(value) -> datetime | None:
+    if not value:
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    # Zeitstempel ohne Zone wie Qdrant als UTC interpretieren
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _column(key: str, metadatas: Sequence[dict], cache: dict) -> np.ndarray:
+    field = key[len(METADATA_KEY) + 1:] if key.startswith(METADATA_KEY + ".") else key
+    col = cache.get(field)
+    if col is None:
+        col = np.array([m.get(field) for m in metadatas], dtype=object)
+        cache[field] = col
+    return col
+
+
+def _condition_mask(cond: models.FieldCondition, metadatas: Sequence[dict], cache: dict) -> np.ndarray:
+    col = _column(cond.key, metadatas, cache)
+
+    if cond.match is not None:
+        if isinstance(cond.match, models.MatchValue):
+            return col == cond.match.value
+        if isinstance(cond.match, models.MatchAny):
+            return np.isin(col, list(cond.match.any))
+        raise ValueError(f"Match-Typ nicht unterstützt: {type(cond.match).__name__}")
+
+    rng = cond.range
+    if isinstance(rng, models.DatetimeRange):
+        values = np.array([_parse_datetime(v) for v in col], dtype=object)
+        bounds = {name: _parse_datetime(getattr(rng, name)) for name in ("gt", "gte", "lt", "lte")}
+    elif isinstance(rng, models.Range):
+        values = col
+        bounds = {name: getattr(rng, name) for name in ("gt", "gte", "lt", "lte")}
+    else:
+        raise ValueError(f"Bedingung nicht unterstützt: {cond}")
+
+    present = np.array([v is not None for v in values], dtype=bool)
+    mask = present.copy()
+    ops = {"gt": np.greater, "gte": np.greater_equal, "lt": np.less, "lte": np.less_equal}
+    for name, bound in bounds.items():
+        if bound is None:
+            continue
+        result = np.zeros(len(values), dtype=bool)
+        result[present] = ops[name](values[present], bound).astype(bool)
+        mask &= result
+    return mask
+
+
+def metadata_mask(flt: models.Filter, metadatas: Sequence[dict], cache: dict | None = None) -> np.ndarray:
+    """
+    Wertet einen (von IncidentFilter erzeugten) Qdrant-Filter über Metadaten-Spalten aus.
+    cache nimmt die Spalten-Arrays pro Feld auf und kann zwischen Aufrufen wiederverwendet werden.
+    """
+    if flt.should or flt.must_not:
+        raise ValueError("Lokale Filterauswertung unterstützt nur must-Bedingungen")
+    cache = {} if cache is None else cache
+    mask = np.ones(len(metadatas), dtype=bool)
+    for cond in flt.must or []:
+        mask &= _condition_mask(cond, metadatas, cache)
+    return mask
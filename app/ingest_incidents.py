@@ -1,24 +1,32 @@
-import os
-from tqdm import tqdm
-from .loaders import load_incidents_csv
-from .vectorstore import index_documents
-
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+from .loaders import iter_incidents_csv
+from .vectorstore import sync_documents
+from .provision import ensure_collection
+from bin.config import DataConfig, VectorStoreConfig
 
 
 def main():
     cfg = DataConfig()
 
-    #csv_path = os.path.join(BASE_DIR, "data", "incidents.csv")
-    
     print("CSV-Pfad:", cfg.incident_path)
-    docs = load_incidents_csv(cfg.incident_path)
-
-    print(f"Lade {len(docs)} Incident-Dokumente in Qdrant ...")
-
-    # Optional: tqdm herum, wenn du willst
-    # Hier batcht index_documents intern
-    index_documents(docs, kind="incidents")
+    docs = iter_incidents_csv(cfg.incident_path)
+
+    backend = VectorStoreConfig().backend
+    print(f"Lade Incident-Dokumente ({backend}) ...")
+
+    # sync_documents indiziert nur neue/geänderte Zeilen, batcht intern als Pipeline
+    # Qdrant-Collection mit den konfigurierten Parametern anlegen, falls sie fehlt
+    if backend == "qdrant":
+        ensure_collection("incidents")
+    sync = sync_documents(docs, kind="incidents")
+    stats = sync.ingest
+    print(
+        f"Neu: {sync.added}, geändert: {sync.updated}, "
+        f"unverändert: {sync.unchanged}, gelöscht: {sync.deleted}"
+    )
+    print(
+        f"{stats.docs} Dokumente in {stats.wall_s:.1f}s ({stats.docs_per_s:.1f} docs/s), "
+        f"Embedding {stats.embed_s:.1f}s, Upsert {stats.upsert_s:.1f}s"
+    )
 
     print("Incident-Ingest abgeschlossen.")
 
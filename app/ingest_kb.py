@@ -1,15 +1,29 @@
-from .loaders import load_kb_csv
-from .vectorstore import index_documents
-from bin.config import DataConfig
+from .loaders import iter_kb_csv
+from .vectorstore import sync_documents
+from .provision import ensure_collection
+from bin.config import DataConfig, VectorStoreConfig
 
 
 def main():
     cfg = DataConfig()
 
     print("CSV-Pfad:", cfg.kb_path)
-    docs = load_kb_csv(cfg.kb_path)
+    docs = iter_kb_csv(cfg.kb_path)
 
-    print(f"Lade {len(docs)} KB-Dokumente in Qdrant ...")
-    index_documents(docs, kind="kb")
+    backend = VectorStoreConfig().backend
+    print(f"Lade KB-Dokumente ({backend}) ...")
+    # Qdrant-Collection mit den konfigurierten Parametern anlegen, falls sie fehlt
+    if backend == "qdrant":
+        ensure_collection("kb")
+    sync = sync_documents(docs, kind="kb")
+    stats = sync.ingest
+    print(
+        f"Neu: {sync.added}, geändert: {sync.updated}, "
+        f"unverändert: {sync.unchanged}, gelöscht: {sync.deleted}"
+    )
+    print(
+        f"{stats.docs} Dokumente in {stats.wall_s:.1f}s ({stats.docs_per_s:.1f} docs/s), "
+        f"Embedding {stats.embed_s:.1f}s, Upsert {stats.upsert_s:.1f}s"
+    )
 
     print("⚡ KB-Ingest abgeschlossen.")
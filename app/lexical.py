@@ -0,0 +1,344 @@
+import json
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from typing import Iterable, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from qdrant_client.http import models
+
+from .filters import metadata_mask
+
+# ----------------------------------------------------------------------
+# Tokenisierung (deutsch, aber technische Tokens bleiben ganz)
+# ----------------------------------------------------------------------
+
+_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+# Wörter mit Bindestrich/Unterstrich/Punkt/Doppelpunkt/Slash bleiben als Ganzes erhalten:
+# ERR_PROXY_CONNECTION_FAILED, COMP-128503, KB-55699635, 10.0.0.1, srv01.corp.local
+_TOKEN_RE = re.compile(r"[0-9a-zäöüß_]+(?:[-./:][0-9a-zäöüß_]+)*")
+_SPLIT_RE = re.compile(r"[-./:_]+")
+
+STOPWORDS = frozenset(
+    w.translate(_UMLAUTS)
+    for w in (
+        "der die das den dem des ein eine einer eines einem einen und oder aber "
+        "ist sind war wird werden wurde wurden hat haben hatte kann können konnte "
+        "nicht kein keine mit von vom zu zum zur im in ins an am auf aus bei für "
+        "nach über unter vor durch als auch noch nur so wie wenn dass ich er sie es "
+        "wir ihr man sich mein dein sein bitte the a an and or of to is in on for"
+    ).split()
+)
+
+# Version der Tokenisierung; gespeicherte Indizes mit anderer Version werden beim Laden neu aufgebaut
+TOKENIZER_VERSION = 2
+
+# Leichtes Suffix-Stripping für rein alphabetische Wörter (kein vollständiger Stemmer),
+# angelehnt an Schritt 1 des Snowball-German: Singular und Plural sollen denselben Stamm ergeben
+_NOMINAL_PLURALS = (("ungen", "ung"), ("heiten", "heit"), ("keiten", "keit"))
+_NOMINAL_SUFFIXES = ("ung", "heit", "keit")
+# Genitiv-/Plural-s nur nach diesen Buchstaben (nicht bei "status", "prozess")
+_S_ENDINGS = frozenset("bdfghklmnrt")
+_SUFFIXES = ("ern", "em", "en", "er", "es", "e")
+_MIN_STEM = 4
+
+
+def _stem(token: str) -> str:
+    if len(token) <= 5 or not token.isalpha():
+        return token
+    for plural, singular in _NOMINAL_PLURALS:
+        if token.endswith(plural):
+            return token[: -len(plural)] + singular
+    if token.endswith(_NOMINAL_SUFFIXES):
+        return token
+    # druckers -> drucker, netzwerks -> netzwerk
+    if token.endswith("s") and token[-2] in _S_ENDINGS and len(token) - 1 >= _MIN_STEM:
+        token = token[:-1]
+    # drucker/druckern -> druck, netzwerke/netzwerkes -> netzwerk
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= _MIN_STEM:
+            return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Zerlegt Text in BM25-Terme: casefold, Umlaute normalisiert (ä -> ae, ß -> ss),
+    Stoppwörter entfernt, leichte Suffix-Reduktion. Zusammengesetzte technische
+    Tokens werden ganz und zusätzlich in ihren Teilen indiziert.
+    """
+    tokens: list[str] = []
+    for raw in _TOKEN_RE.findall(text.casefold()):
+        token = raw.translate(_UMLAUTS)
+        if token in STOPWORDS:
+            continue
+        if _SPLIT_RE.search(token):
+            tokens.append(token)
+            tokens.extend(
+                part for part in _SPLIT_RE.split(token)
+                if len(part) > 1 and part not in STOPWORDS
+            )
+        else:
+            tokens.append(_stem(token))
+    return tokens
+
+
+# ----------------------------------------------------------------------
+# Rank Fusion
+# ----------------------------------------------------------------------
+
+def reciprocal_rank_fusion(
+    result_lists: Iterable[Sequence[tuple[Document, float]]],
+    k: int = 60,
+    limit: int | None = None,
+) -> list[tuple[Document, float]]:
+    """
+    Reciprocal Rank Fusion: score(d) = sum(1 / (k + rank_i(d))).
+    Dokumente werden über metadata['_id'] zusammengeführt.
+    """
+    scores: dict[str, float] = {}
+    docs: dict[str, Document] = {}
+    for hits in result_lists:
+        for rank, (doc, _) in enumerate(hits, start=1):
+            key = doc.metadata.get("_id") or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+
+    ordered = sorted(scores, key=scores.__getitem__, reverse=True)
+    if limit is not None:
+        ordered = ordered[:limit]
+    return [(docs[key], scores[key]) for key in ordered]
+
+
+# ----------------------------------------------------------------------
+# BM25-Index
+# ----------------------------------------------------------------------
+
+class BM25Index:
+    """
+    Invertierter BM25-Index über page_content.
+
+    Postings liegen pro Term als kompakte array('I') (Slot-Nummern) und array('H')
+    (Termfrequenz). Updates sind inkrementell: ein geändertes Dokument bekommt einen
+    neuen Slot, der alte wird als gelöscht markiert; compact() räumt auf.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, path: str | None = None):
+        self.k1 = k1
+        self.b = b
+        self.path = path
+
+        self.vocab: dict[str, int] = {}
+        self._post_docs: list[array] = []
+        self._post_tfs: list[array] = []
+        self.df = array("I")
+
+        self.ids: list[str] = []
+        self.contents: list[str] = []
+        self.metadatas: list[dict] = []
+        self.hashes: list[str | None] = []
+        self.doc_len = array("I")
+        self.alive = bytearray()
+        self._slots: dict[str, int] = {}
+        self._total_len = 0
+        self._columns: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __iter__(self):
+        # Point-IDs der aktiven Dokumente
+        return iter(list(self._slots))
+
+    def content_hash(self, pid: str) -> str | None:
+        slot = self._slots.get(pid)
+        return self.hashes[slot] if slot is not None else None
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def add(self, pid: str, doc: Document, digest: str | None = None) -> None:
+        if pid in self._slots:
+            self.remove(pid)
+
+        slot = len(self.ids)
+        counts = Counter(tokenize(doc.page_content))
+        for term, tf in counts.items():
+            tid = self.vocab.get(term)
+            if tid is None:
+                tid = len(self._post_docs)
+                self.vocab[term] = tid
+                self._post_docs.append(array("I"))
+                self._post_tfs.append(array("H"))
+                self.df.append(0)
+            self._post_docs[tid].append(slot)
+            self._post_tfs[tid].append(min(tf, 0xFFFF))
+            self.df[tid] += 1
+
+        length = sum(counts.values())
+        self.ids.append(pid)
+        self.contents.append(doc.page_content)
+        self.metadatas.append(dict(doc.metadata))
+        self.hashes.append(digest)
+        self.doc_len.append(length)
+        self.alive.append(1)
+        self._slots[pid] = slot
+        self._total_len += length
+        self._columns.clear()
+
+    def remove(self, pid: str) -> None:
+        slot = self._slots.pop(pid, None)
+        if slot is None:
+            return
+        self.alive[slot] = 0
+        self._total_len -= self.doc_len[slot]
+        for term in set(tokenize(self.contents[slot])):
+            self.df[self.vocab[term]] -= 1
+        self._columns.clear()
+
+    def compact(self) -> None:
+        """
+        Entfernt gelöschte Slots und nummeriert die Postings neu.
+        """
+        alive = np.frombuffer(bytes(self.alive), dtype=np.uint8).astype(bool)
+        if alive.all():
+            return
+        remap = np.cumsum(alive) - 1
+
+        for tid, (docs, tfs) in enumerate(zip(self._post_docs, self._post_tfs)):
+            d = np.frombuffer(docs, dtype=np.uint32)
+            keep = alive[d]
+            self._post_docs[tid] = array("I", remap[d[keep]].astype(np.uint32).tobytes())
+            self._post_tfs[tid] = array("H", np.frombuffer(tfs, dtype=np.uint16)[keep].tobytes())
+
+        keep_slots = np.nonzero(alive)[0]
+        self.ids = [self.ids[i] for i in keep_slots]
+        self.contents = [self.contents[i] for i in keep_slots]
+        self.metadatas = [self.metadatas[i] for i in keep_slots]
+        self.hashes = [self.hashes[i] for i in keep_slots]
+        self.doc_len = array("I", np.frombuffer(self.doc_len, dtype=np.uint32)[keep_slots].tobytes())
+        self.alive = bytearray(b"\x01" * len(self.ids))
+        self._slots = {pid: i for i, pid in enumerate(self.ids)}
+        self._columns.clear()
+
+    # ------------------------------------------------------------------
+    # Suche
+    # ------------------------------------------------------------------
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        filter: models.Filter | None = None,
+    ) -> list[tuple[Document, float]]:
+        n_alive = len(self._slots)
+        if n_alive == 0:
+            return []
+
+        avgdl = self._total_len / n_alive if self._total_len else 1.0
+        dl = np.frombuffer(self.doc_len, dtype=np.uint32).astype(np.float32)
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+
+        for term, qtf in Counter(tokenize(query)).items():
+            tid = self.vocab.get(term)
+            if tid is None or self.df[tid] == 0:
+                continue
+            docs = np.frombuffer(self._post_docs[tid], dtype=np.uint32)
+            tf = np.frombuffer(self._post_tfs[tid], dtype=np.uint16).astype(np.float32)
+            df = self.df[tid]
+            idf = math.log(1.0 + (n_alive - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * dl[docs] / avgdl)
+            # Slots sind pro Term eindeutig, daher reicht einfaches Fancy-Indexing
+            scores[docs] += qtf * idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+        scores[np.frombuffer(bytes(self.alive), dtype=np.uint8) == 0] = 0.0
+        if filter is not None:
+            scores[~metadata_mask(filter, self.metadatas, self._columns)] = 0.0
+
+        candidates = np.nonzero(scores > 0)[0]
+        if len(candidates) == 0:
+            return []
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        hits = []
+        for slot in candidates:
+            metadata = dict(self.metadatas[slot])
+            metadata["_id"] = self.ids[slot]
+            hits.append((Document(page_content=self.contents[slot], metadata=metadata), float(scores[slot])))
+        return hits
+
+    # ------------------------------------------------------------------
+    # Persistenz (Postings als CSR-Arrays)
+    # ------------------------------------------------------------------
+    def save(self, path: str | None = None) -> None:
+        path = path or self.path
+        if path is None:
+            raise ValueError("Kein Pfad für BM25Index.save angegeben")
+        os.makedirs(path, exist_ok=True)
+        self.compact()
+
+        offsets = np.zeros(len(self._post_docs) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p) for p in self._post_docs])
+        postings_path = os.path.join(path, "postings.npz")
+        with open(postings_path + ".tmp", "wb") as f:
+            np.savez(
+                f,
+                offsets=offsets,
+                docs=np.frombuffer(b"".join(p.tobytes() for p in self._post_docs), dtype=np.uint32),
+                tfs=np.frombuffer(b"".join(p.tobytes() for p in self._post_tfs), dtype=np.uint16),
+                df=np.frombuffer(self.df, dtype=np.uint32),
+                doc_len=np.frombuffer(self.doc_len, dtype=np.uint32),
+            )
+
+        docs_path = os.path.join(path, "docs.jsonl")
+        with open(docs_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(json.dumps(
+                {"k1": self.k1, "b": self.b, "tokenizer": TOKENIZER_VERSION, "vocab": list(self.vocab)},
+                ensure_ascii=False,
+            ))
+            f.write("\n")
+            for pid, content, meta, digest in zip(self.ids, self.contents, self.metadatas, self.hashes):
+                f.write(json.dumps(
+                    {"id": pid, "page_content": content, "metadata": meta, "hash": digest},
+                    ensure_ascii=False,
+                ))
+                f.write("\n")
+
+        os.replace(postings_path + ".tmp", postings_path)
+        os.replace(docs_path + ".tmp", docs_path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(os.path.join(path, "docs.jsonl"), encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            index = cls(k1=header["k1"], b=header["b"], path=path)
+            for line in f:
+                record = json.loads(line)
+                index.ids.append(record["id"])
+                index.contents.append(record["page_content"])
+                index.metadatas.append(record["metadata"])
+                index.hashes.append(record["hash"])
+
+        if header.get("tokenizer") != TOKENIZER_VERSION:
+            # Terme wurden mit einer anderen Tokenisierung erzeugt: aus den gespeicherten Texten neu aufbauen
+            rebuilt = cls(k1=index.k1, b=index.b, path=path)
+            for pid, content, meta, digest in zip(index.ids, index.contents, index.metadatas, index.hashes):
+                rebuilt.add(pid, Document(page_content=content, metadata=meta), digest)
+            return rebuilt
+
+        data = np.load(os.path.join(path, "postings.npz"))
+        offsets, docs, tfs = data["offsets"], data["docs"], data["tfs"]
+        index.vocab = {term: tid for tid, term in enumerate(header["vocab"])}
+        index._post_docs = [array("I", docs[offsets[i]:offsets[i + 1]].tobytes()) for i in range(len(offsets) - 1)]
+        index._post_tfs = [array("H", tfs[offsets[i]:offsets[i + 1]].tobytes()) for i in range(len(offsets) - 1)]
+        index.df = array("I", data["df"].tobytes())
+        index.doc_len = array("I", data["doc_len"].tobytes())
+        index.alive = bytearray(b"\x01" * len(index.ids))
+        index._slots = {pid: i for i, pid in enumerate(index.ids)}
+        index._total_len = int(data["doc_len"].sum())
+        return index
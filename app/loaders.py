@@ -1,7 +1,9 @@
-from typing import List
+from typing import Iterator, List
 import os
 import csv
 
+from bin.text_utils import safe_parse_level
+
 # pandas ist optional; wenn nicht installiert, verwenden wir csv.DictReader als Fallback
 try:
     import pandas as pd  # type: ignore
@@ -20,85 +22,183 @@ except Exception:
         metadata: dict
 
 
-def load_incidents_csv(path: str) -> List[Document]:
-    docs: List[Document] = []
+# Zeilen pro Chunk beim Streamen der CSV-Dateien
+DEFAULT_CHUNKSIZE = 1000
 
-    if pd is not None:
-        df = pd.read_csv(path)
-        iterator = (row for _, row in df.iterrows())
-    else:
-        f = open(path, newline='', encoding='utf-8')
-        reader = csv.DictReader(f)
-        iterator = reader
-
-    for row in iterator:
-
-        # Felder aus CSV lesen und Variablen zuweisen
-        ticket_id = str(row.get("ticket_id", ""))
-        title = str(row.get("title", ""))
-        desc = str(row.get("description", ""))
-        history = str(row.get("history", ""))
-
-        # Kontext dür LM:
-        content = (
-            f"Incident {ticket_id}: {title}\n\n"
-            f"Beschreibung:\n{desc}\n\n"
-            f"Verlauf:\n{history}"
-        )
-
-        # Metadten zusammnenstellen'
-        metadata = {
-            "source": "incident",
-            "ticket_id": ticket_id,
-            "status": row.get("status", ""),
-            "category": row.get("category", ""),
-            "impact": row.get("impact", ""),
-            "urgency": row.get("urgency", ""),
-            "created_at": row.get("created_at", ""),
-            "resolved_at": row.get("resolved_at", ""),
-        }
-
-        # Dokument zusammenstellen und zur Liste hinzufügen
-        docs.append(Document(page_content=content, metadata=metadata))
-
-    if pd is None:
-        f.close()
-    return docs
+# Spalten, die in page_content bzw. metadata landen
+INCIDENT_FIELDS = ("ticket_id", "title", "description", "history")
+INCIDENT_META_FIELDS = ("status", "category", "impact", "urgency", "created_at", "resolved_at")
+KB_FIELDS = ("kb_id", "title", "summary", "content")
+KB_META_FIELDS = ("service", "category", "tags")
 
 
-def load_kb_csv(path: str) -> List[Document]:
-    docs: List[Document] = []
+def _level(value):
+    # Impact/Urgency als Integer (1-3) in den Payload, damit Qdrant sie als Integer indizieren kann
+    return safe_parse_level(value, default=None)
+
+
+# Konvertierungen für Metadatenfelder (gleich für pandas- und csv-Pfad)
+META_CONVERTERS = {"impact": _level, "urgency": _level}
+
+
+def _col(df, name: str):
+    # Fehlende Spalten wie leere Strings behandeln (wie row.get(name, "") bisher)
+    if name in df.columns:
+        return df[name]
+    return pd.Series("", index=df.index, dtype=object)
 
+
+def _metadata_records(df, source: str, id_field: str, ids, fields: tuple) -> List[dict]:
+    """
+    Metadaten-Dicts für einen ganzen Chunk. Die Spalten werden einmal per tolist()
+    in Python-Listen gewandelt und dann gezippt; das ist deutlich schneller als
+    to_dict("records"), das jeden Wert einzeln boxt.
+    """
+    keys = ("source", id_field) + fields
+    columns = [[source] * len(df), ids.tolist()]
+    for name in fields:
+        values = _col(df, name).tolist()
+        convert = META_CONVERTERS.get(name)
+        columns.append([convert(v) for v in values] if convert else values)
+    return [dict(zip(keys, values)) for values in zip(*columns)]
+
+
+def _incident_documents_from_frame(df) -> List[Document]:
+    """
+    Baut die Dokumente spaltenweise: String-Konkatenation über ganze Spalten
+    statt iterrows(), danach ein einziger Durchlauf für die Document-Objekte.
+    """
+    ticket_id = _col(df, "ticket_id")
+
+    # Kontext für LM:
+    content = (
+        "Incident " + ticket_id + ": " + _col(df, "title")
+        + "\n\nBeschreibung:\n" + _col(df, "description")
+        + "\n\nVerlauf:\n" + _col(df, "history")
+    )
+
+    metadatas = _metadata_records(df, "incident", "ticket_id", ticket_id, INCIDENT_META_FIELDS)
+
+    return [
+        Document(page_content=c, metadata=m)
+        for c, m in zip(content.tolist(), metadatas)
+    ]
+
+
+def _kb_documents_from_frame(df) -> List[Document]:
+    kb_id = _col(df, "kb_id")
+
+    page_content = (
+        "KB-Artikel " + kb_id + ": " + _col(df, "title")
+        + "\n\nZusammenfassung:\n" + _col(df, "summary")
+        + "\n\nInhalt:\n" + _col(df, "content")
+    )
+
+    metadatas = _metadata_records(df, "kb", "kb_id", kb_id, KB_META_FIELDS)
+
+    return [
+        Document(page_content=c, metadata=m)
+        for c, m in zip(page_content.tolist(), metadatas)
+    ]
+
+
+def _csv_records(f, fields: tuple) -> Iterator[tuple]:
+    """
+    Fallback ohne pandas: csv.reader statt DictReader (kein dict pro Zeile),
+    liefert nur die benötigten Spalten als Tupel in der Reihenfolge von fields.
+    """
+    reader = csv.reader(f)
+    header = next(reader, [])
+    positions = [header.index(name) if name in header else None for name in fields]
+    width = len(header)
+
+    for values in reader:
+        if not values:
+            # Leerzeilen überspringen (wie DictReader)
+            continue
+        if len(values) < width:
+            values.extend([""] * (width - len(values)))
+        yield tuple(values[i] if i is not None else "" for i in positions)
+
+
+def _incident_document(record: tuple) -> Document:
+    ticket_id, title, desc, history, status, category, impact, urgency, created_at, resolved_at = record
+
+    content = (
+        f"Incident {ticket_id}: {title}\n\n"
+        f"Beschreibung:\n{desc}\n\n"
+        f"Verlauf:\n{history}"
+    )
+
+    metadata = {
+        "source": "incident",
+        "ticket_id": ticket_id,
+        "status": status,
+        "category": category,
+        "impact": _level(impact),
+        "urgency": _level(urgency),
+        "created_at": created_at,
+        "resolved_at": resolved_at,
+    }
+
+    return Document(page_content=content, metadata=metadata)
+
+
+def _kb_document(record: tuple) -> Document:
+    kb_id, title, summary, content, service, category, tags = record
+
+    page_content = (
+        f"KB-Artikel {kb_id}: {title}\n\n"
+        f"Zusammenfassung:\n{summary}\n\n"
+        f"Inhalt:\n{content}"
+    )
+
+    metadata = {
+        "source": "kb",
+        "kb_id": kb_id,
+        "service": service,
+        "category": category,
+        "tags": tags,
+    }
+
+    return Document(page_content=page_content, metadata=metadata)
+
+
+def _iter_documents(path: str, chunksize: int, from_frame, from_record, fields: tuple) -> Iterator[Document]:
+    """
+    Streamt Dokumente chunkweise aus der CSV. Alle Werte werden als Strings gelesen,
+    leere Zellen bleiben "" (identisch zum csv-Fallback, kein "nan" im Kontext).
+    """
     if pd is not None:
-        df = pd.read_csv(path)
-        iterator = (row for _, row in df.iterrows())
+        for chunk in pd.read_csv(path, chunksize=chunksize, dtype=str, keep_default_na=False):
+            yield from from_frame(chunk)
     else:
-        f = open(path, newline='', encoding='utf-8')
-        reader = csv.DictReader(f)
-        iterator = reader
-
-    for row in iterator:
-        kb_id = str(row.get("kb_id", ""))
-        title = str(row.get("title", ""))
-        summary = str(row.get("summary", ""))
-        content = str(row.get("content", ""))
-
-        page_content = (
-            f"KB-Artikel {kb_id}: {title}\n\n"
-            f"Zusammenfassung:\n{summary}\n\n"
-            f"Inhalt:\n{content}"
-        )
-
-        metadata = {
-            "source": "kb",
-            "kb_id": kb_id,
-            "service": row.get("service", ""),
-            "category": row.get("category", ""),
-            "tags": row.get("tags", ""),
-        }
-
-        docs.append(Document(page_content=page_content, metadata=metadata))
-
-    if pd is None:
-        f.close()
-    return docs
+        with open(path, newline='', encoding='utf-8') as f:
+            for record in _csv_records(f, fields):
+                yield from_record(record)
+
+
+def iter_incidents_csv(path: str, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[Document]:
+    """
+    Streamt Incident-Dokumente chunkweise aus der CSV (Speicherbedarf unabhängig von der Dateigröße).
+    Lässt sich direkt an index_documents übergeben.
+    """
+    yield from _iter_documents(
+        path, chunksize, _incident_documents_from_frame, _incident_document,
+        INCIDENT_FIELDS + INCIDENT_META_FIELDS,
+    )
+
+
+def iter_kb_csv(path: str, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[Document]:
+    yield from _iter_documents(
+        path, chunksize, _kb_documents_from_frame, _kb_document,
+        KB_FIELDS + KB_META_FIELDS,
+    )
+
+
+def load_incidents_csv(path: str) -> List[Document]:
+    return list(iter_incidents_csv(path))
+
+
+def load_kb_csv(path: str) -> List[Document]:
+    return list(iter_kb_csv(path))
@@ -0,0 +1,62 @@
+import hashlib
+import json
+import os
+import uuid
+from typing import Dict
+
+from langchain_core.documents import Document
+
+# Fester Namespace, damit dieselbe ticket_id/kb_id immer dieselbe Point-ID ergibt
+POINT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "rag-experiments/points")
+
+
+def point_id(kind: str, doc: Document) -> str:
+    """
+    Deterministische Point-ID aus ticket_id bzw. kb_id.
+    Dokumente ohne ID bekommen eine ID aus ihrem Inhalt.
+    """
+    meta = doc.metadata or {}
+    key = meta.get("ticket_id") or meta.get("kb_id")
+    if not key:
+        key = "content:" + content_hash(doc)
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{kind}:{key}"))
+
+
+def content_hash(doc: Document) -> str:
+    h = hashlib.sha256()
+    h.update(doc.page_content.encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps(doc.metadata or {}, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+class IngestManifest:
+    """
+    Lokales Manifest pro Collection: Point-ID -> Content-Hash des zuletzt
+    indizierten Dokuments. Grundlage für inkrementellen Ingest.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    @classmethod
+    def for_collection(cls, manifest_dir: str, collection: str) -> "IngestManifest":
+        return cls(os.path.join(manifest_dir, f"{collection}.json"))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, pid: str) -> str | None:
+        return self.entries.get(pid)
+
+    def save(self) -> None:
+        # Erst in Temp-Datei schreiben, dann atomar ersetzen
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
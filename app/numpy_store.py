@@ -0,0 +1,256 @@
+import json
+import os
+import uuid
+from typing import Iterable, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from qdrant_client.http import models
+
+from .filters import metadata_mask
+
+# Zeilen pro Block, wenn float16-Vektoren für das Produkt nach float32 gewandelt werden
+_BLOCK_ROWS = 65536
+
+
+class NumpyVectorStore:
+    """
+    In-Process-Vektorindex auf Basis einer zusammenhängenden float32/float16-Matrix.
+
+    - Cosine-Similarity über normalisierte Vektoren: ein Matrix-Vektor-Produkt pro Query,
+      ein Matrix-Matrix-Produkt für Query-Batches, Top-k per argpartition
+    - Metadatenfilter (Qdrant-Filter aus app.filters) werden über Spalten-Arrays ausgewertet
+    - save/load über np.save + mmap_mode="r"
+
+    Bietet dieselben Suchmethoden wie der LangChain-Qdrant-Store, den get_vectorstore sonst liefert.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        embeddings: Embeddings | None = None,
+        dtype: str = "float32",
+        path: str | None = None,
+    ):
+        self.collection_name = collection_name
+        self._embeddings = embeddings
+        self.dtype = np.dtype(dtype)
+        self.path = path
+
+        # _vectors ist die Sicht auf die ersten len(ids) Zeilen von _buffer; der Puffer
+        # wächst durch Verdoppeln, damit Ingest in vielen Batches nicht quadratisch kopiert
+        self._buffer: np.ndarray | None = None
+        self._vectors: np.ndarray | None = None
+        self.ids: list[str] = []
+        self.contents: list[str] = []
+        self.metadatas: list[dict] = []
+        self._positions: dict[str, int] = {}
+        # Spalten-Arrays der Metadaten für Filter, werden bei Änderungen verworfen
+        self._columns: dict[str, np.ndarray] = {}
+
+    @property
+    def embeddings(self) -> Embeddings | None:
+        return self._embeddings
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # ------------------------------------------------------------------
+    # Schreiben
+    # ------------------------------------------------------------------
+    def _normalize(self, vectors) -> np.ndarray:
+        arr = np.asarray(vectors, dtype=np.float32)
+        if arr.ndim == 1:
+            arr = arr[None, :]
+        norms = np.linalg.norm(arr, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return arr / norms
+
+    def upsert(self, ids: Sequence[str], vectors, docs: Sequence[Document]) -> None:
+        """
+        Fügt Dokumente hinzu bzw. überschreibt vorhandene IDs.
+        """
+        normalized = self._normalize(vectors).astype(self.dtype)
+        new_rows = []
+
+        # doppelte IDs im selben Batch: die letzte Kopie gewinnt (wie bei Qdrant)
+        last_row = {pid: row for row, pid in enumerate(ids)}
+        for pid, row in last_row.items():
+            doc = docs[row]
+            pos = self._positions.get(pid)
+            if pos is None:
+                self._positions[pid] = len(self.ids) + len(new_rows)
+                new_rows.append(row)
+                self.ids.append(pid)
+                self.contents.append(doc.page_content)
+                self.metadatas.append(dict(doc.metadata))
+            else:
+                self._writable()[pos] = normalized[row]
+                self.contents[pos] = doc.page_content
+                self.metadatas[pos] = dict(doc.metadata)
+
+        if new_rows:
+            start = 0 if self._vectors is None else self._vectors.shape[0]
+            end = start + len(new_rows)
+            self._reserve(end, normalized.shape[1])
+            self._buffer[start:end] = normalized[new_rows]
+            self._vectors = self._buffer[:end]
+        self._columns.clear()
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        # Platz für rows Zeilen schaffen; ein read-only Puffer (mmap) wird dabei kopiert
+        buf = self._buffer
+        if buf is not None and buf.shape[0] >= rows and buf.flags.writeable:
+            return
+        capacity = max(rows, 2 * (buf.shape[0] if buf is not None else 0), 1024)
+        grown = np.empty((capacity, dim), dtype=self.dtype)
+        if self._vectors is not None:
+            grown[: self._vectors.shape[0]] = self._vectors
+        self._buffer = grown
+
+    def delete(self, ids: Iterable[str]) -> None:
+        drop = {self._positions[pid] for pid in ids if pid in self._positions}
+        if not drop:
+            return
+        keep = [i for i in range(len(self.ids)) if i not in drop]
+        self._vectors = self._buffer = np.ascontiguousarray(self._vectors[keep])
+        self.ids = [self.ids[i] for i in keep]
+        self.contents = [self.contents[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        self._positions = {pid: i for i, pid in enumerate(self.ids)}
+        self._columns.clear()
+
+    def _writable(self) -> np.ndarray:
+        # Nach load(mmap=True) ist die Matrix read-only; vor dem ersten Schreiben kopieren
+        if not self._vectors.flags.writeable:
+            self._vectors = self._buffer = np.array(self._vectors)
+        return self._vectors
+
+    def add_documents(self, documents: Sequence[Document], ids: Sequence[str] | None = None) -> list[str]:
+        vectors = self._embeddings.embed_documents([d.page_content for d in documents])
+        ids = list(ids) if ids is not None else [uuid.uuid4().hex for _ in documents]
+        self.upsert(ids, vectors, documents)
+        return ids
+
+    # ------------------------------------------------------------------
+    # Filter über Spalten-Arrays
+    # ------------------------------------------------------------------
+    def _filter_mask(self, flt: models.Filter | None) -> np.ndarray | None:
+        if flt is None:
+            return None
+        return metadata_mask(flt, self.metadatas, self._columns)
+
+    # ------------------------------------------------------------------
+    # Suche
+    # ------------------------------------------------------------------
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        if self.dtype == np.float32:
+            return queries @ self._vectors.T
+        # float16 spart Speicher, gerechnet wird blockweise in float32
+        out = np.empty((queries.shape[0], len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), _BLOCK_ROWS):
+            block = self._vectors[start : start + _BLOCK_ROWS].astype(np.float32)
+            out[:, start : start + len(block)] = queries @ block.T
+        return out
+
+    def _top_k(self, scores: np.ndarray, k: int, mask: np.ndarray | None) -> list[tuple[int, float]]:
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(i), float(scores[i])) for i in top if scores[i] != -np.inf]
+
+    def _document(self, pos: int) -> Document:
+        metadata = dict(self.metadatas[pos])
+        metadata["_id"] = self.ids[pos]
+        metadata["_collection_name"] = self.collection_name
+        return Document(page_content=self.contents[pos], metadata=metadata)
+
+    def similarity_search_with_score_by_vectors(
+        self,
+        embeddings,
+        k: int = 4,
+        filter: models.Filter | None = None,
+        **kwargs,
+    ) -> list[list[tuple[Document, float]]]:
+        """
+        Batch-Suche: ein Matrix-Matrix-Produkt für alle Queries.
+        """
+        if not self.ids:
+            return [[] for _ in range(len(embeddings))]
+        queries = self._normalize(embeddings)
+        scores = self._scores(queries)
+        mask = self._filter_mask(filter)
+        return [
+            [(self._document(pos), score) for pos, score in self._top_k(row, k, mask)]
+            for row in scores
+        ]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: Sequence[float],
+        k: int = 4,
+        filter: models.Filter | None = None,
+        **kwargs,
+    ) -> list[tuple[Document, float]]:
+        # search_params o.ä. (Qdrant-spezifisch) werden ignoriert
+        return self.similarity_search_with_score_by_vectors([embedding], k=k, filter=filter)[0]
+
+    def similarity_search_by_vector(self, embedding: Sequence[float], k: int = 4, **kwargs) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> list[tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embeddings.embed_query(query), k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    # ------------------------------------------------------------------
+    # Persistenz
+    # ------------------------------------------------------------------
+    def save(self, path: str | None = None) -> None:
+        path = path or self.path
+        if path is None:
+            raise ValueError("Kein Pfad für NumpyVectorStore.save angegeben")
+        os.makedirs(path, exist_ok=True)
+
+        vectors = self._vectors if self._vectors is not None else np.empty((0, 0), dtype=self.dtype)
+
+        # In Temp-Dateien schreiben und atomar ersetzen: ein per mmap geöffneter
+        # Index liest sonst aus der gerade überschriebenen Datei
+        vectors_path = os.path.join(path, "vectors.npy")
+        with open(vectors_path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(vectors))
+        docs_path = os.path.join(path, "docs.jsonl")
+        with open(docs_path + ".tmp", "w", encoding="utf-8") as f:
+            for pid, content, meta in zip(self.ids, self.contents, self.metadatas):
+                f.write(json.dumps({"id": pid, "page_content": content, "metadata": meta}, ensure_ascii=False))
+                f.write("\n")
+        os.replace(vectors_path + ".tmp", vectors_path)
+        os.replace(docs_path + ".tmp", docs_path)
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        collection_name: str,
+        embeddings: Embeddings | None = None,
+        mmap: bool = True,
+    ) -> "NumpyVectorStore":
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+        store = cls(collection_name, embeddings, dtype=str(vectors.dtype), path=path)
+
+        with open(os.path.join(path, "docs.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                store.ids.append(record["id"])
+                store.contents.append(record["page_content"])
+                store.metadatas.append(record["metadata"])
+
+        store._positions = {pid: i for i, pid in enumerate(store.ids)}
+        store._vectors = store._buffer = vectors if store.ids else None
+        return store
@@ -0,0 +1,190 @@
+"""
+Legt die Qdrant-Collections (incidents_csv, kb_csv) explizit an bzw. aktualisiert sie
+mit den Parametern aus CollectionConfig: Vektorgröße, Distanz, HNSW, On-Disk-Vektoren,
+skalare int8-Quantisierung und Sparse-Vektor für die Hybrid-Suche.
+
+Aufruf:
+  python -m app.provision              # beide Collections anlegen/aktualisieren
+  python -m app.provision --kind kb --recreate
+"""
+
+import argparse
+from typing import Literal
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from bin.config import CollectionConfig, EmbeddingConfig, QdrantConfig
+from bin.logging_utils import get_logger
+from .filters import METADATA_KEY
+from .sparse import SPARSE_VECTOR_NAME, sparse_vectors_config
+from .vectorstore import get_client
+
+logger = get_logger("provision")
+
+# Payload-Indizes pro Collection, damit Filter in der HNSW-Suche greifen
+PAYLOAD_INDEXES: dict[str, dict[str, models.PayloadSchemaType]] = {
+    "incidents": {
+        f"{METADATA_KEY}.status": models.PayloadSchemaType.KEYWORD,
+        f"{METADATA_KEY}.category": models.PayloadSchemaType.KEYWORD,
+        f"{METADATA_KEY}.impact": models.PayloadSchemaType.INTEGER,
+        f"{METADATA_KEY}.urgency": models.PayloadSchemaType.INTEGER,
+        f"{METADATA_KEY}.created_at": models.PayloadSchemaType.DATETIME,
+    },
+    "kb": {
+        f"{METADATA_KEY}.category": models.PayloadSchemaType.KEYWORD,
+        f"{METADATA_KEY}.service": models.PayloadSchemaType.KEYWORD,
+    },
+}
+
+
+def _collection_name(kind: Literal["incidents", "kb"], cfg: QdrantConfig) -> str:
+    return cfg.inc_collection if kind == "incidents" else cfg.kb_collection
+
+
+def _hnsw_config(cfg: CollectionConfig) -> models.HnswConfigDiff:
+    return models.HnswConfigDiff(m=cfg.hnsw_m, ef_construct=cfg.hnsw_ef_construct)
+
+
+def _quantization_config(cfg: CollectionConfig) -> models.ScalarQuantization | None:
+    if not cfg.quantization:
+        return None
+    return models.ScalarQuantization(
+        scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8,
+            quantile=cfg.quantization_quantile,
+            always_ram=cfg.quantization_always_ram,
+        )
+    )
+
+
+def provision_collection(
+    client: QdrantClient,
+    collection: str,
+    dim: int,
+    cfg: CollectionConfig | None = None,
+    recreate: bool = False,
+    payload_indexes: dict[str, models.PayloadSchemaType] | None = None,
+) -> None:
+    """
+    Erstellt die Collection, falls sie fehlt (oder recreate=True), sonst werden
+    HNSW-, On-Disk- und Quantisierungsparameter per update_collection angepasst.
+    Payload-Indizes werden in beiden Fällen angelegt.
+    """
+    cfg = cfg or CollectionConfig()
+
+    if recreate and client.collection_exists(collection):
+        logger.info("Lösche Collection '%s' (recreate).", collection)
+        client.delete_collection(collection)
+
+    if not client.collection_exists(collection):
+        client.create_collection(
+            collection_name=collection,
+            vectors_config=models.VectorParams(
+                size=dim,
+                distance=models.Distance(cfg.distance),
+                on_disk=cfg.on_disk_vectors,
+            ),
+            sparse_vectors_config=sparse_vectors_config() if cfg.sparse_vectors else None,
+            hnsw_config=_hnsw_config(cfg),
+            quantization_config=_quantization_config(cfg),
+        )
+        logger.info(
+            "Collection '%s' angelegt: dim=%s, distance=%s, m=%s, ef_construct=%s, on_disk=%s, int8=%s, sparse=%s",
+            collection,
+            dim,
+            cfg.distance,
+            cfg.hnsw_m,
+            cfg.hnsw_ef_construct,
+            cfg.on_disk_vectors,
+            cfg.quantization,
+            cfg.sparse_vectors,
+        )
+        _create_payload_indexes(client, collection, payload_indexes)
+        return
+
+    info = client.get_collection(collection)
+    existing = info.config.params.vectors
+    if isinstance(existing, models.VectorParams) and existing.size != dim:
+        raise ValueError(
+            f"Collection '{collection}' hat Vektorgröße {existing.size}, erwartet {dim}. "
+            "Mit --recreate neu anlegen."
+        )
+    # Sparse-Vektoren lassen sich nicht nachträglich zu einer Collection hinzufügen
+    if cfg.sparse_vectors and SPARSE_VECTOR_NAME not in (info.config.params.sparse_vectors or {}):
+        logger.warning(
+            "Collection '%s' hat keinen Sparse-Vektor '%s'; Hybrid-Suche erst nach --recreate möglich.",
+            collection,
+            SPARSE_VECTOR_NAME,
+        )
+
+    client.update_collection(
+        collection_name=collection,
+        vectors_config={"": models.VectorParamsDiff(on_disk=cfg.on_disk_vectors)},
+        hnsw_config=_hnsw_config(cfg),
+        quantization_config=_quantization_config(cfg) or models.Disabled.DISABLED,
+    )
+    logger.info(
+        "Collection '%s' aktualisiert: m=%s, ef_construct=%s, on_disk=%s, int8=%s",
+        collection,
+        cfg.hnsw_m,
+        cfg.hnsw_ef_construct,
+        cfg.on_disk_vectors,
+        cfg.quantization,
+    )
+    _create_payload_indexes(client, collection, payload_indexes)
+
+
+def _create_payload_indexes(
+    client: QdrantClient,
+    collection: str,
+    payload_indexes: dict[str, models.PayloadSchemaType] | None,
+) -> None:
+    # create_payload_index ist idempotent, bestehende Indizes bleiben erhalten
+    for field_name, schema in (payload_indexes or {}).items():
+        client.create_payload_index(
+            collection_name=collection,
+            field_name=field_name,
+            field_schema=schema,
+            wait=True,
+        )
+        logger.info("Payload-Index '%s' (%s) auf '%s'.", field_name, schema.value, collection)
+
+
+def ensure_collection(kind: Literal["incidents", "kb"]) -> None:
+    """
+    Legt die Collection mit den konfigurierten Parametern an, falls sie noch nicht existiert.
+    Bestehende Collections bleiben unverändert (für den Ingest).
+    """
+    cfg = QdrantConfig()
+    client = get_client(cfg)
+    collection = _collection_name(kind, cfg)
+    if not client.collection_exists(collection):
+        provision_collection(
+            client, collection, EmbeddingConfig().dim, payload_indexes=PAYLOAD_INDEXES[kind]
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Qdrant-Collections anlegen/aktualisieren")
+    parser.add_argument("--kind", choices=["incidents", "kb", "all"], default="all")
+    parser.add_argument("--recreate", action="store_true", help="Collection löschen und neu anlegen")
+    args = parser.parse_args()
+
+    cfg = QdrantConfig()
+    client = get_client(cfg)
+    dim = EmbeddingConfig().dim
+    kinds = ["incidents", "kb"] if args.kind == "all" else [args.kind]
+
+    for kind in kinds:
+        provision_collection(
+            client,
+            _collection_name(kind, cfg),
+            dim,
+            recreate=args.recreate,
+            payload_indexes=PAYLOAD_INDEXES[kind],
+        )
+
+
+if __name__ == "__main__":
+    main()
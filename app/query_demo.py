@@ -1,19 +1,218 @@
-import os, textwrap, requests
+import json, os, textwrap, time, requests
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from langchain_core.documents import Document
-from .vectorstore import get_vectorstore
-from bin.config import OllamaConfig
+from .vectorstore import (
+    get_vectorstore, get_search_params, get_lexical_index, get_embeddings, search_batch, supports_server_hybrid,
+)
+from .answer_cache import get_answer_cache
+from .context_packer import pack_context
+from .filters import IncidentFilter
+from .lexical import reciprocal_rank_fusion
+from .sparse import server_hybrid_search
+from bin import tracing
+from bin.config import OllamaConfig, RetrievalConfig
+from bin.logging_utils import get_logger
+from bin.metrics_utils import log_stream_call
 
 ollama_cfg = OllamaConfig()
+retrieval_cfg = RetrievalConfig()
+logger = get_logger("query_demo")
 
+# Pool für parallele Collection-Suchen (Incidents und KB hängen nicht voneinander ab)
+_search_pool = ThreadPoolExecutor(
+    max_workers=retrieval_cfg.max_workers, thread_name_prefix="retrieval"
+)
+
+
+def _traced(name: str, fn: Callable, *args, **kwargs):
+    # Pool-Task als eigener Span (Aufruf über tracing.wrap, damit der Trace erhalten bleibt)
+    with tracing.span(name):
+        return fn(*args, **kwargs)
+
+
+def _effective_mode(mode: str, *stores) -> str:
+    # server_hybrid braucht Sparse-Vektoren in allen Collections (Numpy-Backend: nie)
+    if mode == "server_hybrid" and not all(supports_server_hybrid(vs) for vs in stores):
+        return "hybrid"
+    return mode
+
+
+def retrieve_incidents_and_kb_with_scores(
+    query: str,
+    k_inc: int = 3,
+    k_kb: int = 3,
+    timeout_inc: float | None = None,
+    timeout_kb: float | None = None,
+    hnsw_ef: int | None = None,
+    inc_filter: IncidentFilter | None = None,
+    mode: str | None = None,
+) -> list[tuple[Document, float]]:
+    """
+    Sucht in Incidents und KB und liefert (Dokument, Score)-Paare.
+    Die Query wird nur einmal embedded, beide Collection-Suchen laufen parallel.
+    Überschreitet eine Collection ihren Timeout, werden die Treffer der anderen
+    trotzdem zurückgegeben (Teilergebnis). hnsw_ef überschreibt QDRANT_HNSW_EF,
+    inc_filter schränkt die Incident-Suche serverseitig ein (Status, Kategorie, Zeitraum ...).
+
+    mode="hybrid" (bzw. RETRIEVAL_MODE) holt pro Collection zusätzlich BM25-Kandidaten
+    und kombiniert beide Rankings per Reciprocal Rank Fusion; die Scores sind dann RRF-Scores.
+    mode="server_hybrid" macht dasselbe mit den Sparse-Vektoren in Qdrant: ein Query pro
+    Collection, fusioniert wird serverseitig (beim Numpy-Backend oder Collections ohne
+    Sparse-Vektoren Fallback auf "hybrid").
+    """
+    if timeout_inc is None:
+        timeout_inc = retrieval_cfg.timeout_inc
+    if timeout_kb is None:
+        timeout_kb = retrieval_cfg.timeout_kb
+    mode = mode or retrieval_cfg.mode
+    if mode not in ("dense", "hybrid", "server_hybrid"):
+        raise ValueError(f"Unbekannter Retrieval-Modus: {mode}")
+    qdrant_filter = inc_filter.to_qdrant() if inc_filter else None
+
+    vs_inc = get_vectorstore("incidents")
+    vs_kb = get_vectorstore("kb")
+    mode = _effective_mode(mode, vs_inc, vs_kb)
+    hybrid = mode == "hybrid"
+
+    # Für die Fusion mehr Kandidaten holen als am Ende zurückgegeben werden
+    n_inc = max(k_inc, retrieval_cfg.hybrid_candidates) if hybrid else k_inc
+    n_kb = max(k_kb, retrieval_cfg.hybrid_candidates) if hybrid else k_kb
+
+    with tracing.span("embed_query"):
+        vector = vs_inc.embeddings.embed_query(query)
+    search_params = get_search_params(hnsw_ef)
+
+    def submit(kind: str, vs, k: int, flt):
+        task = tracing.wrap(_traced)
+        if mode == "server_hybrid":
+            return _search_pool.submit(task, f"search.{kind}", server_hybrid_search, vs, vector, query, k=k,
+                                       candidates=retrieval_cfg.hybrid_candidates,
+                                       filter=flt, search_params=search_params)
+        return _search_pool.submit(task, f"search.{kind}", vs.similarity_search_with_score_by_vector, vector,
+                                   k=k, search_params=search_params, filter=flt)
+
+    t0 = time.monotonic()
+    searches = [
+        ("incidents", timeout_inc, submit("incidents", vs_inc, n_inc, qdrant_filter)),
+        ("kb", timeout_kb, submit("kb", vs_kb, n_kb, None)),
+    ]
+
+    dense: dict[str, list[tuple[Document, float]]] = {"incidents": [], "kb": []}
+    for kind, timeout, future in searches:
+        # Timeouts zählen ab dem gemeinsamen Start, nicht ab dem Warten auf die vorige Suche
+        remaining = max(0.0, t0 + timeout - time.monotonic()) if timeout > 0 else None
+        try:
+            dense[kind] = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning(
+                "Suche in '%s' nach %.2fs abgebrochen, liefere Teilergebnis.", kind, timeout
+            )
+        except Exception:
+            # eine ausgefallene Collection soll die Antwort aus der anderen nicht verhindern
+            logger.exception("Suche in '%s' fehlgeschlagen, liefere Teilergebnis.", kind)
+
+    # dense: reine Vektorsuche, server_hybrid: bereits von Qdrant fusioniert
+    if not hybrid:
+        return dense["incidents"] + dense["kb"]
+
+    # BM25 läuft lokal im Prozess; bei Dense-Timeout bleiben so zumindest die lexikalischen Treffer
+    with tracing.span("lexical"):
+        lexical_inc = get_lexical_index("incidents").search(query, n_inc, filter=qdrant_filter)
+        lexical_kb = get_lexical_index("kb").search(query, n_kb)
+    return (
+        reciprocal_rank_fusion([dense["incidents"], lexical_inc], k=retrieval_cfg.rrf_k, limit=k_inc)
+        + reciprocal_rank_fusion([dense["kb"], lexical_kb], k=retrieval_cfg.rrf_k, limit=k_kb)
+    )
+
+
+def retrieve_incidents_and_kb(
+    query: str,
+    k_inc: int = 3,
+    k_kb: int = 3,
+    inc_filter: IncidentFilter | None = None,
+    mode: str | None = None,
+) -> list[Document]:
+    hits = retrieve_incidents_and_kb_with_scores(query, k_inc, k_kb, inc_filter=inc_filter, mode=mode)
+    return [doc for doc, _ in hits]
+
+
+def retrieve_batch_with_scores(
+    queries: list[str],
+    k_inc: int = 3,
+    k_kb: int = 3,
+    batch_size: int = 64,
+    hnsw_ef: int | None = None,
+    inc_filter: IncidentFilter | None = None,
+    mode: str | None = None,
+    timings: dict[str, float] | None = None,
+) -> tuple[list[list[tuple[Document, float]]], list[list[float]]]:
+    """
+    Batch-Variante von retrieve_incidents_and_kb_with_scores für viele Fragen:
+    alle Fragen werden chunkweise in wenigen /v1/embeddings-Calls embedded und pro
+    Collection als Qdrant-Batch-Suche (query_batch_points) gesucht.
+    Liefert pro Frage die (Dokument, Score)-Paare sowie die Query-Vektoren.
+    Per-Collection-Timeouts gibt es hier nicht, der Batch läuft immer vollständig.
+    """
+    timings = {} if timings is None else timings
+    mode = mode or retrieval_cfg.mode
+    if mode not in ("dense", "hybrid", "server_hybrid"):
+        raise ValueError(f"Unbekannter Retrieval-Modus: {mode}")
+    qdrant_filter = inc_filter.to_qdrant() if inc_filter else None
 
-def retrieve_incidents_and_kb(query: str, k_inc: int = 3, k_kb: int = 3) -> list[Document]:
     vs_inc = get_vectorstore("incidents")
     vs_kb = get_vectorstore("kb")
+    mode = _effective_mode(mode, vs_inc, vs_kb)
+    hybrid = mode == "hybrid"
+    n_inc = max(k_inc, retrieval_cfg.hybrid_candidates) if hybrid else k_inc
+    n_kb = max(k_kb, retrieval_cfg.hybrid_candidates) if hybrid else k_kb
+    search_params = get_search_params(hnsw_ef)
+
+    t0 = time.perf_counter()
+    vectors: list[list[float]] = []
+    with tracing.span("embed_documents", n=len(queries)):
+        for start in range(0, len(queries), batch_size):
+            vectors.extend(vs_inc.embeddings.embed_documents(queries[start : start + batch_size]))
+    timings["embed"] = timings.get("embed", 0.0) + time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if mode == "server_hybrid":
+        # Prefetch + Fusion lassen sich nicht batchen, daher ein Query pro Frage und Collection
+        def search(vs, n, flt):
+            return [
+                server_hybrid_search(vs, vector, query, k=n, candidates=retrieval_cfg.hybrid_candidates,
+                                     filter=flt, search_params=search_params)
+                for query, vector in zip(queries, vectors)
+            ]
+    else:
+        def search(vs, n, flt):
+            results = []
+            for start in range(0, len(vectors), batch_size):
+                results.extend(search_batch(vs, vectors[start : start + batch_size], k=n,
+                                            filter=flt, search_params=search_params))
+            return results
 
-    inc_docs = vs_inc.similarity_search(query, k=k_inc)
-    kb_docs = vs_kb.similarity_search(query, k=k_kb)
+    # Beide Collections parallel, wie bei der Einzelsuche
+    future_inc = _search_pool.submit(tracing.wrap(_traced), "search_batch.incidents", search, vs_inc, n_inc, qdrant_filter)
+    future_kb = _search_pool.submit(tracing.wrap(_traced), "search_batch.kb", search, vs_kb, n_kb, None)
+    dense_inc, dense_kb = future_inc.result(), future_kb.result()
 
-    return inc_docs + kb_docs
+    if hybrid:
+        lexical_inc = get_lexical_index("incidents")
+        lexical_kb = get_lexical_index("kb")
+        with tracing.span("lexical_batch", n=len(queries)):
+            results = [
+                reciprocal_rank_fusion([inc, lexical_inc.search(query, n_inc, filter=qdrant_filter)],
+                                       k=retrieval_cfg.rrf_k, limit=k_inc)
+                + reciprocal_rank_fusion([kb, lexical_kb.search(query, n_kb)], k=retrieval_cfg.rrf_k, limit=k_kb)
+                for query, inc, kb in zip(queries, dense_inc, dense_kb)
+            ]
+    else:
+        results = [inc + kb for inc, kb in zip(dense_inc, dense_kb)]
+    timings["search"] = timings.get("search", 0.0) + time.perf_counter() - t0
+    return results, vectors
 
 
 def build_prompt(query: str, docs: list[Document]) -> str:
@@ -46,37 +245,310 @@ def build_prompt(query: str, docs: list[Document]) -> str:
     return prompt
 
 
-def ask_ollama(prompt: str) -> str:
+def _ollama_request(prompt: str, stream: bool, num_ctx: int) -> dict:
     if not ollama_cfg.url:
         raise RuntimeError("OLLAMA_URL ist in .env nicht gesetzt")
+    return {
+        "model": ollama_cfg.model,
+        "prompt": prompt,
+        "options": {"num_gpu": 0, "num_thread": ollama_cfg.threads, "num_ctx": num_ctx},
+        "stream": stream,
+        "keep_alive": ollama_cfg.keep_alive,
+    }
 
+
+def preload_ollama() -> None:
+    """
+    Lädt das Modell vorab in Ollama (Generate-Request ohne Prompt) und hält es
+    für OLLAMA_KEEP_ALIVE im Speicher, damit die erste Frage nicht auf das Laden wartet.
+    """
+    if not ollama_cfg.url:
+        raise RuntimeError("OLLAMA_URL ist in .env nicht gesetzt")
     resp = requests.post(
         ollama_cfg.url,
-        json={
-            "model": ollama_cfg.model,
-            "prompt": prompt,
-            "options": {"num_gpu": 0, "num_thread": ollama_cfg.threads, "num_ctx": 4096},
-            "stream": False,
-        },
+        json={"model": ollama_cfg.model, "keep_alive": ollama_cfg.keep_alive, "stream": False},
         timeout=600,
     )
     resp.raise_for_status()
-    return resp.json()["response"]
+
+
+def _trace_ollama_durations(data: dict) -> None:
+    # Ollama liefert Dauern in Nanosekunden: Modell laden, Prompt auswerten, Tokens erzeugen
+    if not tracing.is_enabled():
+        return
+    if data.get("load_duration"):
+        tracing.record_span("ollama.load", data["load_duration"] / 1e9)
+    tracing.record_span("ollama.prompt_eval", data.get("prompt_eval_duration", 0) / 1e9,
+                        tokens=data.get("prompt_eval_count", 0))
+    tracing.record_span("ollama.eval", data.get("eval_duration", 0) / 1e9,
+                        tokens=data.get("eval_count", 0))
+
+
+def ask_ollama(prompt: str, num_ctx: int = 4096) -> str:
+    resp = requests.post(
+        ollama_cfg.url,
+        json=_ollama_request(prompt, stream=False, num_ctx=num_ctx),
+        timeout=600,
+    )
+    resp.raise_for_status()
+    data = resp.json()
+    _trace_ollama_durations(data)
+    return data["response"]
+
+
+def ask_ollama_stream(prompt: str, num_ctx: int = 4096) -> Iterator[str]:
+    """
+    Liefert die Antwort tokenweise, sobald Ollama die NDJSON-Chunks sendet.
+    Nach dem letzten Chunk werden TTFT, Tokens/s und Gesamtzeit über
+    bin.metrics_utils protokolliert.
+    """
+    t0 = time.perf_counter()
+    ttft = None
+    # Timeout gilt pro Lesevorgang, nicht für die ganze Antwort
+    with requests.post(
+        ollama_cfg.url,
+        json=_ollama_request(prompt, stream=True, num_ctx=num_ctx),
+        stream=True,
+        timeout=(10, 600),
+    ) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if "error" in chunk:
+                raise RuntimeError(f"Ollama-Fehler: {chunk['error']}")
+
+            token = chunk.get("response", "")
+            if token:
+                if ttft is None:
+                    ttft = time.perf_counter() - t0
+                    tracing.record_span("ollama.ttft", ttft)
+                yield token
+
+            if chunk.get("done"):
+                total = time.perf_counter() - t0
+                _trace_ollama_durations(chunk)
+                log_stream_call(
+                    model=ollama_cfg.model,
+                    ttft_s=ttft if ttft is not None else total,
+                    total_s=total,
+                    eval_tokens=chunk.get("eval_count", 0),
+                    prompt_tokens=chunk.get("prompt_eval_count", 0),
+                    # Ollama liefert Dauern in Nanosekunden
+                    eval_duration_s=chunk.get("eval_duration", 0) / 1e9,
+                )
+                return
+
+
+@dataclass
+class AnswerResult:
+    text: str
+    from_cache: bool
+    # tatsächlich im Prompt verwendete (ggf. gekürzte) Kontext-Dokumente
+    docs: list[Document]
+    num_ctx: int = 0
+    # Retrieval-Score je Eintrag in docs
+    scores: list[float] = field(default_factory=list)
+
+
+def generate_answer(
+    query: str,
+    hits: list[tuple[Document, float]],
+    on_token: Callable[[str], None] | None = None,
+    query_vector: list[float] | None = None,
+    stream: bool | None = None,
+) -> AnswerResult:
+    """
+    Antwort für query auf Basis der Retrieval-Treffer (Dokument, Score).
+    Der Kontext wird per Token-Budget gepackt (Ranking, Dedup, Kürzen pro Quelle),
+    num_ctx ist das kleinste Fenster, in das der Prompt passt.
+    Wiederholte Fragen mit demselben Kontext kommen aus dem semantischen
+    Antwort-Cache statt aus dem LLM. on_token bekommt beim Streaming jedes Token.
+    query_vector spart das erneute Embedding (Batch-Modus), stream überschreibt OLLAMA_STREAM.
+    """
+    with tracing.span("pack_context", hits=len(hits)) as s:
+        packed = pack_context(hits, lambda docs: build_prompt(query, docs))
+        s.set(docs=len(packed.docs), prompt_tokens=packed.prompt_tokens, num_ctx=packed.num_ctx)
+    docs = packed.docs
+    logger.info(
+        "Kontext: %s Blöcke, ~%s Tokens, num_ctx=%s (Duplikate=%s, Budget=%s, gekürzt=%s)",
+        len(docs),
+        packed.prompt_tokens,
+        packed.num_ctx,
+        packed.dropped_duplicates,
+        packed.dropped_budget,
+        packed.trimmed,
+    )
+
+    cache = get_answer_cache()
+    vector = query_vector
+    if cache is not None:
+        with tracing.span("answer_cache") as s:
+            if vector is None:
+                # Query-Embedding liegt nach dem Retrieval bereits im Embedding-Cache
+                vector = get_embeddings().embed_query(query)
+            cached = cache.get(ollama_cfg.model, vector, docs)
+            s.set(hit=cached is not None)
+        if cached is not None:
+            if on_token:
+                on_token(cached)
+            return AnswerResult(cached, True, docs, packed.num_ctx, packed.scores)
+
+    with tracing.span("build_prompt"):
+        prompt = build_prompt(query, docs)
+    stream = ollama_cfg.stream if stream is None else stream
+    with tracing.span("ollama", stream=stream, num_ctx=packed.num_ctx):
+        if stream:
+            tokens = []
+            for token in ask_ollama_stream(prompt, num_ctx=packed.num_ctx):
+                tokens.append(token)
+                if on_token:
+                    on_token(token)
+            answer = "".join(tokens)
+        else:
+            answer = ask_ollama(prompt, num_ctx=packed.num_ctx)
+            if on_token:
+                on_token(answer)
+
+    if cache is not None:
+        cache.put(ollama_cfg.model, vector, docs, answer)
+    return AnswerResult(answer, False, docs, packed.num_ctx, packed.scores)
+
+
+def load_questions(path: str) -> list[dict]:
+    """
+    Fragen für den Batch-Modus: .jsonl mit "question" (oder "query") und optional "id",
+    sonst Textdatei mit einer Frage pro Zeile (leere Zeilen und #-Kommentare werden übersprungen).
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                row = json.loads(line)
+                text = row.get("question") or row.get("query")
+                if not text:
+                    raise ValueError(f"{path}:{n}: Feld 'question' fehlt")
+                questions.append({"id": str(row.get("id", n)), "question": text})
+            else:
+                questions.append({"id": str(n), "question": line})
+    return questions
+
+
+def run_batch(
+    path: str,
+    out_path: str,
+    k_inc: int = 3,
+    k_kb: int = 3,
+    batch_size: int = 64,
+    concurrency: int | None = None,
+    mode: str | None = None,
+) -> int:
+    """
+    Beantwortet alle Fragen aus path in einem Prozess: Retrieval als Batch,
+    danach höchstens concurrency (OLLAMA_CONCURRENCY) Ollama-Requests gleichzeitig.
+    Schreibt pro Frage eine JSONL-Zeile (Antwort, zitierte IDs, Timings) in Eingabereihenfolge;
+    Fehler einzelner Fragen landen im Feld "error", der Lauf geht weiter. Liefert die Anzahl Fehler.
+    """
+    questions = load_questions(path)
+    if not questions:
+        logger.warning("Keine Fragen in %s", path)
+        return 0
+    concurrency = concurrency or ollama_cfg.concurrency
+
+    timings: dict[str, float] = {}
+    texts = [q["question"] for q in questions]
+    with tracing.span("retrieve_batch", questions=len(texts)):
+        results, vectors = retrieve_batch_with_scores(
+            texts, k_inc=k_inc, k_kb=k_kb, batch_size=batch_size, mode=mode, timings=timings
+        )
+    logger.info(
+        "Retrieval für %s Fragen: Embedding %.2fs, Suche %.2fs",
+        len(texts), timings["embed"], timings["search"],
+    )
+    # Embedding und Suche laufen für alle Fragen gemeinsam, pro Frage anteilig ausgewiesen
+    retrieve_ms = (timings["embed"] + timings["search"]) * 1000 / len(texts)
+
+    def answer(item) -> dict:
+        question, hits, vector = item
+        record = {"id": question["id"], "question": question["question"]}
+        t0 = time.perf_counter()
+        try:
+            # Pool-Threads haben keinen Eltern-Span: jede Frage wird ein eigener Trace
+            with tracing.span("generate", question_id=question["id"]):
+                result = generate_answer(question["question"], hits, query_vector=vector, stream=False)
+        except Exception as e:
+            logger.exception("Frage %s fehlgeschlagen", question["id"])
+            record["error"] = str(e)
+        else:
+            record.update(
+                answer=result.text,
+                from_cache=result.from_cache,
+                num_ctx=result.num_ctx,
+                cited_ids=[d.metadata.get("ticket_id") or d.metadata.get("kb_id") for d in result.docs],
+            )
+        record["timings_ms"] = {
+            "retrieve": round(retrieve_ms, 1),
+            "generate": round((time.perf_counter() - t0) * 1000, 1),
+        }
+        return record
+
+    errors = 0
+    t0 = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ollama") as pool:
+        # map liefert in Eingabereihenfolge; jede Zeile wird sofort geschrieben
+        for record in pool.map(answer, zip(questions, results, vectors)):
+            errors += "error" in record
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+    logger.info(
+        "%s Antworten in %.1fs nach %s geschrieben (%s Fehler)",
+        len(questions), time.perf_counter() - t0, out_path, errors,
+    )
+    return errors
 
 
 def main():
-    import sys
-    query = " ".join(sys.argv[1:]) if len(sys.argv) > 1 else "VPN bricht nach 5 Minuten ab"
-    docs = retrieve_incidents_and_kb(query)
-    prompt = build_prompt(query, docs)
-    answer = ask_ollama(prompt)
-
-    print("=== Frage ===")
-    print(query)
-    print("\n=== Antwort ===")
-    print(answer)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="RAG-Demo: Frage beantworten oder Fragen-Batch abarbeiten")
+    parser.add_argument("query", nargs="*", help="Frage (ohne --batch)")
+    parser.add_argument("--batch", metavar="FILE", help="questions.txt (eine Frage pro Zeile) oder .jsonl")
+    parser.add_argument("--out", help="Ausgabe-JSONL im Batch-Modus (Standard: <FILE>.answers.jsonl)")
+    parser.add_argument("--k-inc", type=int, default=3)
+    parser.add_argument("--k-kb", type=int, default=3)
+    parser.add_argument("--mode", choices=("dense", "hybrid", "server_hybrid"), default=None)
+    parser.add_argument("--batch-size", type=int, default=64, help="Fragen pro Embedding-/Such-Request")
+    parser.add_argument("--concurrency", type=int, default=None, help="parallele Ollama-Requests")
+    args = parser.parse_args()
+
+    if args.batch:
+        out_path = args.out or os.path.splitext(args.batch)[0] + ".answers.jsonl"
+        errors = run_batch(args.batch, out_path, k_inc=args.k_inc, k_kb=args.k_kb,
+                           batch_size=args.batch_size, concurrency=args.concurrency, mode=args.mode)
+        raise SystemExit(1 if errors else 0)
+
+    query = " ".join(args.query) if args.query else "VPN bricht nach 5 Minuten ab"
+    with tracing.span("query"):
+        with tracing.span("retrieve"):
+            hits = retrieve_incidents_and_kb_with_scores(query, k_inc=args.k_inc, k_kb=args.k_kb, mode=args.mode)
+
+        print("=== Frage ===")
+        print(query)
+        print("\n=== Antwort ===")
+        t0 = time.perf_counter()
+        with tracing.span("generate"):
+            result = generate_answer(query, hits, on_token=lambda t: print(t, end="", flush=True))
+    print()
+    if result.from_cache:
+        print(f"(aus Antwort-Cache, {(time.perf_counter() - t0) * 1000:.1f} ms)")
     print("\n=== Verwendete Kontexte (IDs) ===")
-    for d in docs:
+    for d in result.docs:
         print(d.metadata.get("source"), d.metadata.get("ticket_id") or d.metadata.get("kb_id"))
 
 
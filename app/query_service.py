@@ -0,0 +1,347 @@
+"""
+Resident Query-Service: ein langlebiger Prozess um Retrieval + Prompt + Ollama.
+Clients (Qdrant, Embeddings, BM25-Index) werden beim Start aufgebaut und
+wiederverwendet, das Ollama-Modell wird vorgeladen und per keep_alive gehalten.
+
+Endpoints:
+  POST /query     {"query": "...", "k_inc": 3, "k_kb": 3, "mode": "dense", "filter": {"status": "Gelöst"}}
+  GET  /healthz   Bereitschaft (200) bzw. 503 während/nach fehlgeschlagenem Warm-up
+  GET  /metrics   Zähler und Latenzen im Prometheus-Textformat
+
+Aufruf:
+  python -m app.query_service
+  python -m app.query_service --port 8090 --no-preload
+"""
+
+import argparse
+import json
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bin import tracing
+from bin.config import RetrievalConfig, ServiceConfig
+from bin.logging_utils import get_logger
+from .answer_cache import get_answer_cache
+from .filters import IncidentFilter
+from .query_demo import generate_answer, preload_ollama, retrieve_incidents_and_kb_with_scores
+from .vectorstore import close_vectorstores, get_embeddings, get_lexical_index, get_vectorstore
+
+logger = get_logger("query_service")
+
+# Felder aus dem Request-JSON, die auf IncidentFilter abgebildet werden
+_TEXT_FILTER_FIELDS = ("status", "category")
+_INT_FILTER_FIELDS = ("max_impact", "max_urgency", "max_age_days")
+_MODES = ("dense", "hybrid", "server_hybrid")
+# Obergrenze für k pro Collection
+_MAX_K = 50
+
+
+def _int_field(payload: dict, key: str, default: int, upper: int) -> int:
+    value = payload.get(key, default)
+    # bool ist in Python ein int, als k aber sicher ein Client-Fehler
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= upper:
+        raise ValueError(f"'{key}' muss eine ganze Zahl zwischen 0 und {upper} sein")
+    return value
+
+
+def _parse_filter(raw) -> IncidentFilter | None:
+    if raw is None:
+        return None
+    if not isinstance(raw, dict):
+        raise ValueError("'filter' muss ein Objekt sein")
+    unknown = set(raw) - set(_TEXT_FILTER_FIELDS) - set(_INT_FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unbekannte Filterfelder: {', '.join(sorted(unknown))}")
+
+    args = {}
+    for key in _TEXT_FILTER_FIELDS:
+        value = raw.get(key)
+        if value is None:
+            continue
+        if isinstance(value, str):
+            args[key] = value
+        elif isinstance(value, list) and value and all(isinstance(v, str) for v in value):
+            args[key] = value
+        else:
+            raise ValueError(f"filter.{key} muss ein String oder eine Liste von Strings sein")
+    for key in _INT_FILTER_FIELDS:
+        if raw.get(key) is not None:
+            args[key] = _int_field(raw, key, 0, 10_000)
+    return IncidentFilter(**args) if args else None
+
+
+def parse_request(payload) -> dict:
+    """
+    Prüft das Request-JSON und liefert die Argumente für das Retrieval.
+    Ungültige Eingaben -> ValueError (vom Handler als 400 beantwortet).
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Request muss ein JSON-Objekt sein")
+    query = payload.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("query fehlt")
+    mode = payload.get("mode")
+    if mode is not None and mode not in _MODES:
+        raise ValueError(f"'mode' muss einer von {', '.join(_MODES)} sein")
+
+    cfg = RetrievalConfig()
+    return {
+        "query": query.strip(),
+        "k_inc": _int_field(payload, "k_inc", cfg.k_inc, _MAX_K),
+        "k_kb": _int_field(payload, "k_kb", cfg.k_kb, _MAX_K),
+        "inc_filter": _parse_filter(payload.get("filter")),
+        "mode": mode,
+    }
+
+
+class ServiceMetrics:
+    """
+    Thread-sichere Zähler für /metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: dict[str, int] = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.latency_sum: dict[str, float] = {}
+        self.latency_count: dict[str, int] = {}
+
+    def count(self, status: int) -> None:
+        with self._lock:
+            key = str(status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.latency_sum[stage] = self.latency_sum.get(stage, 0.0) + seconds
+            self.latency_count[stage] = self.latency_count.get(stage, 0) + 1
+
+    def add(self, name: str, delta: int) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            lines.append("# TYPE query_service_requests_total counter")
+            for status, n in sorted(self.requests.items()):
+                lines.append(f'query_service_requests_total{{status="{status}"}} {n}')
+            lines.append("# TYPE query_service_in_flight gauge")
+            lines.append(f"query_service_in_flight {self.in_flight}")
+            lines.append("# TYPE query_service_queued gauge")
+            lines.append(f"query_service_queued {self.queued}")
+            lines.append("# TYPE query_service_stage_seconds summary")
+            for stage in sorted(self.latency_sum):
+                lines.append(f'query_service_stage_seconds_sum{{stage="{stage}"}} {self.latency_sum[stage]:.6f}')
+                lines.append(f'query_service_stage_seconds_count{{stage="{stage}"}} {self.latency_count[stage]}')
+
+        answer_cache = get_answer_cache()
+        if answer_cache is not None:
+            stats = answer_cache.stats()
+            lines.append("# TYPE query_service_answer_cache_hits_total counter")
+            lines.append(f"query_service_answer_cache_hits_total {stats['hits']}")
+            lines.append(f"query_service_answer_cache_misses_total {stats['misses']}")
+        embedding_stats = get_embeddings().cache_stats()
+        if embedding_stats:
+            lines.append("# TYPE query_service_embedding_cache_hits_total counter")
+            lines.append(f"query_service_embedding_cache_hits_total {embedding_stats.get('hits', 0)}")
+            lines.append(f"query_service_embedding_cache_misses_total {embedding_stats.get('misses', 0)}")
+        return "\n".join(lines) + "\n"
+
+
+class QueryService:
+    """
+    Begrenzte Nebenläufigkeit: höchstens max_concurrency Requests generieren gleichzeitig,
+    bis zu queue_size weitere warten; alles darüber wird sofort mit 503 abgewiesen.
+    """
+
+    def __init__(self, cfg: ServiceConfig | None = None, preload: bool = True):
+        self.cfg = cfg or ServiceConfig()
+        self.preload = preload
+        self.metrics = ServiceMetrics()
+        self.ready = False
+        self._admission = threading.BoundedSemaphore(self.cfg.max_concurrency + self.cfg.queue_size)
+        self._workers = threading.BoundedSemaphore(self.cfg.max_concurrency)
+
+    def warm_up(self) -> None:
+        t0 = time.perf_counter()
+        get_vectorstore("incidents")
+        get_vectorstore("kb")
+        # Embedding-Session öffnen und erste Verbindung aufbauen
+        get_embeddings().embed_query("warm-up")
+        if RetrievalConfig().mode == "hybrid":
+            get_lexical_index("incidents")
+            get_lexical_index("kb")
+        get_answer_cache()
+        if self.preload:
+            # Ohne Ollama bleibt der Service nutzbar (Cache-Treffer), der erste Call lädt dann das Modell
+            try:
+                preload_ollama()
+            except Exception as e:
+                logger.warning("Ollama-Preload fehlgeschlagen: %s", e)
+        self.ready = True
+        logger.info("Warm-up abgeschlossen in %.2fs", time.perf_counter() - t0)
+
+    def answer(self, payload: dict) -> tuple[int, dict]:
+        try:
+            request = parse_request(payload)
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+
+        if not self._admission.acquire(blocking=False):
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Service ausgelastet, bitte später erneut versuchen"}
+        try:
+            t_queue = time.perf_counter()
+            self.metrics.add("queued", 1)
+            got_worker = self._workers.acquire(timeout=self.cfg.queue_timeout)
+            self.metrics.add("queued", -1)
+            if not got_worker:
+                return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Zeitüberschreitung in der Warteschlange"}
+            queue_s = time.perf_counter() - t_queue
+
+            self.metrics.add("in_flight", 1)
+            try:
+                with tracing.span("request", queue_ms=round(queue_s * 1000, 1)):
+                    return HTTPStatus.OK, self._answer(request, queue_s)
+            finally:
+                self.metrics.add("in_flight", -1)
+                self._workers.release()
+        finally:
+            self._admission.release()
+
+    def _answer(self, request: dict, queue_s: float) -> dict:
+        query = request["query"]
+        t0 = time.perf_counter()
+        with tracing.span("retrieve"):
+            hits = retrieve_incidents_and_kb_with_scores(
+                query,
+                k_inc=request["k_inc"],
+                k_kb=request["k_kb"],
+                inc_filter=request["inc_filter"],
+                mode=request["mode"],
+            )
+        retrieve_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with tracing.span("generate"):
+            result = generate_answer(query, hits)
+        generate_s = time.perf_counter() - t0
+
+        self.metrics.observe("queue", queue_s)
+        self.metrics.observe("retrieve", retrieve_s)
+        self.metrics.observe("generate", generate_s)
+        return {
+            "answer": result.text,
+            "from_cache": result.from_cache,
+            "num_ctx": result.num_ctx,
+            "contexts": [
+                {
+                    "source": d.metadata.get("source"),
+                    "id": d.metadata.get("ticket_id") or d.metadata.get("kb_id"),
+                    "score": score,
+                }
+                for d, score in zip(result.docs, result.scores)
+            ],
+            "timings_ms": {
+                "queue": round(queue_s * 1000, 1),
+                "retrieve": round(retrieve_s * 1000, 1),
+                "generate": round(generate_s * 1000, 1),
+            },
+        }
+
+
+def _handler(service: QueryService) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: str, content_type: str) -> None:
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            service.metrics.count(status)
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            self._send(status, json.dumps(payload, ensure_ascii=False), "application/json; charset=utf-8")
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                if service.ready:
+                    self._send_json(HTTPStatus.OK, {"status": "ok"})
+                else:
+                    self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"status": "starting"})
+            elif self.path == "/metrics":
+                self._send(HTTPStatus.OK, service.metrics.render(), "text/plain; version=0.0.4")
+            else:
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/query":
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except (ValueError, json.JSONDecodeError):
+                self._send_json(HTTPStatus.BAD_REQUEST, {"error": "ungültiges JSON"})
+                return
+            try:
+                status, body = service.answer(payload)
+            except Exception as e:
+                logger.exception("Fehler bei /query")
+                status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+            self._send_json(status, body)
+
+        def log_message(self, fmt, *args):
+            logger.debug("%s - %s", self.address_string(), fmt % args)
+
+    return Handler
+
+
+def create_server(service: QueryService) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((service.cfg.host, service.cfg.port), _handler(service))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident Query-Service")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--no-preload", action="store_true", help="Ollama-Modell nicht vorladen")
+    args = parser.parse_args()
+
+    cfg = ServiceConfig()
+    if args.host:
+        cfg.host = args.host
+    if args.port:
+        cfg.port = args.port
+
+    service = QueryService(cfg, preload=not args.no_preload)
+    server = create_server(service)
+    logger.info("Query-Service lauscht auf http://%s:%s", cfg.host, cfg.port)
+
+    # Warm-up im Hintergrund: /healthz meldet 503, bis alles bereit ist
+    def warm_up():
+        try:
+            service.warm_up()
+        except Exception:
+            logger.exception("Warm-up fehlgeschlagen")
+
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        close_vectorstores()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Sparse Term-Vektoren für Qdrant: lexikalische Treffer (Fehlercodes, Ticket-IDs ...)
+werden als benannter Sparse-Vektor neben dem Dense-Vektor gespeichert. Die IDF-Gewichtung
+übernimmt Qdrant (Modifier.IDF), die Fusion mit der Dense-Suche läuft serverseitig (RRF).
+"""
+
+import zlib
+from collections import Counter
+from typing import Sequence
+
+from langchain_core.documents import Document
+from langchain_qdrant import Qdrant
+from qdrant_client.http import models
+
+from .lexical import tokenize
+
+# Name des Sparse-Vektors in der Collection
+SPARSE_VECTOR_NAME = "text"
+
+# Sättigung der Termfrequenz wie bei BM25 (ohne Längennormierung)
+_K1 = 1.2
+
+
+def term_index(term: str) -> int:
+    # Stabil über Prozesse und Python-Versionen (anders als hash())
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def _sparse(weights: dict[int, float]) -> models.SparseVector:
+    indices = sorted(weights)
+    return models.SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+
+def document_sparse_vector(text: str) -> models.SparseVector:
+    """
+    Term-Gewichte eines Dokuments: gesättigte Termfrequenz tf * (k1 + 1) / (tf + k1).
+    """
+    weights: dict[int, float] = {}
+    for term, tf in Counter(tokenize(text)).items():
+        idx = term_index(term)
+        # Hash-Kollisionen sind selten; kollidierende Terme werden addiert
+        weights[idx] = weights.get(idx, 0.0) + tf * (_K1 + 1.0) / (tf + _K1)
+    return _sparse(weights)
+
+
+def query_sparse_vector(text: str) -> models.SparseVector:
+    weights: dict[int, float] = {}
+    for term in set(tokenize(text)):
+        idx = term_index(term)
+        weights[idx] = weights.get(idx, 0.0) + 1.0
+    return _sparse(weights)
+
+
+def sparse_vectors_config() -> dict[str, models.SparseVectorParams]:
+    return {SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)}
+
+
+def has_sparse_vectors(vs: Qdrant) -> bool:
+    info = vs.client.get_collection(vs.collection_name)
+    return SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {})
+
+
+def server_hybrid_search(
+    vs: Qdrant,
+    vector: Sequence[float],
+    query: str,
+    k: int = 4,
+    candidates: int = 20,
+    filter: models.Filter | None = None,
+    search_params: models.SearchParams | None = None,
+) -> list[tuple[Document, float]]:
+    """
+    Eine Qdrant-Query mit zwei Prefetches (Dense + Sparse) und serverseitiger
+    Reciprocal Rank Fusion. Der Filter gilt für beide Kandidatenlisten.
+    """
+    response = vs.client.query_points(
+        collection_name=vs.collection_name,
+        prefetch=[
+            models.Prefetch(
+                query=list(vector),
+                using=vs.vector_name,
+                filter=filter,
+                params=search_params,
+                limit=max(k, candidates),
+            ),
+            models.Prefetch(
+                query=query_sparse_vector(query),
+                using=SPARSE_VECTOR_NAME,
+                filter=filter,
+                limit=max(k, candidates),
+            ),
+        ],
+        query=models.FusionQuery(fusion=models.Fusion.RRF),
+        limit=k,
+        with_payload=True,
+    )
+    return [
+        (
+            vs._document_from_scored_point(
+                point, vs.collection_name, vs.content_payload_key, vs.metadata_payload_key
+            ),
+            point.score,
+        )
+        for point in response.points
+    ]
@@ -0,0 +1,58 @@
+# app/test_answer_cache.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.documents import Document
+
+from app.answer_cache import AnswerCache
+
+
+def _docs(*texts: str) -> list[Document]:
+    return [
+        Document(page_content=t, metadata={"source": "kb", "kb_id": f"KB-{i}", "_id": f"p{i}"})
+        for i, t in enumerate(texts)
+    ]
+
+
+def test_similar_query_with_same_docs_hits():
+    cache = AnswerCache(":memory:", threshold=0.95)
+    docs = _docs("VPN neu verbinden", "Client aktualisieren")
+    cache.put("m", [1.0, 0.0, 0.0], docs, "Antwort")
+
+    assert cache.get("m", [0.99, 0.05, 0.0], list(reversed(docs))) == "Antwort"
+    # anderes Modell, unähnliche Query oder geänderter Dokumentinhalt: kein Treffer
+    assert cache.get("other", [1.0, 0.0, 0.0], docs) is None
+    assert cache.get("m", [0.0, 1.0, 0.0], docs) is None
+    assert cache.get("m", [1.0, 0.0, 0.0], _docs("VPN neu verbinden", "geändert")) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_ttl_lru_and_invalidate():
+    cache = AnswerCache(":memory:", ttl_s=0.0)
+    cache.put("m", [1.0, 0.0], _docs("a"), "x")
+    assert cache.get("m", [1.0, 0.0], _docs("a")) is None
+
+    cache = AnswerCache(":memory:", max_entries=2)
+    cache.put("m", [1.0, 0.0], _docs("a"), "eins")
+    cache.put("m", [0.0, 1.0], _docs("b"), "zwei")
+    assert cache.get("m", [1.0, 0.0], _docs("a")) == "eins"
+    cache.put("m", [1.0, 1.0], _docs("c"), "drei")
+    assert len(cache) == 2
+    assert cache.get("m", [0.0, 1.0], _docs("b")) is None
+
+    assert cache.invalidate(["p0"]) == 2
+    assert len(cache) == 0
+
+
+def test_counters_are_exact_under_concurrent_lookups():
+    cache = AnswerCache(":memory:")
+    docs = _docs("VPN neu verbinden")
+    cache.put("m", [1.0, 0.0], docs, "Antwort")
+
+    def lookup(i):
+        return cache.get("m", [1.0, 0.0] if i % 2 else [0.0, 1.0], docs)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lookup, range(400)))
+
+    assert cache.stats() == {"hits": 200, "misses": 200, "hit_rate": 0.5}
@@ -0,0 +1,69 @@
+# app/test_context_packer.py
+
+from langchain_core.documents import Document
+
+from app.context_packer import estimate_tokens, pack_context, trim_to_tokens
+from bin.config import ContextConfig
+
+
+def _prompt(docs):
+    return "Kontext:\n" + "\n\n-----\n\n".join(d.page_content for d in docs) + "\nFrage: x"
+
+
+def _incident(tid: str, text: str) -> Document:
+    return Document(page_content=text, metadata={"source": "incident", "ticket_id": tid})
+
+
+def test_estimate_and_trim():
+    text = "VPN-Verbindung bricht nach 5 Minuten ab. " * 50
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(text) > len(text.split())
+
+    trimmed = trim_to_tokens(text, 40)
+    assert trimmed.endswith(" …")
+    assert estimate_tokens(trimmed) <= 41
+    assert trim_to_tokens("kurz", 40) == "kurz"
+
+
+def test_pack_dedups_trims_and_picks_num_ctx():
+    cfg = ContextConfig(budget_incident=50, budget_kb=50, num_ctx_options=(512, 1024, 2048),
+                        answer_reserve=100, dedup_threshold=0.9)
+    long_text = "Drucker im dritten Stock druckt nur leere Seiten " * 40
+    hits = [
+        (_incident("INC-3", long_text), 0.9),
+        (_incident("INC-1", "VPN bricht nach 5 Minuten ab, Client neu installiert"), 0.7),
+        (_incident("INC-2", "VPN bricht nach 5 Minuten ab, Client neu installiert"), 0.6),
+    ]
+
+    packed = pack_context(hits, _prompt, cfg)
+
+    assert [d.metadata["ticket_id"] for d in packed.docs] == ["INC-3", "INC-1"]
+    assert packed.dropped_duplicates == 1
+    assert packed.trimmed == 1
+    assert packed.num_ctx == 512
+    assert packed.prompt_tokens + cfg.answer_reserve <= packed.num_ctx
+
+
+def test_pack_respects_largest_window():
+    cfg = ContextConfig(budget_incident=300, budget_kb=300, num_ctx_options=(512,),
+                        answer_reserve=100, dedup_threshold=0.9)
+    hits = [(_incident(f"INC-{i}", f"Fehler {i} " + "wort " * 300), 1.0 - i / 10) for i in range(5)]
+
+    packed = pack_context(hits, _prompt, cfg)
+
+    assert packed.dropped_budget >= 1
+    assert packed.prompt_tokens + cfg.answer_reserve <= 512
+
+
+def test_pack_keeps_retrieval_order_for_distance_scores():
+    # Euclid: kleinere Distanz ist besser, der Retriever liefert den besten Treffer zuerst
+    cfg = ContextConfig(budget_incident=300, budget_kb=300, num_ctx_options=(512,),
+                        answer_reserve=100, dedup_threshold=0.9)
+    hits = [(_incident(f"INC-{i}", f"Fehler {i} " + "wort " * 150), 0.1 + i) for i in range(3)]
+
+    packed = pack_context(hits, _prompt, cfg)
+
+    # der schlechteste Treffer (grösste Distanz) fällt aus dem Budget, nicht der beste
+    assert packed.dropped_budget == 1
+    assert [d.metadata["ticket_id"] for d in packed.docs] == ["INC-0", "INC-1"]
+    assert packed.scores == [0.1, 1.1]
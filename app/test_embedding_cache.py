@@ -0,0 +1,63 @@
+# app/test_embedding_cache.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+from bin.config import EmbeddingConfig
+from app.embedding_cache import EmbeddingCache
+from app.embeddings import Embeddings
+
+
+class _CountingEmbeddings(Embeddings):
+    """Embeddings ohne HTTP: merkt sich, welche Texte angefragt wurden."""
+
+    def __init__(self, cache: EmbeddingCache):
+        super().__init__(EmbeddingConfig(cache_enabled=False), cache=cache)
+        self.requested: list[list[str]] = []
+
+    def _post(self, texts):
+        self.requested.append(list(texts))
+        return [[float(len(t)), 1.0, 0.5] for t in texts]
+
+
+def test_only_misses_are_requested(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite"), max_entries=100)
+    emb = _CountingEmbeddings(cache)
+
+    first = emb.embed_documents(["a", "bb", "a"])
+    assert emb.requested == [["a", "bb"]]
+    assert first == [[1.0, 1.0, 0.5], [2.0, 1.0, 0.5], [1.0, 1.0, 0.5]]
+
+    second = emb.embed_documents(["ccc", "bb", "a"])
+    assert emb.requested[-1] == ["ccc"]
+    assert second == [[3.0, 1.0, 0.5], [2.0, 1.0, 0.5], [1.0, 1.0, 0.5]]
+
+    assert cache.hits == 2
+    assert cache.misses == 4
+
+
+def test_lru_eviction(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite"), max_entries=2)
+    cache.put_many("m", ["a"], [[1.0]])
+    cache.put_many("m", ["b"], [[2.0]])
+    # "a" anfassen, damit "b" der älteste Eintrag ist
+    cache.get_many("m", ["a"])
+    cache.put_many("m", ["c"], [[3.0]])
+
+    assert len(cache) == 2
+    assert cache.get_many("m", ["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+
+def test_key_includes_model(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite"))
+    cache.put_many("model-a", ["text"], [[1.0]])
+    assert cache.get_many("model-b", ["text"]) == [None]
+
+
+def test_counters_are_exact_under_concurrent_lookups(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite"))
+    cache.put_many("m", ["a"], [[1.0]])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: cache.get_many("m", ["a", "b"]), range(400)))
+
+    assert cache.stats() == {"hits": 400, "misses": 400, "hit_rate": 0.5}
@@ -0,0 +1,52 @@
+# app/test_filters.py
+
+from datetime import datetime, timedelta, timezone
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from app.filters import IncidentFilter
+from app.provision import PAYLOAD_INDEXES, provision_collection
+
+
+def _iso(days_ago: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def test_empty_filter_compiles_to_none():
+    assert IncidentFilter().to_qdrant() is None
+
+
+def test_incident_filter_in_qdrant():
+    client = QdrantClient(":memory:")
+    provision_collection(client, "inc", 2, payload_indexes=PAYLOAD_INDEXES["incidents"])
+
+    rows = [
+        ("INC-1", "Gelöst", "Network", 1, _iso(10)),
+        ("INC-2", "Offen", "Network", 1, _iso(10)),
+        ("INC-3", "Gelöst", "Hardware", 2, _iso(10)),
+        ("INC-4", "Gelöst", "Network", 3, _iso(200)),
+        ("INC-5", "Gelöst", "Network", 3, _iso(5)),
+    ]
+    client.upsert(
+        "inc",
+        points=[
+            models.PointStruct(
+                id=i,
+                vector=[1.0, 0.1 * i],
+                payload={"metadata": {
+                    "ticket_id": tid, "status": status, "category": category,
+                    "impact": impact, "created_at": created_at,
+                }},
+            )
+            for i, (tid, status, category, impact, created_at) in enumerate(rows)
+        ],
+    )
+
+    flt = IncidentFilter(status="Gelöst", category=["Network"], max_age_days=90)
+    hits = client.query_points("inc", query=[1.0, 0.0], query_filter=flt.to_qdrant(), limit=10).points
+    assert {h.payload["metadata"]["ticket_id"] for h in hits} == {"INC-1", "INC-5"}
+
+    flt = IncidentFilter(status="Gelöst", max_impact=2)
+    hits = client.query_points("inc", query=[1.0, 0.0], query_filter=flt.to_qdrant(), limit=10).points
+    assert {h.payload["metadata"]["ticket_id"] for h in hits} == {"INC-1", "INC-3"}
@@ -0,0 +1,98 @@
+# app/test_lexical.py
+
+import json
+
+from langchain_core.documents import Document
+
+from app.filters import IncidentFilter
+from app.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def _doc(ticket_id: str, text: str, status: str = "Gelöst") -> Document:
+    return Document(page_content=text, metadata={"ticket_id": ticket_id, "status": status})
+
+
+def _index() -> BM25Index:
+    index = BM25Index()
+    index.add("p1", _doc("INC-1", "Browser meldet ERR_PROXY_CONNECTION_FAILED nach Update"))
+    index.add("p2", _doc("INC-2", "Drucker im 3. OG druckt nicht, Fehler COMP-128503", status="Offen"))
+    index.add("p3", _doc("INC-3", "VPN-Verbindung bricht ab, Proxy-Einstellungen geprüft"))
+    index.add("p4", _doc("INC-4", "Passwort für Outlook zurücksetzen"))
+    return index
+
+
+def test_tokenize_keeps_technical_tokens():
+    tokens = tokenize("Fehler ERR_PROXY_CONNECTION_FAILED bei KB-55699635 für Größe")
+    assert "err_proxy_connection_failed" in tokens
+    assert "proxy" in tokens
+    assert "kb-55699635" in tokens and "55699635" in tokens
+    assert "fuer" not in tokens
+    assert "groesse" in tokens or "groess" in tokens
+
+
+def test_singular_and_plural_share_a_stem():
+    pairs = [
+        ("Verbindung", "Verbindungen"),
+        ("Drucker", "Druckers"),
+        ("Drucker", "Druckern"),
+        ("Netzwerk", "Netzwerkes"),
+        ("Netzwerk", "Netzwerks"),
+        ("Sicherheit", "Sicherheiten"),
+        ("Datei", "Dateien"),
+    ]
+    for singular, plural in pairs:
+        assert tokenize(singular) == tokenize(plural), (singular, plural)
+    # kein Plural-s: bleibt unverändert
+    assert tokenize("Status Prozess") == ["status", "prozess"]
+
+    index = _index()
+    assert index.search("Verbindungen", k=1)[0][0].metadata["ticket_id"] == "INC-3"
+    assert index.search("Druckers", k=1)[0][0].metadata["ticket_id"] == "INC-2"
+
+
+def test_load_rebuilds_index_from_older_tokenizer(tmp_path):
+    index = _index()
+    index.save(str(tmp_path))
+    docs_path = tmp_path / "docs.jsonl"
+    lines = docs_path.read_text(encoding="utf-8").splitlines()
+    header = json.loads(lines[0])
+    header.pop("tokenizer")
+    header["vocab"] = ["veraltet"] * len(header["vocab"])
+    docs_path.write_text("\n".join([json.dumps(header)] + lines[1:]) + "\n", encoding="utf-8")
+
+    loaded = BM25Index.load(str(tmp_path))
+    assert loaded.search("Verbindungen", k=1)[0][0].metadata["ticket_id"] == "INC-3"
+    assert loaded.content_hash("p1") == index.content_hash("p1")
+
+
+def test_exact_identifier_ranks_first():
+    index = _index()
+    assert index.search("COMP-128503", k=1)[0][0].metadata["ticket_id"] == "INC-2"
+    assert index.search("err_proxy_connection_failed", k=1)[0][0].metadata["ticket_id"] == "INC-1"
+    assert index.search("gibt es nicht", k=3) == []
+
+
+def test_update_remove_filter_and_persistence(tmp_path):
+    index = _index()
+    index.add("p2", _doc("INC-2", "Drucker repariert", status="Gelöst"))
+    index.remove("p4")
+
+    assert len(index) == 3
+    assert index.search("COMP-128503", k=3) == []
+    assert index.search("outlook", k=3) == []
+
+    flt = IncidentFilter(status="Gelöst").to_qdrant()
+    assert {d.metadata["ticket_id"] for d, _ in index.search("proxy drucker", k=5, filter=flt)} == {
+        "INC-1", "INC-2", "INC-3"
+    }
+
+    expected = index.search("proxy drucker", k=5)
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    assert loaded.search("proxy drucker", k=5) == expected
+
+
+def test_reciprocal_rank_fusion():
+    a, b, c = (Document(page_content=x, metadata={"_id": x}) for x in "abc")
+    fused = reciprocal_rank_fusion([[(a, 0.9), (b, 0.8)], [(b, 12.0), (c, 3.0)]], k=60, limit=2)
+    assert [d.metadata["_id"] for d, _ in fused] == ["b", "a"]
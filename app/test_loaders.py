@@ -2,6 +2,7 @@
 
 from pathlib import Path
 from bin import config as cfg
+from app import loaders
 from app.loaders import load_incidents_csv, load_kb_csv
 
 # Verwende eine DataConfig-Instanz, damit die Pfad-Properties (inkl. DATA_DIR) greifen
@@ -62,6 +63,20 @@ def test_kb():
     print("✅ KB-Loader OK\n")
 
 
+def test_pandas_and_csv_paths_match(monkeypatch):
+    # Spaltenweiser pandas-Pfad und csv-Fallback müssen identische Dokumente liefern
+    sample = Path(cfg.BASE_DIR) / "generator" / "output" / "synthetic_incidents_with_kb_test.csv"
+
+    vectorized = load_incidents_csv(str(sample))
+    monkeypatch.setattr(loaders, "pd", None)
+    fallback = load_incidents_csv(str(sample))
+
+    assert len(vectorized) == 3
+    assert vectorized == fallback
+    assert vectorized[1].metadata["status"] == "Gelöst"
+    assert vectorized[1].metadata["resolved_at"] == ""
+
+
 def main():
     test_incidents()
     test_kb()
@@ -0,0 +1,73 @@
+# app/test_metrics_utils.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from bin import metrics_utils
+
+
+def _start(model: str) -> str:
+    return metrics_utils.start_run(
+        model=model, total_tickets=10, tickets_per_call=2, temperature=0.2, top_p=0.9,
+        ctx_tokens=4096, repeat_penalty=1.1, seed=42, num_predict=256,
+    )
+
+
+def test_parallel_runs_keep_separate_counters():
+    first = metrics_utils.create_run(model="a")
+    second = metrics_utils.create_run(model="b")
+
+    def work(i):
+        run = first if i % 2 else second
+        run.record(batch_size=1, duration=0.5, eval_tokens=10, prompt_tokens=5)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(work, range(400)))
+
+    assert first.num_calls == second.num_calls == 200
+    assert first.total_eval_tokens == 2000
+    assert first.total_llm_time == pytest.approx(100.0)
+
+    summary = metrics_utils.end_run(first.run_id)
+    assert summary["calls"] == 200
+    assert metrics_utils.get_run(first.run_id) is None
+    assert second.run_id in metrics_utils.active_runs()
+    metrics_utils.end_run(second.run_id)
+
+
+def test_run_as_context_manager_reports_percentiles():
+    with metrics_utils.create_run(model="m") as run:
+        for duration in range(1, 101):
+            run.record(batch_size=1, duration=float(duration), eval_tokens=100, prompt_tokens=10)
+        summary = run.summary()
+
+    assert run.run_id not in metrics_utils.active_runs()
+    assert summary["duration_p50"] == pytest.approx(50.5)
+    assert summary["duration_p95"] == pytest.approx(95.05)
+    assert summary["duration_p99"] == pytest.approx(99.01)
+    tokens_per_second = [100 / d for d in range(1, 101)]
+    assert summary["tokens_per_second_p50"] == pytest.approx(np.percentile(tokens_per_second, 50))
+    assert summary["tokens_per_second_p99"] == pytest.approx(np.percentile(tokens_per_second, 99))
+
+
+def test_module_level_api_stays_compatible():
+    run_id = _start("legacy")
+    metrics_utils.log_ollama_call(batch_size=2, duration=2.0, eval_tokens=40, prompt_tokens=20)
+    metrics_utils.log_ollama_call(batch_size=2, duration=4.0, eval_tokens=40, prompt_tokens=20)
+
+    # ein zweiter start_run überschreibt den ersten nicht mehr
+    other_id = _start("other")
+    assert {run_id, other_id} <= set(metrics_utils.active_runs())
+    metrics_utils.log_ollama_call(batch_size=1, duration=1.0, eval_tokens=1, prompt_tokens=1)
+
+    summary = metrics_utils.end_run(run_id)
+    assert summary["calls"] == 2
+    assert summary["avg_tokens_per_second"] == pytest.approx(80 / 6)
+    assert metrics_utils.get_run(run_id) is None
+
+    assert metrics_utils.end_run()["calls"] == 1
+    assert metrics_utils.end_run() is None
+    # ohne aktiven Run nur eine Warnung
+    metrics_utils.log_ollama_call(batch_size=1, duration=1.0, eval_tokens=1, prompt_tokens=1)
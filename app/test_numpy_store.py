@@ -0,0 +1,116 @@
+# app/test_numpy_store.py
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.filters import IncidentFilter
+from app.numpy_store import NumpyVectorStore
+
+
+def _store(dtype: str = "float32") -> tuple[NumpyVectorStore, np.ndarray]:
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 8)).astype(np.float32)
+    docs = [
+        Document(
+            page_content=f"doc {i}",
+            metadata={
+                "ticket_id": f"INC-{i}",
+                "status": "Gelöst" if i % 2 == 0 else "Offen",
+                "impact": i % 3 + 1,
+                "created_at": "2025-12-05T08:24:08Z",
+            },
+        )
+        for i in range(50)
+    ]
+    store = NumpyVectorStore("inc", dtype=dtype)
+    store.upsert([f"id-{i}" for i in range(50)], vectors, docs)
+    return store, vectors
+
+
+def _brute_force(vectors: np.ndarray, query: np.ndarray, k: int) -> list[int]:
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normed @ (query / np.linalg.norm(query))
+    return list(np.argsort(-scores)[:k])
+
+
+def test_top_k_matches_brute_force():
+    store, vectors = _store()
+    query = vectors[7] + 0.1
+
+    hits = store.similarity_search_with_score_by_vector(query, k=5)
+
+    assert [d.metadata["ticket_id"] for d, _ in hits] == [f"INC-{i}" for i in _brute_force(vectors, query, 5)]
+    assert hits[0][1] >= hits[-1][1]
+
+
+def test_batch_search_equals_single_search():
+    store, vectors = _store()
+    batch = store.similarity_search_with_score_by_vectors(vectors[:3], k=4)
+    for query, hits in zip(vectors[:3], batch):
+        single = store.similarity_search_with_score_by_vector(query, k=4)
+        assert [d.metadata["_id"] for d, _ in hits] == [d.metadata["_id"] for d, _ in single]
+
+
+def test_filter_over_metadata_columns():
+    store, vectors = _store()
+    flt = IncidentFilter(status="Gelöst", max_impact=2).to_qdrant()
+
+    hits = store.similarity_search_with_score_by_vector(vectors[0], k=50, filter=flt)
+
+    assert hits
+    assert all(d.metadata["status"] == "Gelöst" and d.metadata["impact"] <= 2 for d, _ in hits)
+    assert len(hits) == sum(1 for i in range(50) if i % 2 == 0 and i % 3 + 1 <= 2)
+
+
+def test_save_load_mmap_and_upsert(tmp_path):
+    store, vectors = _store(dtype="float16")
+    store.save(str(tmp_path))
+
+    loaded = NumpyVectorStore.load(str(tmp_path), "inc", mmap=True)
+    assert len(loaded) == 50
+    assert loaded.dtype == np.float16
+    expected = store.similarity_search_with_score_by_vector(vectors[3], k=3)
+    assert loaded.similarity_search_with_score_by_vector(vectors[3], k=3) == expected
+
+    # Überschreiben nach mmap-Load und Löschen
+    loaded.upsert(["id-3"], [vectors[4]], [Document(page_content="neu", metadata={"ticket_id": "INC-3"})])
+    loaded.delete(["id-4"])
+    assert len(loaded) == 49
+    assert loaded.similarity_search_by_vector(vectors[4], k=1)[0].page_content == "neu"
+
+
+def test_many_small_upserts_grow_buffer_geometrically(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(3000, 8)).astype(np.float32)
+    store = NumpyVectorStore("inc")
+    capacities = set()
+    for start in range(0, 3000, 7):
+        rows = range(start, min(start + 7, 3000))
+        store.upsert([f"id-{i}" for i in rows], vectors[list(rows)],
+                     [Document(page_content=f"doc {i}", metadata={}) for i in rows])
+        capacities.add(store._buffer.shape[0])
+
+    # Verdoppeln: nur wenige Umkopien statt einer pro Batch
+    assert capacities == {1024, 2048, 4096}
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.testing.assert_allclose(store._vectors, normed, rtol=1e-6)
+
+    store.save(str(tmp_path))
+    loaded = NumpyVectorStore.load(str(tmp_path), "inc", mmap=True)
+    assert np.load(tmp_path / "vectors.npy").shape == (3000, 8)
+    loaded.upsert(["id-new"], [vectors[0]], [Document(page_content="neu", metadata={})])
+    assert len(loaded) == 3001
+    assert loaded.similarity_search_by_vector(vectors[5], k=1)[0].page_content == "doc 5"
+
+
+def test_duplicate_ids_in_one_batch_keep_last_copy():
+    vectors = np.eye(3, 8, dtype=np.float32)
+    docs = [Document(page_content=f"v{i}", metadata={}) for i in range(3)]
+
+    # leerer Store und Store mit vorhandenen Zeilen
+    for store in (NumpyVectorStore("inc"), _store()[0]):
+        before = len(store)
+        store.upsert(["dup", "other", "dup"], vectors, docs)
+        assert len(store) == before + 2
+        assert store.similarity_search_by_vector(vectors[2], k=1)[0].page_content == "v2"
+        assert store.similarity_search_by_vector(vectors[0], k=1)[0].page_content != "v0"
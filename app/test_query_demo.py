@@ -0,0 +1,135 @@
+# app/test_query_demo.py
+
+import json
+
+from langchain_core.documents import Document
+
+import app.query_demo as query_demo
+from app.answer_cache import AnswerCache
+from bin.config import ContextConfig
+
+
+class _StreamResponse:
+    """NDJSON-Antwort wie von Ollama mit stream=True."""
+
+    def __init__(self, chunks):
+        self._lines = [json.dumps(c).encode() for c in chunks]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        yield from self._lines
+
+
+def test_ask_ollama_stream_yields_tokens_and_logs_metrics(monkeypatch):
+    chunks = [
+        {"response": "VPN ", "done": False},
+        {"response": "neu ", "done": False},
+        {"response": "verbinden.", "done": False},
+        {"response": "", "done": True, "eval_count": 3, "prompt_eval_count": 42, "eval_duration": 1_500_000_000},
+    ]
+    recorded = {}
+    monkeypatch.setattr(query_demo.ollama_cfg, "url", "http://ollama.test/api/generate")
+    monkeypatch.setattr(query_demo.requests, "post", lambda url, **kw: _StreamResponse(chunks))
+    monkeypatch.setattr(query_demo, "log_stream_call", lambda **kw: recorded.update(kw))
+
+    tokens = list(query_demo.ask_ollama_stream("Frage"))
+
+    assert "".join(tokens) == "VPN neu verbinden."
+    assert recorded["eval_tokens"] == 3
+    assert recorded["prompt_tokens"] == 42
+    assert recorded["eval_duration_s"] == 1.5
+    assert 0 <= recorded["ttft_s"] <= recorded["total_s"]
+
+
+class _QueryEmbeddings:
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def test_generate_answer_uses_packed_context_and_cache(monkeypatch):
+    cache = AnswerCache(":memory:")
+    calls = []
+    monkeypatch.setattr(query_demo, "get_answer_cache", lambda: cache)
+    monkeypatch.setattr(query_demo, "get_embeddings", lambda: _QueryEmbeddings())
+    monkeypatch.setattr(query_demo.ollama_cfg, "stream", False)
+    monkeypatch.setattr(query_demo, "ask_ollama", lambda prompt, num_ctx: calls.append(num_ctx) or "Antwort")
+
+    hits = [(Document(page_content="VPN neu verbinden", metadata={"source": "kb", "kb_id": "KB-1", "_id": "p1"}), 0.9)]
+    first = query_demo.generate_answer("VPN bricht ab", hits)
+    again = query_demo.generate_answer("VPN bricht ab", hits)
+
+    assert (first.text, first.from_cache) == ("Antwort", False)
+    assert (again.text, again.from_cache) == ("Antwort", True)
+    assert calls == [first.num_ctx] and first.num_ctx in ContextConfig().num_ctx_options
+
+
+def test_run_batch_writes_answers_in_input_order(monkeypatch, tmp_path):
+    questions = tmp_path / "questions.jsonl"
+    questions.write_text(
+        "\n".join(json.dumps(q) for q in [
+            {"id": "q1", "question": "VPN bricht ab"},
+            {"id": "q2", "question": "Drucker offline"},
+            {"id": "q3", "question": "Outlook hängt"},
+        ]),
+        encoding="utf-8",
+    )
+    docs = {
+        text: Document(page_content=text, metadata={"source": "kb", "kb_id": f"KB-{i}"})
+        for i, text in enumerate(["VPN bricht ab", "Drucker offline", "Outlook hängt"], start=1)
+    }
+    retrieved = []
+
+    def fake_retrieve(texts, **kw):
+        retrieved.append(list(texts))
+        kw["timings"].update(embed=0.3, search=0.3)
+        return [[(docs[t], 1.0)] for t in texts], [[float(i)] for i in range(len(texts))]
+
+    def fake_generate(query, hits, query_vector=None, stream=None):
+        assert stream is False and query_vector is not None
+        if query == "Drucker offline":
+            raise RuntimeError("Ollama nicht erreichbar")
+        return query_demo.AnswerResult(f"Antwort: {query}", False, [d for d, _ in hits], 2048)
+
+    monkeypatch.setattr(query_demo, "retrieve_batch_with_scores", fake_retrieve)
+    monkeypatch.setattr(query_demo, "generate_answer", fake_generate)
+
+    out = tmp_path / "answers.jsonl"
+    errors = query_demo.run_batch(str(questions), str(out), concurrency=3)
+
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert errors == 1
+    assert retrieved == [["VPN bricht ab", "Drucker offline", "Outlook hängt"]]
+    assert [r["id"] for r in records] == ["q1", "q2", "q3"]
+    assert records[0]["cited_ids"] == ["KB-1"] and records[0]["answer"] == "Antwort: VPN bricht ab"
+    assert records[1]["error"] == "Ollama nicht erreichbar"
+    assert records[2]["timings_ms"]["retrieve"] == 200.0
+
+
+class _FakeStore:
+    def __init__(self, hits=None, error=None):
+        self.embeddings = _QueryEmbeddings()
+        self._hits = hits or []
+        self._error = error
+
+    def similarity_search_with_score_by_vector(self, vector, k, search_params=None, filter=None):
+        if self._error:
+            raise self._error
+        return self._hits
+
+
+def test_failing_collection_search_returns_partial_result(monkeypatch):
+    kb_hit = (Document(page_content="VPN neu verbinden", metadata={"source": "kb", "kb_id": "KB-1"}), 0.8)
+    stores = {"incidents": _FakeStore(error=ConnectionError("Qdrant weg")), "kb": _FakeStore(hits=[kb_hit])}
+    monkeypatch.setattr(query_demo, "get_vectorstore", stores.__getitem__)
+
+    hits = query_demo.retrieve_incidents_and_kb_with_scores("VPN bricht ab", mode="dense")
+
+    assert hits == [kb_hit]
@@ -0,0 +1,136 @@
+# app/test_query_service.py
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+from langchain_core.documents import Document
+
+import app.query_demo as query_demo
+import app.query_service as query_service
+from bin.config import ServiceConfig
+
+
+class _NoCacheEmbeddings:
+    def cache_stats(self):
+        return {}
+
+
+def _request(base, path, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(base + path, data=data, method="POST" if data else "GET")
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return resp.status, resp.read().decode()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode()
+
+
+@pytest.fixture
+def running_service(monkeypatch):
+    doc = Document(page_content="VPN neu verbinden", metadata={"source": "incident", "ticket_id": "INC-1"})
+    release = threading.Event()
+    release.set()
+    seen = {}
+
+    def fake_retrieve(query, k_inc, k_kb, inc_filter=None, mode=None):
+        seen.update(query=query, k_inc=k_inc, inc_filter=inc_filter, mode=mode)
+        return [(doc, 0.9)]
+
+    def fake_ollama(prompt, num_ctx):
+        release.wait(timeout=10)
+        return "Neu verbinden."
+
+    # generate_answer und pack_context laufen echt, nur Retrieval und Ollama sind ersetzt
+    monkeypatch.setattr(query_service, "retrieve_incidents_and_kb_with_scores", fake_retrieve)
+    monkeypatch.setattr(query_demo, "ask_ollama", fake_ollama)
+    monkeypatch.setattr(query_demo.ollama_cfg, "stream", False)
+    monkeypatch.setattr(query_demo, "get_answer_cache", lambda: None)
+    monkeypatch.setattr(query_service, "get_answer_cache", lambda: None)
+    monkeypatch.setattr(query_service, "get_embeddings", lambda: _NoCacheEmbeddings())
+
+    cfg = ServiceConfig(host="127.0.0.1", port=0, max_concurrency=1, queue_size=0, queue_timeout=5)
+    service = query_service.QueryService(cfg, preload=False)
+    server = query_service.create_server(service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        yield service, base, release, seen
+    finally:
+        release.set()
+        server.shutdown()
+        server.server_close()
+
+
+def test_healthz_reports_readiness(running_service):
+    service, base, _, _ = running_service
+    assert _request(base, "/healthz")[0] == 503
+    service.ready = True
+    status, body = _request(base, "/healthz")
+    assert status == 200
+    assert json.loads(body)["status"] == "ok"
+
+
+def test_query_returns_answer_contexts_and_timings(running_service):
+    _, base, _, seen = running_service
+    status, body = _request(
+        base, "/query", {"query": "VPN bricht ab", "k_inc": 2, "mode": "hybrid", "filter": {"status": "Gelöst"}}
+    )
+    assert status == 200
+    result = json.loads(body)
+    assert result["answer"] == "Neu verbinden."
+    assert result["contexts"] == [{"source": "incident", "id": "INC-1", "score": 0.9}]
+    assert set(result["timings_ms"]) == {"queue", "retrieve", "generate"}
+    assert seen["k_inc"] == 2 and seen["mode"] == "hybrid"
+    assert seen["inc_filter"].status == "Gelöst"
+
+    assert _request(base, "/query", {"query": " "})[0] == 400
+
+    status, metrics = _request(base, "/metrics")
+    assert status == 200
+    assert 'query_service_requests_total{status="200"} 1' in metrics
+    assert 'query_service_stage_seconds_count{stage="generate"} 1' in metrics
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"query": "VPN", "k_inc": "x"},
+        {"query": "VPN", "k_kb": -1},
+        {"query": "VPN", "k_inc": True},
+        {"query": "VPN", "mode": "sparse"},
+        {"query": "VPN", "filter": {"max_impact": "hoch"}},
+        {"query": "VPN", "filter": {"status": 3}},
+        {"query": "VPN", "filter": {"owner": "x"}},
+        {"query": "VPN", "filter": ["Gelöst"]},
+        ["VPN"],
+    ],
+)
+def test_invalid_input_is_rejected_with_400(running_service, payload):
+    _, base, _, seen = running_service
+    status, body = _request(base, "/query", payload)
+    assert status == 400
+    assert json.loads(body)["error"]
+    assert not seen
+
+
+def test_overload_is_rejected_with_503(running_service):
+    service, base, release, _ = running_service
+    release.clear()
+    blocked = threading.Thread(target=_request, args=(base, "/query", {"query": "erste"}))
+    blocked.start()
+    # warten, bis die erste Anfrage den einzigen Slot belegt
+    for _ in range(200):
+        if service.metrics.in_flight:
+            break
+        threading.Event().wait(0.01)
+
+    status, body = _request(base, "/query", {"query": "zweite"})
+    assert status == 503
+    assert "ausgelastet" in json.loads(body)["error"]
+
+    release.set()
+    blocked.join(timeout=10)
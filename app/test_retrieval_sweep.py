@@ -0,0 +1,49 @@
+# app/test_retrieval_sweep.py
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+import benchmark.retrieval_sweep as retrieval_sweep
+from benchmark.retrieval_sweep import build_grid
+
+
+def test_run_sweep_deletes_collections_when_a_point_fails(monkeypatch):
+    grid = build_grid([3], [5], [64], [False, True], [64], [1])
+    deleted = []
+
+    def fail_point(point, query_vectors_path, relevant):
+        raise RuntimeError("Qdrant weg")
+
+    monkeypatch.setattr(retrieval_sweep, "prepare_vectors", lambda *a: ("kb.npy", "q.npy", [{"KB-1"}]))
+    monkeypatch.setattr(retrieval_sweep, "ingest_variant", lambda q, b, *a: {"collection": f"q{int(q)}_b{b}"})
+    monkeypatch.setattr(retrieval_sweep, "run_point", fail_point)
+    monkeypatch.setattr(retrieval_sweep, "_delete_collections", deleted.extend)
+
+    with pytest.raises(RuntimeError):
+        retrieval_sweep.run_sweep(grid, "kb.csv", "eval.csv")
+
+    assert deleted == [(False, 64), (True, 64)]
+
+
+def test_run_point_reports_latency_per_request(monkeypatch, tmp_path):
+    client = QdrantClient(":memory:")
+    point = build_grid([3], [2], [64], [False], [64], [2])[0]
+    client.create_collection(
+        point.collection, vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE)
+    )
+    client.upsert(point.collection, points=[
+        models.PointStruct(id=i, vector=v, payload={"metadata": {"kb_id": f"KB-{i}"}})
+        for i, v in enumerate([[1.0, 0.0], [0.0, 1.0]])
+    ])
+    queries = tmp_path / "queries.npy"
+    np.save(queries, np.array([[1.0, 0.1], [0.1, 1.0], [1.0, 0.0]], dtype=np.float32))
+    monkeypatch.setattr(retrieval_sweep, "get_client", lambda: client)
+
+    row = retrieval_sweep.run_point(point, str(queries), [{"KB-0"}, {"KB-1"}, {"KB-0"}])
+
+    # 3 Queries in Batches zu 2: zwei Requests, Perzentile über deren Latenz
+    assert row["requests"] == 2 and row["query_batch_size"] == 2
+    assert row["request_p50_ms"] <= row["request_p95_ms"]
+    assert row["recall"] == 1.0
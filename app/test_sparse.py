@@ -0,0 +1,78 @@
+# app/test_sparse.py
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import Qdrant
+from qdrant_client import QdrantClient
+
+import app.query_demo as query_demo
+import app.vectorstore as vectorstore
+from app.filters import IncidentFilter
+from app.lexical import BM25Index
+from app.provision import provision_collection
+from app.sparse import SPARSE_VECTOR_NAME, document_sparse_vector, server_hybrid_search
+from bin.config import CollectionConfig
+
+
+class _ConstantEmbeddings(Embeddings):
+    """Alle Texte gleich: Dense-Ranking ist beliebig, Sparse muss entscheiden."""
+
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def test_document_sparse_vector_is_sorted_and_stable():
+    vec = document_sparse_vector("Proxy Proxy ERR_PROXY_CONNECTION_FAILED")
+    assert vec.indices == sorted(vec.indices)
+    assert len(vec.indices) == len(set(vec.indices))
+    assert document_sparse_vector("Proxy Proxy ERR_PROXY_CONNECTION_FAILED") == vec
+
+
+def test_server_hybrid_search(monkeypatch):
+    client = QdrantClient(":memory:")
+    provision_collection(client, "inc", 2)
+    assert SPARSE_VECTOR_NAME in client.get_collection("inc").config.params.sparse_vectors
+
+    vs = Qdrant(client=client, collection_name="inc", embeddings=_ConstantEmbeddings())
+    monkeypatch.setattr(vectorstore, "get_vectorstore", lambda kind, prefer_grpc=None, backend=None: vs)
+    docs = [
+        Document(page_content=f"Ticket {i}: Drucker druckt nicht", metadata={"ticket_id": f"INC-{i}", "status": "Gelöst"})
+        for i in range(20)
+    ]
+    docs.append(Document(
+        page_content="Browser meldet ERR_PROXY_CONNECTION_FAILED",
+        metadata={"ticket_id": "INC-PROXY", "status": "Offen"},
+    ))
+    vectorstore.index_documents(docs, "incidents", batch_size=8)
+
+    hits = server_hybrid_search(vs, [1.0, 0.0], "ERR_PROXY_CONNECTION_FAILED", k=3)
+    assert hits[0][0].metadata["ticket_id"] == "INC-PROXY"
+
+    flt = IncidentFilter(status="Gelöst").to_qdrant()
+    hits = server_hybrid_search(vs, [1.0, 0.0], "ERR_PROXY_CONNECTION_FAILED", k=3, filter=flt)
+    assert all(d.metadata["status"] == "Gelöst" for d, _ in hits)
+
+
+def test_server_hybrid_falls_back_without_sparse_vectors(monkeypatch):
+    # Collection von vor der Sparse-Umstellung: nur Dense-Vektoren
+    client = QdrantClient(":memory:")
+    provision_collection(client, "old", 2, cfg=CollectionConfig(sparse_vectors=False))
+    vs = Qdrant(client=client, collection_name="old", embeddings=_ConstantEmbeddings())
+    monkeypatch.setattr(vectorstore, "get_vectorstore", lambda kind, prefer_grpc=None, backend=None: vs)
+    doc = Document(page_content="Browser meldet ERR_PROXY_CONNECTION_FAILED", metadata={"ticket_id": "INC-PROXY"})
+    vectorstore.index_documents([doc], "incidents")
+
+    lexical = BM25Index()
+    lexical.add("p1", doc)
+    monkeypatch.setattr(query_demo, "get_vectorstore", lambda kind: vs)
+    monkeypatch.setattr(query_demo, "get_lexical_index", lambda kind: lexical)
+
+    assert not vectorstore.supports_server_hybrid(vs)
+    hits = query_demo.retrieve_incidents_and_kb_with_scores("ERR_PROXY_CONNECTION_FAILED", mode="server_hybrid")
+    assert hits and hits[0][0].metadata["ticket_id"] == "INC-PROXY"
+
+    batch, _ = query_demo.retrieve_batch_with_scores(["ERR_PROXY_CONNECTION_FAILED"], mode="server_hybrid")
+    assert batch[0][0][0].metadata["ticket_id"] == "INC-PROXY"
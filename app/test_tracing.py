@@ -0,0 +1,92 @@
+# app/test_tracing.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.documents import Document
+
+import app.query_demo as query_demo
+from bin import tracing
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracing.configure(enabled=True, path=str(path))
+    yield path
+    tracing.configure(enabled=False)
+
+
+def test_disabled_tracing_writes_nothing(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracing.configure(enabled=False, path=str(path))
+
+    with tracing.span("embed_query") as s:
+        s.set(k=3)
+    tracing.record_span("ollama.eval", 1.0)
+
+    assert not path.exists()
+    assert tracing.wrap(len) is len
+
+
+def _search():
+    with tracing.span("search.kb"):
+        pass
+
+
+def test_nested_spans_share_trace_across_threads(trace_file):
+    pool = ThreadPoolExecutor(max_workers=1)
+    with tracing.span("query"):
+        with tracing.span("retrieve"):
+            pool.submit(tracing.wrap(_search)).result()
+    with tracing.span("query"):
+        pass
+    pool.shutdown()
+    tracing.close()
+
+    spans = {s["name"]: s for s in tracing.read_spans([str(trace_file)])[:3]}
+    assert spans["search.kb"]["parent_id"] == spans["retrieve"]["span_id"]
+    assert spans["retrieve"]["parent_id"] == spans["query"]["span_id"]
+    assert spans["query"]["parent_id"] is None
+    assert len({s["trace_id"] for s in spans.values()}) == 1
+
+    second = tracing.read_spans([str(trace_file)])[3]
+    assert second["trace_id"] != spans["query"]["trace_id"]
+
+
+def test_generate_answer_records_ollama_stages(trace_file, monkeypatch):
+    class _Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"response": "Antwort", "prompt_eval_duration": 2_000_000_000, "prompt_eval_count": 50,
+                    "eval_duration": 500_000_000, "eval_count": 10}
+
+    monkeypatch.setattr(query_demo, "get_answer_cache", lambda: None)
+    monkeypatch.setattr(query_demo.ollama_cfg, "url", "http://ollama.test/api/generate")
+    monkeypatch.setattr(query_demo.requests, "post", lambda url, **kw: _Response())
+
+    hits = [(Document(page_content="VPN neu verbinden", metadata={"source": "kb", "kb_id": "KB-1"}), 0.9)]
+    query_demo.generate_answer("VPN bricht ab", hits, stream=False)
+    tracing.close()
+
+    spans = {s["name"]: s for s in tracing.read_spans([str(trace_file)])}
+    assert {"pack_context", "build_prompt", "ollama", "ollama.prompt_eval", "ollama.eval"} <= set(spans)
+    assert spans["ollama.prompt_eval"]["duration_ms"] == 2000.0
+    assert spans["ollama.eval"]["attrs"]["tokens"] == 10
+    assert spans["ollama.eval"]["parent_id"] == spans["ollama"]["span_id"]
+
+
+def test_summarize_percentiles():
+    spans = [{"name": "search.kb", "duration_ms": float(ms)} for ms in range(1, 101)]
+    spans.append({"name": "ollama", "duration_ms": 1500.0})
+
+    summary = tracing.summarize(spans)
+
+    assert list(summary) == ["search.kb", "ollama"]
+    assert summary["search.kb"]["count"] == 100
+    assert summary["search.kb"]["p50"] == pytest.approx(50.5)
+    assert summary["search.kb"]["p95"] == pytest.approx(95.05)
+    assert summary["search.kb"]["p99"] == pytest.approx(99.01)
+    assert summary["ollama"]["max"] == 1500.0
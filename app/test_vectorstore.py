@@ -0,0 +1,141 @@
+# app/test_vectorstore.py
+
+import threading
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_qdrant import Qdrant
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+import app.vectorstore as vectorstore
+from app.answer_cache import AnswerCache
+from app.lexical import BM25Index
+from bin.config import IngestConfig
+
+
+class _FakeEmbeddings(Embeddings):
+    """Deterministische 3-dim Embeddings ohne Embedding-Server."""
+
+    def embed_documents(self, texts):
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def memory_vs(monkeypatch, tmp_path):
+    client = QdrantClient(":memory:")
+    client.create_collection(
+        "test",
+        vectors_config=models.VectorParams(size=3, distance=models.Distance.COSINE),
+    )
+    vs = Qdrant(client=client, collection_name="test", embeddings=_FakeEmbeddings())
+    monkeypatch.setattr(vectorstore, "get_vectorstore", lambda kind, prefer_grpc=None, backend=None: vs)
+    lexical = BM25Index(path=str(tmp_path / "lexical"))
+    monkeypatch.setattr(vectorstore, "get_lexical_index", lambda kind: lexical)
+    answer_cache = AnswerCache(":memory:")
+    monkeypatch.setattr(vectorstore, "get_answer_cache", lambda: answer_cache)
+    return vs
+
+
+def test_index_documents_pipeline(memory_vs):
+    docs = (
+        Document(page_content="x" * i, metadata={"source": "kb", "kb_id": f"KB-{i}"})
+        for i in range(1, 201)
+    )
+
+    stats = vectorstore.index_documents(docs, "kb", batch_size=16, embed_workers=3, upsert_workers=2)
+
+    assert stats.docs == 200
+    assert stats.batches == 13
+    assert memory_vs.client.count("test").count == 200
+
+    hit = memory_vs.similarity_search("x" * 5, k=1)[0]
+    assert hit.metadata["kb_id"] in {f"KB-{i}" for i in range(1, 201)}
+
+
+def test_index_documents_propagates_errors(memory_vs, monkeypatch):
+    def boom(texts):
+        raise RuntimeError("embedding server down")
+
+    monkeypatch.setattr(memory_vs.embeddings, "embed_documents", boom)
+    docs = [Document(page_content="a", metadata={})] * 100
+
+    with pytest.raises(RuntimeError, match="embedding server down"):
+        vectorstore.index_documents(docs, "kb", batch_size=4)
+
+
+def test_index_documents_propagates_loader_errors(memory_vs):
+    def broken_source():
+        yield from [Document(page_content="a", metadata={})] * 10
+        raise ValueError("kaputte CSV-Zeile")
+
+    with pytest.raises(ValueError, match="kaputte CSV-Zeile"):
+        vectorstore.index_documents(broken_source(), "kb", batch_size=4, embed_workers=2, upsert_workers=2)
+    assert not [t for t in threading.enumerate() if t.name.startswith("ingest-")]
+
+
+def _kb_doc(kb_id: str, text: str) -> Document:
+    return Document(page_content=text, metadata={"source": "kb", "kb_id": kb_id})
+
+
+def test_sync_documents_is_incremental(memory_vs, monkeypatch, tmp_path):
+    monkeypatch.setattr(vectorstore, "IngestConfig", lambda: IngestConfig(manifest_dir=str(tmp_path)))
+
+    first = vectorstore.sync_documents([_kb_doc("KB-1", "a"), _kb_doc("KB-2", "bb")], "kb")
+    assert (first.added, first.updated, first.unchanged, first.deleted) == (2, 0, 0, 0)
+
+    # Wiederholung ohne Änderungen: nichts wird embedded, keine Duplikate
+    again = vectorstore.sync_documents([_kb_doc("KB-1", "a"), _kb_doc("KB-2", "bb")], "kb")
+    assert (again.added, again.updated, again.unchanged, again.deleted) == (0, 0, 2, 0)
+    assert again.ingest.docs == 0
+    assert memory_vs.client.count("test").count == 2
+
+    # Antworten, die KB-1 bzw. KB-2 zitieren, werden beim nächsten Sync verworfen
+    answer_cache = vectorstore.get_answer_cache()
+    answer_cache.put("m", [1.0, 0.0], [_kb_doc("KB-1", "a")], "alt 1")
+    answer_cache.put("m", [0.0, 1.0], [_kb_doc("KB-2", "bb")], "alt 2")
+    answer_cache.put("m", [1.0, 1.0], [_kb_doc("KB-9", "z")], "bleibt")
+
+    # KB-1 geändert, KB-2 entfernt, KB-3 neu
+    changed = vectorstore.sync_documents([_kb_doc("KB-1", "aaaa"), _kb_doc("KB-3", "ccc")], "kb")
+    assert (changed.added, changed.updated, changed.unchanged, changed.deleted) == (1, 1, 0, 1)
+    assert memory_vs.client.count("test").count == 2
+    ids = {d.metadata["kb_id"] for d in memory_vs.similarity_search("x", k=10)}
+    assert ids == {"KB-1", "KB-3"}
+    assert len(answer_cache) == 1
+
+    # BM25-Index wird mitgeführt
+    lexical = vectorstore.get_lexical_index("kb")
+    assert len(lexical) == 2
+    assert [d.metadata["kb_id"] for d, _ in lexical.search("aaaa", k=5)] == ["KB-1"]
+
+
+def test_sync_documents_removes_points_missing_from_manifest(memory_vs, monkeypatch, tmp_path):
+    monkeypatch.setattr(vectorstore, "IngestConfig", lambda: IngestConfig(manifest_dir=str(tmp_path)))
+    # Altbestand aus add_documents: zufällige Point-IDs, kein Manifest
+    memory_vs.add_documents([_kb_doc("KB-1", "a"), _kb_doc("KB-2", "bb")])
+
+    first = vectorstore.sync_documents([_kb_doc("KB-1", "a"), _kb_doc("KB-2", "bb")], "kb")
+    assert first.deleted == 2
+    assert memory_vs.client.count("test").count == 2
+
+    # danach konvergiert der Sync: nichts wird neu embedded
+    again = vectorstore.sync_documents([_kb_doc("KB-1", "a"), _kb_doc("KB-2", "bb")], "kb")
+    assert (again.unchanged, again.deleted, again.ingest.docs) == (2, 0, 0)
+
+
+def test_search_batch_matches_single_search(memory_vs):
+    vectorstore.index_documents(
+        [_kb_doc(f"KB-{i}", "x" * i) for i in range(1, 30)], "kb", batch_size=8
+    )
+    queries = [memory_vs.embeddings.embed_query(q) for q in ("xx", "x" * 17)]
+
+    batch = vectorstore.search_batch(memory_vs, queries, k=3)
+
+    for query, hits in zip(queries, batch):
+        single = memory_vs.similarity_search_with_score_by_vector(query, k=3)
+        assert [d.metadata["kb_id"] for d, _ in hits] == [d.metadata["kb_id"] for d, _ in single]
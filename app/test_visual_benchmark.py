@@ -0,0 +1,30 @@
+# app/test_visual_benchmark.py
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("matplotlib")
+
+from benchmark.visual_benchmark import pareto_front  # noqa: E402
+
+
+def test_pareto_front_keeps_only_non_dominated_points():
+    df = pd.DataFrame(
+        {
+            "p95_ms": [10.0, 12.0, 15.0, 20.0, 20.0, 30.0],
+            "ndcg": [0.50, 0.45, 0.70, 0.70, 0.80, 0.75],
+        },
+        index=["a", "b", "c", "d", "e", "f"],
+    )
+
+    front = pareto_front(df, "p95_ms", "ndcg")
+
+    # b ist langsamer und schlechter als a, d schlechter als e bei gleicher Latenz,
+    # f langsamer und schlechter als e
+    assert list(front[front].index) == ["a", "c", "e"]
+    assert front.index.equals(df.index)
+
+
+def test_pareto_front_with_equal_points_keeps_one():
+    df = pd.DataFrame({"p95_ms": [5.0, 5.0], "ndcg": [0.6, 0.6]})
+    assert pareto_front(df, "p95_ms", "ndcg").sum() == 1
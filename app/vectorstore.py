@@ -1,37 +1,601 @@
-from typing import Literal
+import os
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterable, Literal
 from langchain_qdrant import Qdrant
 from qdrant_client import QdrantClient
+from qdrant_client.http import models
 from langchain_core.documents import Document
-from bin.config import QdrantConfig, EmbeddingConfig
-from .embeddings import Embeddings
+from bin.config import QdrantConfig, EmbeddingConfig, IngestConfig, CollectionConfig, VectorStoreConfig, RetrievalConfig
+from bin.logging_utils import get_logger
+from .answer_cache import get_answer_cache
+from .embeddings import Embeddings, close_session
+from .lexical import BM25Index
+from .manifest import IngestManifest, content_hash, point_id
+from .numpy_store import NumpyVectorStore
+from .sparse import SPARSE_VECTOR_NAME, document_sparse_vector, has_sparse_vectors
 
-def get_vectorstore(kind: Literal["incidents", "kb"]) -> Qdrant:
+logger = get_logger("vectorstore")
+
+# Prozessweite Registry: Clients, Embeddings und Vectorstores werden nur einmal gebaut
+# und danach wiederverwendet (HTTP-Keep-Alive statt Verbindungsaufbau pro Query).
+_lock = threading.Lock()
+_clients: dict[tuple[str, bool, int], QdrantClient] = {}
+_vectorstores: dict[tuple[str, bool, str], Qdrant] = {}
+_numpy_stores: dict[tuple[str, str], NumpyVectorStore] = {}
+_lexical_indexes: dict[tuple[str, str], BM25Index] = {}
+# id(Vectorstore) -> Collection hat Sparse-Vektoren (Vectorstores leben bis close_vectorstores)
+_sparse_support: dict[int, bool] = {}
+_embeddings: Embeddings | None = None
+
+
+def get_client(cfg: QdrantConfig | None = None) -> QdrantClient:
+    cfg = cfg or QdrantConfig()
+    key = (cfg.url, cfg.prefer_grpc, cfg.grpc_port)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = QdrantClient(
+                url=cfg.url,
+                grpc_port=cfg.grpc_port,
+                prefer_grpc=cfg.prefer_grpc,
+            )
+            _clients[key] = client
+        return client
+
+
+def get_embeddings() -> Embeddings:
+    global _embeddings
+    with _lock:
+        if _embeddings is None:
+            _embeddings = Embeddings(EmbeddingConfig())
+        return _embeddings
+
+
+def _get_numpy_store(collection: str) -> NumpyVectorStore:
+    """
+    In-Process-Backend: lädt den gespeicherten Index (per mmap) oder startet leer.
+    """
+    cfg = VectorStoreConfig()
+    path = os.path.join(cfg.numpy_dir, collection)
+    key = (cfg.numpy_dir, collection)
+    embeddings = get_embeddings()
+
+    with _lock:
+        store = _numpy_stores.get(key)
+        if store is None:
+            if os.path.exists(os.path.join(path, "vectors.npy")):
+                store = NumpyVectorStore.load(path, collection, embeddings, mmap=cfg.numpy_mmap)
+            else:
+                store = NumpyVectorStore(collection, embeddings, dtype=cfg.numpy_dtype, path=path)
+            _numpy_stores[key] = store
+        return store
+
+
+def get_vectorstore(
+    kind: Literal["incidents", "kb"],
+    prefer_grpc: bool | None = None,
+    backend: str | None = None,
+) -> Qdrant | NumpyVectorStore:
+    """
+    Liefert den Vectorstore für incidents/kb. backend (bzw. VECTOR_BACKEND)
+    wählt zwischen Qdrant und dem In-Process-NumpyVectorStore.
+    """
     cfg = QdrantConfig()
-    emb_cfg = EmbeddingConfig()
-    embeddings = Embeddings(emb_cfg)
+    if prefer_grpc is not None:
+        cfg.prefer_grpc = prefer_grpc
 
     if kind == "incidents":
         collection = cfg.inc_collection
     else:
         collection = cfg.kb_collection
 
-    client = QdrantClient(url=cfg.url)
+    backend = backend or VectorStoreConfig().backend
+    if backend == "numpy":
+        return _get_numpy_store(collection)
+    if backend != "qdrant":
+        raise ValueError(f"Unbekanntes Vector-Backend: {backend}")
 
-    vs = Qdrant(
-        client=client,
-        collection_name=collection,
-        embeddings=embeddings,
-    )
+    key = (cfg.url, cfg.prefer_grpc, collection)
+    vs = _vectorstores.get(key)
+    if vs is not None:
+        return vs
+
+    client = get_client(cfg)
+    embeddings = get_embeddings()
+
+    with _lock:
+        vs = _vectorstores.get(key)
+        if vs is None:
+            vs = Qdrant(
+                client=client,
+                collection_name=collection,
+                embeddings=embeddings,
+            )
+            _vectorstores[key] = vs
 
     return vs
 
+
+def get_lexical_index(kind: Literal["incidents", "kb"]) -> BM25Index:
+    """
+    BM25-Index der Collection für Hybrid-Retrieval; wird von sync_documents gepflegt.
+    """
+    qdrant_cfg = QdrantConfig()
+    collection = qdrant_cfg.inc_collection if kind == "incidents" else qdrant_cfg.kb_collection
+    lexical_dir = RetrievalConfig().lexical_dir
+    path = os.path.join(lexical_dir, collection)
+    key = (lexical_dir, collection)
+
+    with _lock:
+        index = _lexical_indexes.get(key)
+        if index is None:
+            if os.path.exists(os.path.join(path, "postings.npz")):
+                index = BM25Index.load(path)
+            else:
+                index = BM25Index(path=path)
+            _lexical_indexes[key] = index
+        return index
+
+
+def get_search_params(hnsw_ef: int | None = None) -> models.SearchParams:
+    """
+    Suchparameter aus der CollectionConfig; hnsw_ef tauscht Recall gegen Latenz.
+    Mit Quantisierung wird über die Originalvektoren nachbewertet (Rescoring).
+    """
+    cfg = CollectionConfig()
+    quantization = None
+    if cfg.quantization:
+        quantization = models.QuantizationSearchParams(
+            rescore=cfg.rescore,
+            oversampling=cfg.oversampling,
+        )
+    return models.SearchParams(
+        hnsw_ef=hnsw_ef or cfg.hnsw_ef,
+        quantization=quantization,
+    )
+
+
+def supports_server_hybrid(vs: Qdrant | NumpyVectorStore) -> bool:
+    """
+    True, wenn die Collection den Sparse-Vektor für server_hybrid hat. Ältere, nicht neu
+    angelegte Collections haben keinen; das Ergebnis wird pro Collection einmal ermittelt.
+    """
+    if isinstance(vs, NumpyVectorStore):
+        return False
+    supported = _sparse_support.get(id(vs))
+    if supported is None:
+        try:
+            supported = has_sparse_vectors(vs)
+        except Exception as e:
+            # nicht merken, beim nächsten Aufruf erneut prüfen
+            logger.warning("Sparse-Vektoren von '%s' nicht prüfbar: %s", vs.collection_name, e)
+            return False
+        if not supported:
+            logger.warning(
+                "Collection '%s' hat keine Sparse-Vektoren, server_hybrid fällt auf hybrid zurück "
+                "(Collection neu anlegen oder python -m app.provision --recreate).",
+                vs.collection_name,
+            )
+        with _lock:
+            _sparse_support[id(vs)] = supported
+    return supported
+
+
+def search_batch(
+    vs: Qdrant | NumpyVectorStore,
+    vectors: list[list[float]],
+    k: int = 4,
+    filter: models.Filter | None = None,
+    search_params: models.SearchParams | None = None,
+) -> list[list[tuple[Document, float]]]:
+    """
+    Sucht mehrere Query-Vektoren in einem Aufruf: query_batch_points bei Qdrant,
+    ein Matrix-Matrix-Produkt beim NumpyVectorStore.
+    """
+    if isinstance(vs, NumpyVectorStore):
+        return vs.similarity_search_with_score_by_vectors(vectors, k=k, filter=filter)
+
+    responses = vs.client.query_batch_points(
+        collection_name=vs.collection_name,
+        requests=[
+            models.QueryRequest(
+                query=list(vector),
+                using=vs.vector_name,
+                filter=filter,
+                params=search_params,
+                limit=k,
+                with_payload=True,
+            )
+            for vector in vectors
+        ],
+    )
+    return [
+        [
+            (
+                vs._document_from_scored_point(
+                    point, vs.collection_name, vs.content_payload_key, vs.metadata_payload_key
+                ),
+                point.score,
+            )
+            for point in response.points
+        ]
+        for response in responses
+    ]
+
+
+def close_vectorstores() -> None:
+    """
+    Schliesst alle Clients und die Embedding-Session und leert die Registry.
+    Für Tests und sauberes Herunterfahren; der nächste get_vectorstore baut neu auf.
+    """
+    global _embeddings
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _vectorstores.clear()
+        _numpy_stores.clear()
+        _lexical_indexes.clear()
+        _sparse_support.clear()
+        if _embeddings is not None and _embeddings.cache is not None:
+            _embeddings.cache.close()
+        _embeddings = None
+    close_session()
+
+
+@dataclass
+class IngestStats:
+    """
+    Durchsatz-Zähler der Ingest-Pipeline.
+    embed_s/upsert_s sind Summen über alle Worker einer Stage.
+    """
+    docs: int = 0
+    batches: int = 0
+    embed_s: float = 0.0
+    upsert_s: float = 0.0
+    wall_s: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, **values: float) -> None:
+        with self._lock:
+            for name, value in values.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def docs_per_s(self) -> float:
+        return self.docs / self.wall_s if self.wall_s > 0 else 0.0
+
+
+# Ende-Marker für die Pipeline-Queues
+_DONE = object()
+
+
+def _batched(docs: Iterable[Document], batch_size: int) -> Iterable[list[Document]]:
+    it = iter(docs)
+    while batch := list(islice(it, batch_size)):
+        yield batch
+
+
+def _put(q: queue.Queue, item, failed: threading.Event) -> None:
+    # Blockiert bei voller Queue (Backpressure), bricht aber ab, wenn eine Stage gescheitert ist
+    while not failed.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+
+def _get(q: queue.Queue, failed: threading.Event):
+    # Liefert _DONE, sobald eine andere Stage gescheitert ist, damit kein Worker hängen bleibt
+    while not failed.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def _to_points(
+    vs: Qdrant,
+    kind: str,
+    batch: list[Document],
+    vectors: list[list[float]],
+    sparse: bool = False,
+) -> list[models.PointStruct]:
+    points = []
+    for doc, vector in zip(batch, vectors):
+        if sparse:
+            # Dense- und Sparse-Vektor im selben Punkt ("" = unbenannter Dense-Vektor)
+            point_vector = {
+                vs.vector_name or "": vector,
+                SPARSE_VECTOR_NAME: document_sparse_vector(doc.page_content),
+            }
+        else:
+            point_vector = {vs.vector_name: vector} if vs.vector_name else vector
+        points.append(
+            models.PointStruct(
+                # Deterministische IDs: erneuter Ingest überschreibt statt zu duplizieren
+                id=point_id(kind, doc),
+                vector=point_vector,
+                payload={
+                    vs.content_payload_key: doc.page_content,
+                    vs.metadata_payload_key: doc.metadata,
+                },
+            )
+        )
+    return points
+
+
+def _upsert(
+    vs,
+    kind: str,
+    batch: list[Document],
+    vectors: list[list[float]],
+    sparse: bool = False,
+) -> None:
+    if isinstance(vs, NumpyVectorStore):
+        vs.upsert([point_id(kind, d) for d in batch], vectors, batch)
+        return
+    vs.client.upsert(
+        collection_name=vs.collection_name,
+        points=_to_points(vs, kind, batch, vectors, sparse=sparse),
+        wait=True,
+    )
+
+
 def index_documents(
-    docs: list[Document],
+    docs: Iterable[Document],
     kind: Literal["incidents", "kb"],
-    batch_size: int = 64,
-) -> None:
-    vs = get_vectorstore(kind)
+    batch_size: int | None = None,
+    prefer_grpc: bool | None = None,
+    backend: str | None = None,
+    embed_workers: int | None = None,
+    upsert_workers: int | None = None,
+) -> IngestStats:
+    """
+    Indiziert Dokumente über eine Pipeline mit begrenzten Queues:
+    Loader -> N Embedding-Worker -> M Upsert-Writer.
+    Embedding-Server und Qdrant arbeiten so gleichzeitig statt abwechselnd.
+    Hat die Collection einen Sparse-Vektor, werden die Term-Gewichte mitgeschrieben.
+    """
+    cfg = IngestConfig()
+    batch_size = batch_size or cfg.batch_size
+    embed_workers = embed_workers or cfg.embed_workers
+    upsert_workers = upsert_workers or cfg.upsert_workers
+
+    vs = get_vectorstore(kind, prefer_grpc=prefer_grpc, backend=backend)
+    stats = IngestStats()
+    embed_q: queue.Queue = queue.Queue(maxsize=cfg.queue_size)
+    upsert_q: queue.Queue = queue.Queue(maxsize=cfg.queue_size)
+    failed = threading.Event()
+    errors: list[BaseException] = []
+    # Qdrant verträgt parallele Upserts; der NumpyVectorStore wird serialisiert
+    upsert_lock = threading.Lock() if isinstance(vs, NumpyVectorStore) else nullcontext()
+    sparse = not isinstance(vs, NumpyVectorStore) and has_sparse_vectors(vs)
+
+    def embed_worker() -> None:
+        while True:
+            batch = _get(embed_q, failed)
+            if batch is _DONE:
+                return
+            try:
+                t0 = time.perf_counter()
+                vectors = vs.embeddings.embed_documents([d.page_content for d in batch])
+                stats.add(embed_s=time.perf_counter() - t0)
+                _put(upsert_q, (batch, vectors), failed)
+            except BaseException as e:
+                errors.append(e)
+                failed.set()
+                return
+
+    def upsert_worker() -> None:
+        while True:
+            item = _get(upsert_q, failed)
+            if item is _DONE:
+                return
+            batch, vectors = item
+            try:
+                t0 = time.perf_counter()
+                with upsert_lock:
+                    _upsert(vs, kind, batch, vectors, sparse=sparse)
+                stats.add(upsert_s=time.perf_counter() - t0, docs=len(batch), batches=1)
+            except BaseException as e:
+                errors.append(e)
+                failed.set()
+                return
+
+    embedders = [
+        threading.Thread(target=embed_worker, name=f"ingest-embed-{i}", daemon=True)
+        for i in range(embed_workers)
+    ]
+    writers = [
+        threading.Thread(target=upsert_worker, name=f"ingest-upsert-{i}", daemon=True)
+        for i in range(upsert_workers)
+    ]
+
+    t_start = time.perf_counter()
+    for t in embedders + writers:
+        t.start()
+
+    # Loader-Stage läuft im aufrufenden Thread; ein Fehler der Quelle (kaputte CSV-Zeile,
+    # I/O) beendet auch die Worker, damit sie nicht ewig auf die Queue warten
+    try:
+        for batch in _batched(docs, batch_size):
+            if failed.is_set():
+                break
+            _put(embed_q, batch, failed)
+    except BaseException as e:
+        errors.append(e)
+        failed.set()
+
+    for _ in embedders:
+        _put(embed_q, _DONE, failed)
+    for t in embedders:
+        t.join()
+    for _ in writers:
+        _put(upsert_q, _DONE, failed)
+    for t in writers:
+        t.join()
+
+    stats.wall_s = time.perf_counter() - t_start
+
+    if errors:
+        raise errors[0]
+
+    if isinstance(vs, NumpyVectorStore):
+        vs.save()
+
+    logger.info(
+        "Ingest-Summary (%s): docs=%s, batches=%s, %.1f docs/s, embed=%.2fs, upsert=%.2fs, wall=%.2fs",
+        kind,
+        stats.docs,
+        stats.batches,
+        stats.docs_per_s,
+        stats.embed_s,
+        stats.upsert_s,
+        stats.wall_s,
+    )
+    return stats
+
 
-    for i in range(0, len(docs), batch_size):
-        batch = docs[i : i + batch_size]
-        vs.add_documents(batch)
+@dataclass
+class SyncStats:
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    ingest: IngestStats | None = None
+
+
+def _collection_point_ids(vs: Qdrant | NumpyVectorStore) -> list[str]:
+    """
+    Alle Point-IDs der Collection (per Scroll, ohne Payload und Vektoren).
+    """
+    if isinstance(vs, NumpyVectorStore):
+        return list(vs.ids)
+
+    ids: list[str] = []
+    offset = None
+    while True:
+        points, offset = vs.client.scroll(
+            collection_name=vs.collection_name,
+            limit=1000,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False,
+        )
+        ids.extend(str(p.id) for p in points)
+        if offset is None:
+            return ids
+
+
+def sync_documents(
+    docs: Iterable[Document],
+    kind: Literal["incidents", "kb"],
+    full: bool = False,
+    **index_kwargs,
+) -> SyncStats:
+    """
+    Inkrementeller, idempotenter Ingest gegen das lokale Manifest der Collection:
+    nur neue oder geänderte Dokumente werden embedded und upserted,
+    Dokumente, die nicht mehr in der Quelle stehen, werden gelöscht.
+    full=True ignoriert das Manifest und indiziert alles neu.
+
+    Passt das Manifest nicht zur Collection (z.B. Punkte mit Zufalls-IDs aus einem
+    älteren Ingest), wird alles neu indiziert und danach jeder Punkt gelöscht, der
+    nicht aus der aktuellen Quelle stammt; der nächste Lauf ist wieder inkrementell.
+    """
+    vs = get_vectorstore(
+        kind,
+        prefer_grpc=index_kwargs.get("prefer_grpc"),
+        backend=index_kwargs.get("backend"),
+    )
+    is_numpy = isinstance(vs, NumpyVectorStore)
+    manifest_name = f"numpy-{vs.collection_name}" if is_numpy else vs.collection_name
+    manifest = IngestManifest.for_collection(IngestConfig().manifest_dir, manifest_name)
+
+    # Bei full oder Abweichung am Ende alle Punkte entfernen, die nicht in der Quelle stehen
+    reconcile = full
+    if not full:
+        points_in_collection = len(vs) if is_numpy else vs.client.count(vs.collection_name, exact=True).count
+        if points_in_collection != len(manifest):
+            logger.warning(
+                "Manifest (%s Einträge) passt nicht zur Collection '%s' (%s Punkte), indiziere alles neu.",
+                len(manifest),
+                vs.collection_name,
+                points_in_collection,
+            )
+            full = reconcile = True
+
+    lexical = get_lexical_index(kind)
+    stats = SyncStats()
+    seen: dict[str, str] = {}
+    updated: list[str] = []
+
+    def changed_docs() -> Iterable[Document]:
+        for doc in docs:
+            pid = point_id(kind, doc)
+            digest = content_hash(doc)
+            previous = manifest.get(pid)
+            seen[pid] = digest
+
+            # BM25-Index unabhängig vom Manifest abgleichen (z.B. nach Backend-Wechsel)
+            if lexical.content_hash(pid) != digest:
+                lexical.add(pid, doc, digest)
+
+            if previous == digest and not full:
+                stats.unchanged += 1
+                continue
+            if previous is None:
+                stats.added += 1
+            else:
+                stats.updated += 1
+                updated.append(pid)
+            yield doc
+
+    stats.ingest = index_documents(changed_docs(), kind, **index_kwargs)
+
+    existing = _collection_point_ids(vs) if reconcile else manifest.entries
+    removed = [pid for pid in existing if pid not in seen]
+    if removed and is_numpy:
+        vs.delete(removed)
+        vs.save()
+    elif removed:
+        vs.client.delete(
+            collection_name=vs.collection_name,
+            points_selector=models.PointIdsList(points=removed),
+            wait=True,
+        )
+    stats.deleted = len(removed)
+
+    for pid in lexical:
+        if pid not in seen:
+            lexical.remove(pid)
+
+    # Manifest und BM25-Index erst nach erfolgreichem Ingest fortschreiben
+    manifest.entries = seen
+    manifest.save()
+    lexical.save()
+
+    # Gecachte Antworten, die geänderte oder gelöschte Dokumente zitieren, verwerfen
+    answer_cache = get_answer_cache()
+    if answer_cache is not None and (updated or removed):
+        invalidated = answer_cache.invalidate(updated + removed)
+        if invalidated:
+            logger.info("Antwort-Cache: %s Einträge invalidiert (%s).", invalidated, kind)
+
+    logger.info(
+        "Sync (%s): added=%s, updated=%s, unchanged=%s, deleted=%s",
+        kind,
+        stats.added,
+        stats.updated,
+        stats.unchanged,
+        stats.deleted,
+    )
+    return stats
@@ -0,0 +1,125 @@
+# benchmark/loader_benchmark.py
+"""
+Micro-Benchmark für app.loaders: Zeilen/s beim Aufbau der Incident-Dokumente.
+
+Verglichen werden
+- "iterrows": der frühere Weg (pandas, eine Series pro Zeile)
+- "vectorized": spaltenweiser Aufbau über pandas (aktueller Standard)
+- "csv": Fallback ohne pandas (csv.reader)
+
+Aufruf:
+  python -m benchmark.loader_benchmark --rows 100000
+"""
+
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from app import loaders
+from app.loaders import Document, iter_incidents_csv
+from bin.logging_utils import get_logger
+
+logger = get_logger("loader_benchmark")
+
+FIELDS = [
+    "ticket_id", "title", "description", "created_at", "impact", "urgency",
+    "status", "category", "service", "conversation_history", "error_code", "gold_kb_id",
+]
+TITLES = ["VPN bricht ab", "Proxy-Verbindungsfehler", "Drucker offline", "Outlook startet nicht"]
+STATUSES = ["Gelöst", "Offen", "Abgebrochen", "Zurückgewiesen"]
+CATEGORIES = ["Network", "Access", "Hardware", "Software", "Security"]
+
+
+def write_synthetic_incidents(path: str, rows: int, seed: int = 42) -> None:
+    rnd = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        for i in range(rows):
+            writer.writerow([
+                f"INC-{i:07d}",
+                rnd.choice(TITLES),
+                "Benutzer meldet: " + " ".join(rnd.choice(TITLES) for _ in range(8)),
+                "2025-12-05T08:24:08Z",
+                rnd.randint(1, 3),
+                rnd.randint(1, 3),
+                rnd.choice(STATUSES),
+                rnd.choice(CATEGORIES),
+                "VPN",
+                "",
+                "ERR_PROXY_CONNECTION_FAILED" if i % 7 == 0 else "",
+                f"KB-{rnd.randint(0, 500):08X}",
+            ])
+
+
+def load_incidents_iterrows(path: str) -> list[Document]:
+    # Referenz: der frühere zeilenweise Aufbau über df.iterrows()
+    docs = []
+    df = pd.read_csv(path)
+    for _, row in df.iterrows():
+        ticket_id = str(row.get("ticket_id", ""))
+        content = (
+            f"Incident {ticket_id}: {row.get('title', '')}\n\n"
+            f"Beschreibung:\n{row.get('description', '')}\n\n"
+            f"Verlauf:\n{row.get('history', '')}"
+        )
+        metadata = {
+            "source": "incident",
+            "ticket_id": ticket_id,
+            "status": row.get("status", ""),
+            "category": row.get("category", ""),
+            "impact": row.get("impact", ""),
+            "urgency": row.get("urgency", ""),
+            "created_at": row.get("created_at", ""),
+            "resolved_at": row.get("resolved_at", ""),
+        }
+        docs.append(Document(page_content=content, metadata=metadata))
+    return docs
+
+
+def load_incidents_csv_fallback(path: str) -> list[Document]:
+    pd_module = loaders.pd
+    loaders.pd = None
+    try:
+        return list(iter_incidents_csv(path))
+    finally:
+        loaders.pd = pd_module
+
+
+def _measure(label: str, fn, path: str, rows: int) -> float:
+    t0 = time.perf_counter()
+    docs = fn(path)
+    elapsed = time.perf_counter() - t0
+    assert len(docs) == rows, f"{label}: {len(docs)} statt {rows} Dokumente"
+    rate = rows / elapsed
+    logger.info("%-10s %8d Zeilen in %6.2fs = %10.0f Zeilen/s", label, rows, elapsed, rate)
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark der CSV-Loader")
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "incidents.csv")
+        write_synthetic_incidents(path, args.rows)
+
+        results = {
+            "iterrows": _measure("iterrows", load_incidents_iterrows, path, args.rows),
+            "vectorized": _measure("vectorized", lambda p: list(iter_incidents_csv(p)), path, args.rows),
+            "csv": _measure("csv", load_incidents_csv_fallback, path, args.rows),
+        }
+
+    print(f"{'path':<12}{'rows/s':>12}{'speedup':>10}")
+    for label, rate in results.items():
+        print(f"{label:<12}{rate:>12.0f}{rate / results['iterrows']:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmark/qdrant_transport.py
+"""
+Vergleicht REST (HTTP/JSON) und gRPC (Protobuf) gegen eine lokale Qdrant-Instanz:
+- Upsert-Durchsatz (Punkte/s) in Batches
+- Such-Latenz (p50/p95) für Einzelqueries
+
+Aufruf:
+  python -m benchmark.qdrant_transport --points 20000 --queries 500
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from bin.config import QdrantConfig, EmbeddingConfig
+from bin.logging_utils import get_logger
+
+logger = get_logger("qdrant_transport_benchmark")
+
+COLLECTION = "transport_benchmark"
+
+
+def _random_vectors(n: int, dim: int, seed: int) -> list[list[float]]:
+    rnd = random.Random(seed)
+    return [[rnd.uniform(-1.0, 1.0) for _ in range(dim)] for _ in range(n)]
+
+
+def _percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def run_transport(
+    client: QdrantClient,
+    label: str,
+    vectors: list[list[float]],
+    queries: list[list[float]],
+    batch_size: int,
+) -> dict:
+    dim = len(vectors[0])
+    # recreate_collection ist deprecated: explizit löschen und neu anlegen
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    client.create_collection(
+        collection_name=COLLECTION,
+        vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE),
+    )
+
+    try:
+        # Upsert-Durchsatz
+        t0 = time.perf_counter()
+        for start in range(0, len(vectors), batch_size):
+            batch = vectors[start : start + batch_size]
+            client.upsert(
+                collection_name=COLLECTION,
+                points=models.Batch(
+                    ids=list(range(start, start + len(batch))),
+                    vectors=batch,
+                ),
+                wait=True,
+            )
+        upsert_s = time.perf_counter() - t0
+
+        # Such-Latenz
+        latencies = []
+        for q in queries:
+            t = time.perf_counter()
+            client.query_points(collection_name=COLLECTION, query=q, limit=10)
+            latencies.append((time.perf_counter() - t) * 1000)
+    finally:
+        client.delete_collection(COLLECTION)
+
+    result = {
+        "transport": label,
+        "points": len(vectors),
+        "upsert_s": upsert_s,
+        "points_per_s": len(vectors) / upsert_s if upsert_s > 0 else 0.0,
+        "search_p50_ms": statistics.median(latencies),
+        "search_p95_ms": _percentile(latencies, 95),
+    }
+    logger.info(
+        "%-5s upsert: %d Punkte in %.2fs (%.0f Punkte/s), search p50=%.2fms p95=%.2fms",
+        label,
+        result["points"],
+        result["upsert_s"],
+        result["points_per_s"],
+        result["search_p50_ms"],
+        result["search_p95_ms"],
+    )
+    return result
+
+
+def main():
+    cfg = QdrantConfig()
+    parser = argparse.ArgumentParser(description="REST vs. gRPC Benchmark für Qdrant")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--dim", type=int, default=EmbeddingConfig().dim)
+    args = parser.parse_args()
+
+    vectors = _random_vectors(args.points, args.dim, seed=1)
+    queries = _random_vectors(args.queries, args.dim, seed=2)
+
+    rest = QdrantClient(url=cfg.url, prefer_grpc=False)
+    grpc = QdrantClient(url=cfg.url, grpc_port=cfg.grpc_port, prefer_grpc=True)
+
+    results = [
+        run_transport(rest, "rest", vectors, queries, args.batch_size),
+        run_transport(grpc, "grpc", vectors, queries, args.batch_size),
+    ]
+
+    print(f"{'transport':<10}{'points/s':>12}{'upsert_s':>10}{'p50_ms':>10}{'p95_ms':>10}")
+    for r in results:
+        print(
+            f"{r['transport']:<10}{r['points_per_s']:>12.0f}{r['upsert_s']:>10.2f}"
+            f"{r['search_p50_ms']:>10.2f}{r['search_p95_ms']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
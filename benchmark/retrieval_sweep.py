@@ -0,0 +1,335 @@
+# benchmark/retrieval_sweep.py
+"""
+Parameter-Sweep für den Trade-off Retrieval-Latenz vs. Qualität.
+
+Grid über k_inc, k_kb, hnsw_ef, Quantisierung (an/aus), Ingest-batch_size und
+Query-batch_size. Für jeden Punkt werden die Tickets mit gold_kb_id als Queries
+gegen die KB gestellt, mit RecallTopK/nDCGTopK bewertet und die Latenz gemessen.
+
+- KB-Dokumente und Queries werden nur einmal embedded (Embedding-Cache + .npy im
+  Sweep-Verzeichnis) und von allen Grid-Punkten wiederverwendet
+- pro (Quantisierung, Ingest-batch_size) wird eine eigene Sweep-Collection befüllt
+- Ingests und Grid-Punkte laufen standardmässig nacheinander (--workers 1), da alle
+  Punkte dieselbe Qdrant-Instanz messen; mehr Worker nur für schnelle Vorab-Sweeps,
+  die Latenzen sind dann durch die gegenseitige Last verfälscht
+- die Sweep-Collections werden auch bei Abbruch wieder gelöscht (--keep-collections)
+- Ergebnis: eine Tabelle (CSV) und ein Pareto-Plot (p95-Request-Latenz vs. nDCG);
+  die Request-Latenz gilt für einen ganzen Batch, daher query_batch_size mitlesen
+
+Aufruf:
+  python -m benchmark.retrieval_sweep --k-kb 3 5 10 --hnsw-ef 32 64 128 256 --quantization off on
+  python -m benchmark.retrieval_sweep --ingest-batch-size 32 128 --query-batch-size 1 16 64
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from qdrant_client.http import models
+
+from app.embeddings import Embeddings
+from app.evaluate_retrieval import load_eval_queries
+from app.loaders import load_kb_csv
+from app.manifest import point_id
+from app.provision import PAYLOAD_INDEXES, provision_collection
+from app.vectorstore import get_client
+from bin.config import BASE_DIR, CollectionConfig, DataConfig, EmbeddingConfig, QdrantConfig
+from bin.logging_utils import get_logger
+from metrics.retrievalquaility.RecallTopK import RecallTopK
+from metrics.retrievalquaility.nDCGTopK import nDCGTopK
+
+logger = get_logger("retrieval_sweep")
+
+SWEEP_PREFIX = "sweep_kb"
+SWEEP_DIR = os.path.join(BASE_DIR, "cache", "sweep")
+OUT_DIR = Path(BASE_DIR) / "reports" / "benchmarks"
+
+
+@dataclass(frozen=True)
+class GridPoint:
+    k_inc: int
+    k_kb: int
+    hnsw_ef: int
+    quantization: bool
+    ingest_batch_size: int
+    query_batch_size: int
+
+    @property
+    def collection(self) -> str:
+        return _collection_name(self.quantization, self.ingest_batch_size)
+
+
+def _collection_name(quantization: bool, ingest_batch_size: int) -> str:
+    return f"{SWEEP_PREFIX}_q{int(quantization)}_b{ingest_batch_size}"
+
+
+def build_grid(
+    k_inc: list[int],
+    k_kb: list[int],
+    hnsw_ef: list[int],
+    quantization: list[bool],
+    ingest_batch_size: list[int],
+    query_batch_size: list[int],
+) -> list[GridPoint]:
+    return [
+        GridPoint(*values)
+        for values in itertools.product(k_inc, k_kb, hnsw_ef, quantization, ingest_batch_size, query_batch_size)
+    ]
+
+
+def _chunks(items, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def prepare_vectors(kb_path: str, eval_csv: str, limit: int | None = None) -> tuple[str, str, list[set[str]]]:
+    """
+    Embedded KB-Dokumente und Queries einmal und legt sie als .npy ab.
+    Wiederholte Sweeps treffen den persistenten Embedding-Cache.
+    """
+    os.makedirs(SWEEP_DIR, exist_ok=True)
+    embeddings = Embeddings(EmbeddingConfig())
+
+    docs = load_kb_csv(kb_path)
+    queries = load_eval_queries(eval_csv, limit=limit)
+    if not docs or not queries:
+        raise ValueError("Sweep braucht KB-Dokumente und Tickets mit gold_kb_id")
+
+    t0 = time.perf_counter()
+    kb_vectors = [v for chunk in _chunks([d.page_content for d in docs], 64)
+                  for v in embeddings.embed_documents(chunk)]
+    query_vectors = [v for chunk in _chunks([q.text for q in queries], 64)
+                     for v in embeddings.embed_documents(chunk)]
+    logger.info(
+        "Embeddings vorbereitet: %s KB-Dokumente, %s Queries in %.1fs (Cache: %s)",
+        len(docs), len(queries), time.perf_counter() - t0, embeddings.cache_stats(),
+    )
+
+    kb_path_npy = os.path.join(SWEEP_DIR, "kb_vectors.npy")
+    query_path_npy = os.path.join(SWEEP_DIR, "query_vectors.npy")
+    np.save(kb_path_npy, np.asarray(kb_vectors, dtype=np.float32))
+    np.save(query_path_npy, np.asarray(query_vectors, dtype=np.float32))
+    return kb_path_npy, query_path_npy, [{q.gold_kb_id} for q in queries]
+
+
+def ingest_variant(quantization: bool, batch_size: int, kb_path: str, kb_vectors_path: str) -> dict:
+    """
+    Befüllt die Sweep-Collection einer (Quantisierung, batch_size)-Kombination neu.
+    """
+    client = get_client()
+    vectors = np.load(kb_vectors_path)
+    docs = load_kb_csv(kb_path)
+    collection = _collection_name(quantization, batch_size)
+
+    cfg = CollectionConfig(quantization=quantization, sparse_vectors=False)
+    provision_collection(
+        client, collection, vectors.shape[1], cfg=cfg, recreate=True, payload_indexes=PAYLOAD_INDEXES["kb"]
+    )
+
+    t0 = time.perf_counter()
+    for start in range(0, len(docs), batch_size):
+        client.upsert(
+            collection_name=collection,
+            points=[
+                models.PointStruct(
+                    id=point_id("kb", doc),
+                    vector=vector.tolist(),
+                    payload={"page_content": doc.page_content, "metadata": doc.metadata},
+                )
+                for doc, vector in zip(docs[start : start + batch_size], vectors[start : start + batch_size])
+            ],
+            wait=True,
+        )
+    ingest_s = time.perf_counter() - t0
+    return {
+        "collection": collection,
+        "ingest_s": ingest_s,
+        "ingest_docs_per_s": len(docs) / ingest_s if ingest_s > 0 else 0.0,
+    }
+
+
+def _batch_search(client, collection: str, vectors: np.ndarray, k: int, params: models.SearchParams):
+    return client.query_batch_points(
+        collection_name=collection,
+        requests=[
+            models.QueryRequest(query=v.tolist(), limit=k, params=params, with_payload=["metadata"])
+            for v in vectors
+        ],
+    )
+
+
+def run_point(point: GridPoint, query_vectors_path: str, relevant: list[set[str]]) -> dict:
+    """
+    Stellt alle Queries in Batches der Grösse query_batch_size und bewertet die KB-Treffer.
+    Die Incident-Suche (k_inc) läuft mit, sofern die Incident-Collection existiert,
+    und zählt zur Latenz. p50/p95 beziehen sich auf Requests (ein Batch), bei
+    query_batch_size 1 also auf einzelne Queries.
+    """
+    client = get_client()
+    vectors = np.load(query_vectors_path)
+    inc_collection = QdrantConfig().inc_collection
+    search_inc = client.collection_exists(inc_collection)
+
+    cfg = CollectionConfig()
+    params = models.SearchParams(
+        hnsw_ef=point.hnsw_ef,
+        quantization=models.QuantizationSearchParams(rescore=cfg.rescore, oversampling=cfg.oversampling)
+        if point.quantization else None,
+    )
+
+    retrieved: list[list[str]] = []
+    # Latenz pro Request (ein Batch aus query_batch_size Queries), wie sie der Aufrufer erlebt
+    request_ms: list[float] = []
+    t_start = time.perf_counter()
+    for chunk in _chunks(vectors, point.query_batch_size):
+        t0 = time.perf_counter()
+        responses = _batch_search(client, point.collection, chunk, point.k_kb, params)
+        if search_inc:
+            _batch_search(client, inc_collection, chunk, point.k_inc, params)
+        request_ms.append((time.perf_counter() - t0) * 1000)
+        retrieved.extend(
+            [(p.payload or {}).get("metadata", {}).get("kb_id") for p in response.points]
+            for response in responses
+        )
+    wall_s = time.perf_counter() - t_start
+
+    recall = RecallTopK(point.k_kb).compute_batch(retrieved, relevant)
+    ndcg = nDCGTopK(point.k_kb).compute_batch(retrieved, relevant)
+    return {
+        **asdict(point),
+        "recall": recall.mean[point.k_kb],
+        "ndcg": ndcg.mean[point.k_kb],
+        "requests": len(request_ms),
+        "request_p50_ms": float(np.percentile(request_ms, 50)),
+        "request_p95_ms": float(np.percentile(request_ms, 95)),
+        # amortisiert: Gesamtzeit / Queries, kein Perzentil
+        "mean_ms_per_query": float(np.sum(request_ms)) / len(vectors),
+        "queries_per_s": len(vectors) / wall_s if wall_s > 0 else 0.0,
+    }
+
+
+def run_sweep(
+    grid: list[GridPoint],
+    kb_path: str,
+    eval_csv: str,
+    workers: int = 1,
+    limit: int | None = None,
+    keep_collections: bool = False,
+) -> pd.DataFrame:
+    kb_vectors_path, query_vectors_path, relevant = prepare_vectors(kb_path, eval_csv, limit)
+    variants = sorted({(p.quantization, p.ingest_batch_size) for p in grid})
+    if workers > 1:
+        logger.warning("%s Worker teilen sich Qdrant, die gemessenen Latenzen sind nicht vergleichbar", workers)
+
+    try:
+        if workers <= 1:
+            ingests = [ingest_variant(q, b, kb_path, kb_vectors_path) for q, b in variants]
+            _log_ingests(ingests)
+            rows = [run_point(point, query_vectors_path, relevant) for point in grid]
+        else:
+            # spawn statt fork: der Elternprozess hält Threads/Sessions (Embedding-Client, Logging)
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                ingests = list(pool.map(
+                    ingest_variant,
+                    [q for q, _ in variants],
+                    [b for _, b in variants],
+                    [kb_path] * len(variants),
+                    [kb_vectors_path] * len(variants),
+                ))
+                _log_ingests(ingests)
+                rows = list(pool.map(
+                    run_point,
+                    grid,
+                    [query_vectors_path] * len(grid),
+                    [relevant] * len(grid),
+                ))
+    finally:
+        if not keep_collections:
+            _delete_collections(variants)
+
+    return _with_ingest(pd.DataFrame(rows), grid, ingests)
+
+
+def _log_ingests(ingests: list[dict]) -> None:
+    for ingest in ingests:
+        logger.info("Ingest %(collection)s: %(ingest_docs_per_s).1f docs/s", ingest)
+
+
+def _delete_collections(variants: list[tuple[bool, int]]) -> None:
+    client = get_client()
+    for quantization, batch_size in variants:
+        collection = _collection_name(quantization, batch_size)
+        try:
+            if client.collection_exists(collection):
+                client.delete_collection(collection)
+        except Exception as e:
+            logger.warning("Sweep-Collection %s nicht gelöscht: %s", collection, e)
+
+
+def _with_ingest(rows: pd.DataFrame, grid: list[GridPoint], ingests: list[dict]) -> pd.DataFrame:
+    rows["collection"] = [p.collection for p in grid]
+    return rows.merge(pd.DataFrame(ingests), on="collection", how="left")
+
+
+def _on_off(value: str) -> bool:
+    return value.lower() in ("1", "on", "true", "yes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep über Retrieval-Parameter (Latenz vs. Qualität)")
+    parser.add_argument("--k-inc", type=int, nargs="+", default=[3])
+    parser.add_argument("--k-kb", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--hnsw-ef", type=int, nargs="+", default=[32, 64, 128, 256])
+    parser.add_argument("--quantization", type=_on_off, nargs="+", default=[False, True], help="on/off")
+    parser.add_argument("--ingest-batch-size", type=int, nargs="+", default=[64])
+    parser.add_argument("--query-batch-size", type=int, nargs="+", default=[1, 32])
+    parser.add_argument("--workers", type=int, default=1, help=">1 nur für Vorab-Sweeps, verfälscht Latenzen")
+    parser.add_argument("--limit", type=int, default=None, help="nur die ersten N Tickets als Queries")
+    parser.add_argument("--eval-csv", default=DataConfig().incident_path)
+    parser.add_argument("--kb-csv", default=DataConfig().kb_path)
+    parser.add_argument("--keep-collections", action="store_true")
+    args = parser.parse_args()
+
+    grid = build_grid(
+        args.k_inc, args.k_kb, args.hnsw_ef, args.quantization, args.ingest_batch_size, args.query_batch_size
+    )
+    logger.info("Sweep über %s Grid-Punkte mit %s Worker-Prozessen", len(grid), args.workers)
+
+    results = run_sweep(
+        grid, args.kb_csv, args.eval_csv,
+        workers=args.workers, limit=args.limit, keep_collections=args.keep_collections,
+    )
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    out_csv = OUT_DIR / "retrieval_sweep.csv"
+    results.to_csv(out_csv, index=False)
+    print(results.sort_values("request_p95_ms").to_string(index=False))
+    print(f"\nErgebnis-Tabelle: {out_csv}")
+
+    try:
+        from benchmark.visual_benchmark import pareto_front, plot_pareto_front
+    except ImportError as e:
+        logger.warning("Pareto-Front übersprungen (%s)", e)
+        return
+
+    front = results[pareto_front(results, "request_p95_ms", "ndcg")].sort_values("request_p95_ms")
+    print("\nPareto-Front (request_p95_ms vs. ndcg):")
+    print(front.to_string(index=False))
+
+    results["label"] = [
+        f"k={r.k_kb} ef={r.hnsw_ef} q={int(r.quantization)} b={r.query_batch_size}"
+        for r in results.itertuples()
+    ]
+    plot_pareto_front(results, x="request_p95_ms", y="ndcg", label="label", out_name="retrieval_sweep_pareto.png")
+
+
+if __name__ == "__main__":
+    main()
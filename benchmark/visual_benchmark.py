@@ -1,17 +1,17 @@
-# bin/visual_benchmark.py
+# benchmark/visual_benchmark.py
 
 from pathlib import Path
 
 import pandas as pd
 import matplotlib.pyplot as plt
 
-from .config import BASE_DIR
-from .logging_utils import get_logger
+from bin.config import BASE_DIR
+from bin.logging_utils import get_logger
 
 logger = get_logger(__name__)
 
-CSV_PATH = BASE_DIR / "logs" / "ollama_calls.csv"
-OUT_DIR = BASE_DIR / "reports" / "benchmarks"
+CSV_PATH = Path(BASE_DIR) / "logs" / "ollama_calls.csv"
+OUT_DIR = Path(BASE_DIR) / "reports" / "benchmarks"
 
 
 def load_data():
@@ -91,6 +91,57 @@ def plot_walltime_per_model(df: pd.DataFrame):
     logger.info("Plot gespeichert: %s", out_file)
 
 
+def pareto_front(df: pd.DataFrame, x: str, y: str) -> pd.Series:
+    """
+    Markiert die Pareto-optimalen Zeilen: x minimieren (z.B. Latenz), y maximieren (z.B. nDCG).
+    """
+    ordered = df.sort_values([x, y], ascending=[True, False])
+    best = float("-inf")
+    on_front = pd.Series(False, index=df.index)
+    for idx, value in ordered[y].items():
+        if value > best:
+            on_front[idx] = True
+            best = value
+    return on_front
+
+
+def plot_pareto_front(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    label: str | None = None,
+    out_name: str = "pareto_front.png",
+) -> Path | None:
+    """
+    Streudiagramm aller Sweep-Punkte, die Pareto-Front wird als Linie hervorgehoben.
+    label: Spalte, mit der die Front-Punkte beschriftet werden.
+    """
+    if df.empty:
+        logger.warning("Keine Daten für Pareto-Plot.")
+        return None
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    out_file = OUT_DIR / out_name
+    front = df[pareto_front(df, x, y)].sort_values(x)
+
+    plt.figure()
+    plt.scatter(df[x], df[y], alpha=0.4, label="Sweep-Punkte")
+    plt.plot(front[x], front[y], marker="o", color="tab:red", label="Pareto-Front")
+    if label:
+        for _, row in front.iterrows():
+            plt.annotate(str(row[label]), (row[x], row[y]), fontsize=7,
+                         textcoords="offset points", xytext=(4, 4))
+    plt.title(f"{y} vs. {x}")
+    plt.xlabel(x)
+    plt.ylabel(y)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(out_file)
+    plt.close()
+    logger.info("Plot gespeichert: %s", out_file)
+    return out_file
+
+
 def main():
     df = load_data()
     if df is None:
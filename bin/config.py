@@ -24,6 +24,38 @@ class QdrantConfig:
     url: str = os.getenv("QDRANT_URL", "http://localhost:6333")
     inc_collection: str = os.getenv("QDRANT_INC_COLLECTION", "incidents_csv")
     kb_collection: str = os.getenv("QDRANT_KB_COLLECTION", "kb_csv")
+    # gRPC statt REST/JSON (Protobuf ist vor allem beim Bulk-Ingest deutlich günstiger)
+    prefer_grpc: bool = _str_to_bool(os.getenv("QDRANT_PREFER_GRPC", "false"), False)
+    grpc_port: int = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+
+
+@dataclass
+class VectorStoreConfig:
+    # "qdrant" oder "numpy" (In-Process-Index für Offline-Läufe, Evaluation und CI)
+    backend: str = os.getenv("VECTOR_BACKEND", "qdrant")
+    numpy_dir: str = os.getenv("NUMPY_STORE_DIR", os.path.join(BASE_DIR, "cache", "numpy_store"))
+    numpy_dtype: str = os.getenv("NUMPY_STORE_DTYPE", "float32")
+    numpy_mmap: bool = _str_to_bool(os.getenv("NUMPY_STORE_MMAP", "true"), True)
+
+
+@dataclass
+class CollectionConfig:
+    # Collection-Parameter für app.provision
+    distance: str = os.getenv("QDRANT_DISTANCE", "Cosine")
+    hnsw_m: int = int(os.getenv("QDRANT_HNSW_M", "16"))
+    hnsw_ef_construct: int = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+    on_disk_vectors: bool = _str_to_bool(os.getenv("QDRANT_ON_DISK_VECTORS", "false"), False)
+    # Skalare int8-Quantisierung (Originalvektoren bleiben für Rescoring erhalten)
+    quantization: bool = _str_to_bool(os.getenv("QDRANT_QUANTIZATION", "false"), False)
+    quantization_quantile: float = float(os.getenv("QDRANT_QUANTIZATION_QUANTILE", "0.99"))
+    quantization_always_ram: bool = _str_to_bool(os.getenv("QDRANT_QUANTIZATION_ALWAYS_RAM", "true"), True)
+    # Benannter Sparse-Vektor ("text") für serverseitige Dense+Sparse-Fusion
+    sparse_vectors: bool = _str_to_bool(os.getenv("QDRANT_SPARSE_VECTORS", "true"), True)
+
+    # Suchparameter: hnsw_ef = Recall vs. Latenz
+    hnsw_ef: int = int(os.getenv("QDRANT_HNSW_EF", "128"))
+    rescore: bool = _str_to_bool(os.getenv("QDRANT_RESCORE", "true"), True)
+    oversampling: float = float(os.getenv("QDRANT_OVERSAMPLING", "2.0"))
 
 
 @dataclass
@@ -32,6 +64,11 @@ class EmbeddingConfig:
     model: str = os.getenv("TEMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
     dim: int = int(os.getenv("EMBEDDING_DIM", "384"))
 
+    # Persistenter Embedding-Cache (SQLite), Key = (model, sha256(text))
+    cache_enabled: bool = _str_to_bool(os.getenv("EMBEDDING_CACHE_ENABLED", "true"), True)
+    cache_path: str = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(BASE_DIR, "cache", "embeddings.sqlite"))
+    cache_max_entries: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
 
 @dataclass
 class OllamaConfig:
@@ -46,7 +83,53 @@ class OllamaConfig:
     #Standardmodell
     model: str = os.getenv("OLLAMA_MODEL", "")
     threads: int = int(os.getenv("OLLAMA_THREADS", "8"))
-    
+    # Antwort tokenweise streamen (NDJSON) statt am Stück
+    stream: bool = _str_to_bool(os.getenv("OLLAMA_STREAM", "true"), True)
+    # Wie lange Ollama das Modell nach einem Call im Speicher hält (z.B. "30m", "-1" = immer)
+    keep_alive: str = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+    # Parallele Generate-Requests im Batch-Modus (sinnvoll bis OLLAMA_NUM_PARALLEL des Servers)
+    concurrency: int = int(os.getenv("OLLAMA_CONCURRENCY", "2"))
+
+
+@dataclass
+class ServiceConfig:
+    # Resident Query-Service (app.query_service)
+    host: str = os.getenv("QUERY_SERVICE_HOST", "127.0.0.1")
+    port: int = int(os.getenv("QUERY_SERVICE_PORT", "8090"))
+    # Gleichzeitige Antwort-Generierungen (CPU-LLM: klein halten)
+    max_concurrency: int = int(os.getenv("QUERY_SERVICE_MAX_CONCURRENCY", "2"))
+    # Wartende Requests über max_concurrency hinaus; darüber -> 503
+    queue_size: int = int(os.getenv("QUERY_SERVICE_QUEUE_SIZE", "16"))
+    # Max. Wartezeit in der Queue in Sekunden
+    queue_timeout: float = float(os.getenv("QUERY_SERVICE_QUEUE_TIMEOUT", "120"))
+
+
+@dataclass
+class AnswerCacheConfig:
+    # Semantischer Antwort-Cache vor ask_ollama
+    enabled: bool = _str_to_bool(os.getenv("ANSWER_CACHE_ENABLED", "true"), True)
+    path: str = os.getenv("ANSWER_CACHE_PATH", os.path.join(BASE_DIR, "cache", "answers.sqlite"))
+    # Mindest-Cosine-Similarity der Query-Embeddings für einen Treffer
+    threshold: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+    ttl_s: float = float(os.getenv("ANSWER_CACHE_TTL_S", "86400"))
+    max_entries: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+
+@dataclass
+class ContextConfig:
+    # Token-Budget pro Kontextblock (geschätzt) nach Quelle
+    budget_incident: int = int(os.getenv("CONTEXT_BUDGET_INCIDENT", "400"))
+    budget_kb: int = int(os.getenv("CONTEXT_BUDGET_KB", "600"))
+    # Erlaubte num_ctx-Grössen; gewählt wird die kleinste, in die der Prompt passt
+    num_ctx_options: tuple[int, ...] = tuple(
+        int(n) for n in os.getenv("CONTEXT_NUM_CTX_OPTIONS", "2048,4096,8192").split(",")
+    )
+    # Platz für die Antwort im Kontextfenster
+    answer_reserve: int = int(os.getenv("CONTEXT_ANSWER_RESERVE", "512"))
+    # Ab dieser Wort-Jaccard-Ähnlichkeit gelten Blöcke als Duplikat
+    dedup_threshold: float = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.9"))
+
+
 @dataclass
 class DataConfig:
     data_dir: str = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "data"))
@@ -102,3 +185,37 @@ class LoggingConfig:
     to_file: bool = _str_to_bool(os.getenv("LOG_TO_FILE", "true"), True)
     path: str = os.getenv("LOG_PATH", "logs")
     log_file: str = os.getenv("LOG_FILE", path+"/default.log")
+
+@dataclass
+class TracingConfig:
+    # Spans pro Stufe des Query-Pfads (bin.tracing); aus = praktisch kein Overhead
+    enabled: bool = _str_to_bool(os.getenv("TRACING_ENABLED", "false"), False)
+    # JSONL-Datei, eine Zeile pro Span (relativ zu BASE_DIR)
+    path: str = os.getenv("TRACING_PATH", "logs/traces.jsonl")
+
+@dataclass
+class RetrievalConfig:
+    k_inc: int = int(os.getenv("RETRIEVAL_K_INC", "3"))
+    k_kb: int = int(os.getenv("RETRIEVAL_K_KB", "3"))
+    # Timeouts pro Collection in Sekunden; 0 = ohne Timeout
+    timeout_inc: float = float(os.getenv("RETRIEVAL_TIMEOUT_INC", "5"))
+    timeout_kb: float = float(os.getenv("RETRIEVAL_TIMEOUT_KB", "5"))
+    max_workers: int = int(os.getenv("RETRIEVAL_MAX_WORKERS", "4"))
+    # "dense", "hybrid" (Dense + lokaler BM25-Index, RRF im Prozess)
+    # oder "server_hybrid" (Dense + Qdrant-Sparse-Vektor, RRF in Qdrant)
+    mode: str = os.getenv("RETRIEVAL_MODE", "dense")
+    rrf_k: int = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+    # Kandidaten pro Retriever und Collection vor der Fusion
+    hybrid_candidates: int = int(os.getenv("RETRIEVAL_HYBRID_CANDIDATES", "20"))
+    lexical_dir: str = os.getenv("LEXICAL_INDEX_DIR", os.path.join(BASE_DIR, "cache", "lexical"))
+
+@dataclass
+class IngestConfig:
+    batch_size: int = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+    # Pipeline: N parallele Embedding-Worker -> M parallele Upsert-Writer
+    embed_workers: int = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+    upsert_workers: int = int(os.getenv("INGEST_UPSERT_WORKERS", "2"))
+    # Max. Batches pro Queue (Backpressure)
+    queue_size: int = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+    # Manifeste (Point-ID -> Content-Hash) für inkrementellen Ingest
+    manifest_dir: str = os.getenv("INGEST_MANIFEST_DIR", os.path.join(BASE_DIR, "cache", "manifests"))
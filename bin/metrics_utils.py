@@ -1,18 +1,38 @@
 # bin/metrics_utils.py
 from __future__ import annotations
 
+import threading
 import time
 import uuid
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Dict, List, Optional
+
+import numpy as np
 
 from .logging_utils import get_logger
 
 logger = get_logger("metrics")
 
+# Perzentile für die Latenz-/Durchsatz-Histogramme im Run-Summary
+PERCENTILES = (50, 95, 99)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {f"p{p}": 0.0 for p in PERCENTILES}
+    return {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
 
 @dataclass
 class OllamaRunMetrics:
+    """
+    Metriken eines Runs (z.B. ein Generator-Lauf). record() ist thread-sicher,
+    mehrere Runs können parallel existieren (Registry nach run_id).
+
+    Als Context-Manager wird der Run beim Verlassen beendet und das Summary geloggt:
+      with metrics_utils.create_run(model=..., total_tickets=..., ...) as run:
+          run.record(batch_size=5, duration=12.3, eval_tokens=800, prompt_tokens=400)
+    """
     run_id: str
     model: str
     total_tickets: int
@@ -32,8 +52,129 @@ class OllamaRunMetrics:
     seed: Optional[int] = None
     num_predict: Optional[int] = None
 
+    # Einzelwerte pro Call für p50/p95/p99
+    durations: List[float] = field(default_factory=list, repr=False)
+    tokens_per_second: List[float] = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, batch_size: int, duration: float, eval_tokens: int, prompt_tokens: int) -> float:
+        """
+        Akkumuliert einen Ollama-Call, liefert tokens/s des Calls.
+        """
+        tps = (eval_tokens / duration) if duration > 0 and eval_tokens else 0.0
+        with self._lock:
+            self.num_calls += 1
+            self.total_eval_tokens += eval_tokens
+            self.total_prompt_tokens += prompt_tokens
+            self.total_llm_time += duration
+            self.durations.append(duration)
+            if tps:
+                self.tokens_per_second.append(tps)
+            call_no = self.num_calls
+
+        logger.info(
+            "Ollama-Call #%s (run_id=%s): batch_size=%s, duration=%.3fs, eval_tokens=%s, prompt_tokens=%s, tokens/s=%.2f",
+            call_no,
+            self.run_id,
+            batch_size,
+            duration,
+            eval_tokens,
+            prompt_tokens,
+            tps,
+        )
+        return tps
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Momentaufnahme aller Summen und Perzentile (auch während der Run läuft).
+        """
+        with self._lock:
+            durations = list(self.durations)
+            tps = list(self.tokens_per_second)
+            num_calls = self.num_calls
+            total_eval = self.total_eval_tokens
+            total_prompt = self.total_prompt_tokens
+            llm_time = self.total_llm_time
+        end = self.end_time if self.end_time is not None else time.time()
+
+        summary = {
+            "calls": num_calls,
+            "total_eval_tokens": total_eval,
+            "total_prompt_tokens": total_prompt,
+            "llm_time": llm_time,
+            "wall_time": end - self.start_time,
+            "avg_eval_tokens_per_call": total_eval / num_calls if num_calls else 0.0,
+            "avg_tokens_per_second": total_eval / llm_time if llm_time > 0 else 0.0,
+        }
+        summary.update({f"duration_{k}": v for k, v in _percentiles(durations).items()})
+        summary.update({f"tokens_per_second_{k}": v for k, v in _percentiles(tps).items()})
+        return summary
+
+    def __enter__(self) -> "OllamaRunMetrics":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        end_run(self.run_id)
+        return False
+
+
+# Registry aller offenen Runs; _default_run_id bedient die Aufrufe ohne run_id
+_runs: Dict[str, OllamaRunMetrics] = {}
+_default_run_id: Optional[str] = None
+_registry_lock = threading.Lock()
+
+
+def create_run(
+    model: str,
+    total_tickets: int = 0,
+    tickets_per_call: int = 0,
+    temperature: float = 0.0,
+    top_p: float = 0.0,
+    ctx_tokens: int = 0,
+    repeat_penalty: float = 0.0,
+    seed: Optional[int] = None,
+    num_predict: Optional[int] = None,
+) -> OllamaRunMetrics:
+    """
+    Legt einen neuen Run in der Registry an, ohne den Default-Run zu ändern.
+    Für parallele Runs (Worker, Requests) den Run explizit weiterreichen.
+    """
+    metrics = OllamaRunMetrics(
+        run_id=str(uuid.uuid4()),
+        model=model,
+        total_tickets=total_tickets,
+        tickets_per_call=tickets_per_call,
+        temperature=temperature,
+        top_p=top_p,
+        ctx_tokens=ctx_tokens,
+        repeat_penalty=repeat_penalty,
+        seed=seed,
+        num_predict=num_predict,
+    )
+    with _registry_lock:
+        _runs[metrics.run_id] = metrics
+
+    logger.info(
+        "Starte Ollama-Metrik-Run: run_id=%s, model=%s, total_tickets=%s, tickets_per_call=%s",
+        metrics.run_id,
+        model,
+        total_tickets,
+        tickets_per_call,
+    )
+    return metrics
+
+
+def get_run(run_id: Optional[str] = None) -> Optional[OllamaRunMetrics]:
+    """
+    Run nach run_id; ohne run_id der Default-Run aus start_run.
+    """
+    with _registry_lock:
+        return _runs.get(run_id if run_id is not None else _default_run_id)
+
 
-_metrics: Optional[OllamaRunMetrics] = None
+def active_runs() -> List[str]:
+    with _registry_lock:
+        return list(_runs)
 
 
 def start_run(
@@ -48,13 +189,12 @@ def start_run(
     num_predict: int
 ) -> str:
     """
-    Startet einen neuen Metrics-Run für die Ticketgenerierung.
+    Startet einen neuen Metrics-Run für die Ticketgenerierung und macht ihn zum
+    Default-Run für log_ollama_call/end_run ohne run_id.
     Gibt eine run_id zurück (kannst du später in Logs/MA referenzieren).
     """
-    global _metrics
-    run_id = str(uuid.uuid4())
-    _metrics = OllamaRunMetrics(
-        run_id=run_id,
+    global _default_run_id
+    metrics = create_run(
         model=model,
         total_tickets=total_tickets,
         tickets_per_call=tickets_per_call,
@@ -62,18 +202,18 @@ def start_run(
         top_p=top_p,
         ctx_tokens=ctx_tokens,
         repeat_penalty=repeat_penalty,
-        seed=seed
-    )
-
-
-    logger.info(
-        "Starte Ollama-Metrik-Run: run_id=%s, model=%s, total_tickets=%s, tickets_per_call=%s",
-        run_id,
-        model,
-        total_tickets,
-        tickets_per_call,
+        seed=seed,
+        num_predict=num_predict,
     )
-    return run_id
+    with _registry_lock:
+        previous = _default_run_id if _default_run_id in _runs else None
+        _default_run_id = metrics.run_id
+    if previous is not None:
+        # Der alte Run bleibt erhalten und kann per end_run(run_id) abgeschlossen werden
+        logger.warning(
+            "start_run: Run %s ist noch offen, Default-Run wechselt auf %s.", previous, metrics.run_id
+        )
+    return metrics.run_id
 
 
 def log_ollama_call(
@@ -81,59 +221,39 @@ def log_ollama_call(
     duration: float,
     eval_tokens: int,
     prompt_tokens: int,
+    run_id: Optional[str] = None,
 ) -> None:
     """
     Pro Ollama-Call aufrufen: protokolliert Dauer und Tokenzahlen
-    und akkumuliert sie für den gesamten Run.
+    und akkumuliert sie für den Run (ohne run_id: der Default-Run).
     """
-    global _metrics
-    if _metrics is None:
+    metrics = get_run(run_id)
+    if metrics is None:
         # Falls jemand vergisst start_run aufzurufen, nicht crashen
         logger.warning(
             "log_ollama_call wurde ohne aktiven Metrics-Run aufgerufen. "
             "Rufe zuerst start_run(...) auf."
         )
         return
+    metrics.record(batch_size, duration, eval_tokens, prompt_tokens)
 
-    _metrics.num_calls += 1
-    _metrics.total_eval_tokens += eval_tokens
-    _metrics.total_prompt_tokens += prompt_tokens
-    _metrics.total_llm_time += duration
-
-    tokens_per_second = (eval_tokens / duration) if duration > 0 and eval_tokens else 0.0
 
-    logger.info(
-        "Ollama-Call #%s: batch_size=%s, duration=%.3fs, eval_tokens=%s, prompt_tokens=%s, tokens/s=%.2f",
-        _metrics.num_calls,
-        batch_size,
-        duration,
-        eval_tokens,
-        prompt_tokens,
-        tokens_per_second,
-    )
-
-
-def end_run() -> None:
+def end_run(run_id: Optional[str] = None) -> Optional[Dict[str, float]]:
     """
-    Schliesst den aktuellen Metrics-Run ab und loggt eine Gesamtauswertung.
+    Schliesst den Run ab (ohne run_id: den Default-Run), entfernt ihn aus der
+    Registry und loggt eine Gesamtauswertung. Liefert das Summary.
     """
-    global _metrics
-    if _metrics is None:
-        return
+    global _default_run_id
+    with _registry_lock:
+        key = run_id if run_id is not None else _default_run_id
+        metrics = _runs.pop(key, None) if key is not None else None
+        if key is not None and key == _default_run_id:
+            _default_run_id = None
+    if metrics is None:
+        return None
 
-    _metrics.end_time = time.time()
-    wall_time = _metrics.end_time - _metrics.start_time
-
-    avg_eval_per_call = (
-        _metrics.total_eval_tokens / _metrics.num_calls
-        if _metrics.num_calls
-        else 0.0
-    )
-    avg_tokens_per_second = (
-        _metrics.total_eval_tokens / _metrics.total_llm_time
-        if _metrics.total_llm_time > 0
-        else 0.0
-    )
+    metrics.end_time = time.time()
+    summary = metrics.summary()
 
     logger.info(
         (
@@ -143,22 +263,80 @@ def end_run() -> None:
             "avg_eval_tokens_per_call=%.1f, avg_tokens_per_second=%.2f, "
             "temperature=%.2f, top_p=%.2f, ctx_tokens=%s, repeat_penalty=%.2f, seed=%s, num_predict=%s"
         ),
-        _metrics.run_id,
-        _metrics.model,
-        _metrics.num_calls,
-        _metrics.total_eval_tokens,
-        _metrics.total_prompt_tokens,
-        _metrics.total_llm_time,
-        wall_time,
-        avg_eval_per_call,
-        avg_tokens_per_second,
-        _metrics.temperature,
-        _metrics.top_p,
-        _metrics.ctx_tokens,
-        _metrics.repeat_penalty,
-        _metrics.seed,
-        _metrics.num_predict
+        metrics.run_id,
+        metrics.model,
+        summary["calls"],
+        summary["total_eval_tokens"],
+        summary["total_prompt_tokens"],
+        summary["llm_time"],
+        summary["wall_time"],
+        summary["avg_eval_tokens_per_call"],
+        summary["avg_tokens_per_second"],
+        metrics.temperature,
+        metrics.top_p,
+        metrics.ctx_tokens,
+        metrics.repeat_penalty,
+        metrics.seed,
+        metrics.num_predict
+    )
+    logger.info(
+        "Ollama-Run-Latenzen: run_id=%s, duration p50=%.2fs p95=%.2fs p99=%.2fs, "
+        "tokens/s p50=%.2f p95=%.2f p99=%.2f",
+        metrics.run_id,
+        summary["duration_p50"],
+        summary["duration_p95"],
+        summary["duration_p99"],
+        summary["tokens_per_second_p50"],
+        summary["tokens_per_second_p95"],
+        summary["tokens_per_second_p99"],
     )
+    return summary
+
 
-    # Reset für nächsten Run
-    _metrics = None
+@dataclass
+class StreamCallMetrics:
+    """
+    Kennzahlen eines gestreamten Ollama-Calls (query_demo).
+    ttft_s = Zeit bis zum ersten Token, total_s = Zeit bis zum letzten Chunk.
+    """
+    model: str
+    ttft_s: float
+    total_s: float
+    eval_tokens: int
+    prompt_tokens: int
+    tokens_per_second: float
+
+
+def log_stream_call(
+    model: str,
+    ttft_s: float,
+    total_s: float,
+    eval_tokens: int,
+    prompt_tokens: int,
+    eval_duration_s: float = 0.0,
+) -> StreamCallMetrics:
+    """
+    Protokolliert einen gestreamten Ollama-Call. tokens/s kommt bevorzugt aus
+    Ollamas eval_duration, sonst aus der Zeit zwischen erstem und letztem Token.
+    """
+    generation_s = eval_duration_s if eval_duration_s > 0 else max(total_s - ttft_s, 0.0)
+    tokens_per_second = eval_tokens / generation_s if generation_s > 0 and eval_tokens else 0.0
+
+    metrics = StreamCallMetrics(
+        model=model,
+        ttft_s=ttft_s,
+        total_s=total_s,
+        eval_tokens=eval_tokens,
+        prompt_tokens=prompt_tokens,
+        tokens_per_second=tokens_per_second,
+    )
+    logger.info(
+        "Ollama-Stream: model=%s, ttft=%.3fs, total=%.3fs, eval_tokens=%s, prompt_tokens=%s, tokens/s=%.2f",
+        model,
+        ttft_s,
+        total_s,
+        eval_tokens,
+        prompt_tokens,
+        tokens_per_second,
+    )
+    return metrics
@@ -0,0 +1,239 @@
+# bin/tracing.py
+"""
+Leichtgewichtiges Span-Tracing für den Query-Pfad.
+
+Jeder Span wird beim Verlassen als eine JSONL-Zeile geschrieben:
+  {"trace_id": ..., "span_id": ..., "parent_id": ..., "name": "search.kb",
+   "start": <epoch s>, "duration_ms": 12.3, "attrs": {...}}
+
+Der äusserste Span eines Threads eröffnet einen neuen Trace, verschachtelte Spans
+erben trace_id und parent_id über contextvars. Für Thread-Pools muss die Funktion
+mit wrap() übergeben werden, damit der Kontext im Worker-Thread ankommt.
+
+Ist Tracing abgeschaltet (TRACING_ENABLED=false), liefert span() ein geteiltes
+No-op-Objekt, es entstehen weder IDs noch Zeitmessungen noch I/O.
+
+Auswertung (p50/p95/p99 pro Stufe):
+  python -m bin.tracing logs/traces.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+from .config import BASE_DIR, TracingConfig
+
+_cfg = TracingConfig()
+_enabled = _cfg.enabled
+_path = _cfg.path if os.path.isabs(_cfg.path) else os.path.join(BASE_DIR, _cfg.path)
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+_write_lock = threading.Lock()
+_file = None
+
+
+def configure(enabled: bool | None = None, path: str | None = None) -> None:
+    """
+    Überschreibt TracingConfig zur Laufzeit (Tests, Benchmarks).
+    """
+    global _enabled, _path
+    close()
+    if enabled is not None:
+        _enabled = enabled
+    if path is not None:
+        _path = path
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _write(record: dict) -> None:
+    global _file
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with _write_lock:
+        if _file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(_path)), exist_ok=True)
+            _file = open(_path, "a", encoding="utf-8", buffering=1)
+        _file.write(line)
+
+
+def close() -> None:
+    global _file
+    with _write_lock:
+        if _file is not None:
+            _file.close()
+        _file = None
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "_start", "_t0", "_token")
+
+    def __init__(self, name: str, attrs: dict):
+        parent = _current.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.parent_id = parent.span_id if parent else None
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self._start = time.time()
+        self._t0 = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        duration = time.perf_counter() - self._t0
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _write(
+            {
+                "trace_id": self.trace_id,
+                "span_id": self.span_id,
+                "parent_id": self.parent_id,
+                "name": self.name,
+                "start": self._start,
+                "duration_ms": round(duration * 1000, 3),
+                "attrs": self.attrs,
+            }
+        )
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attrs) -> Span | _NoopSpan:
+    """
+    Misst den umschlossenen Block als Span:
+      with span("search.kb", k=3) as s:
+          ...
+          s.set(hits=len(hits))
+    """
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def record_span(name: str, duration_s: float, **attrs) -> None:
+    """
+    Schreibt einen extern gemessenen Span (z.B. Ollamas prompt_eval_duration)
+    als Kind des aktuellen Spans; start ist dabei der Zeitpunkt der Aufzeichnung.
+    """
+    if not _enabled:
+        return
+    parent = _current.get()
+    _write(
+        {
+            "trace_id": parent.trace_id if parent else uuid.uuid4().hex,
+            "span_id": uuid.uuid4().hex[:16],
+            "parent_id": parent.span_id if parent else None,
+            "name": name,
+            "start": time.time(),
+            "duration_ms": round(duration_s * 1000, 3),
+            "attrs": attrs,
+        }
+    )
+
+
+def wrap(fn: Callable) -> Callable:
+    """
+    Bindet fn an den aktuellen Kontext, damit Spans in Pool-Threads
+    zum Trace des Aufrufers gehören. Ohne Tracing wird fn unverändert zurückgegeben.
+    """
+    if not _enabled:
+        return fn
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def read_spans(paths: Iterable[str]) -> list[dict]:
+    spans = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    spans.append(json.loads(line))
+    return spans
+
+
+def summarize(spans: Iterable[dict]) -> dict[str, dict[str, float]]:
+    """
+    count, mean, p50, p95, p99 und max der Dauer (ms) pro Span-Name,
+    in der Reihenfolge des ersten Auftretens.
+    """
+    durations: dict[str, list[float]] = {}
+    for s in spans:
+        durations.setdefault(s["name"], []).append(s["duration_ms"])
+
+    summary = {}
+    for name, values in durations.items():
+        arr = np.asarray(values, dtype=np.float64)
+        p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+        summary[name] = {
+            "count": len(arr),
+            "mean": float(arr.mean()),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(arr.max()),
+        }
+    return summary
+
+
+def print_summary(summary: dict[str, dict[str, float]]) -> None:
+    width = max([len(name) for name in summary] + [5])
+    print(f"{'stage':<{width}}  {'count':>7}  {'mean':>9}  {'p50':>9}  {'p95':>9}  {'p99':>9}  {'max':>9}")
+    for name, s in summary.items():
+        print(
+            f"{name:<{width}}  {s['count']:>7}  {s['mean']:>9.1f}  {s['p50']:>9.1f}  "
+            f"{s['p95']:>9.1f}  {s['p99']:>9.1f}  {s['max']:>9.1f}"
+        )
+    print("(Angaben in ms)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latenz-Perzentile pro Stufe aus Trace-Dateien")
+    parser.add_argument("paths", nargs="*", default=[_path], help="JSONL-Trace-Dateien")
+    parser.add_argument("--name", help="nur Spans, deren Name so beginnt (z.B. 'ollama')")
+    args = parser.parse_args()
+
+    spans = read_spans(args.paths)
+    if args.name:
+        spans = [s for s in spans if s["name"].startswith(args.name)]
+    if not spans:
+        print("Keine Spans gefunden.")
+        return
+    print(f"{len({s['trace_id'] for s in spans})} Traces, {len(spans)} Spans")
+    print_summary(summarize(spans))
+
+
+if __name__ == "__main__":
+    main()
@@ -225,7 +225,7 @@ class KBGenerator:
 
         # Metriken-Run initialisieren
 
-        metrics_utils.start_run(
+        self.run_id = metrics_utils.start_run(
             model=self.model,
             total_tickets=0,        # hier: Anzahl Tickets ist optional -> wird nicht genutzt oder kann bei Bedarf gesetzt werden auf Gesamtanzahl der Tickets
             tickets_per_call=0,  # hier: Anzahl Tickets pro KB-Call (repräsentativ) -> wird nicht genutzt oder kann bei Bedarf gesetzt werden auf Tickets pro KB-Call
@@ -362,8 +362,8 @@ class KBGenerator:
             len(kb_articles), len(tickets), duration
         )
 
-        metrics_utils.end_run()
-        logger.info("Skript beendet.")  # run_id kannst du bei Bedarf wieder ergänzen
+        metrics_utils.end_run(self.run_id)
+        logger.info("Skript beendet. run_id=%s", self.run_id)
 
     # ----------------------------
     # Step 1: Tickets laden
@@ -649,6 +649,7 @@ class KBGenerator:
             prompt_tokens=prompt_tokens,
             duration=duration,
             batch_size=len(tickets_in_group),
+            run_id=self.run_id,
         )
 
         # JSON aus content parsen
@@ -0,0 +1,39 @@
+from typing import Iterable, Set
+
+"""
+Compute the Reciprocal Rank (RR@K) for a ranked list of retrieved documents.
+The mean over all queries is the MRR@K. Written to match RecallTopK and nDCGTopK.
+
+Parameters
+----------
+retrieved_ids : iterable of str
+    Ranked list of retrieved document IDs.
+relevant_ids : iterable of str
+    Collection of relevant document IDs.
+
+Returns
+-------
+float
+    1 / rank of the first relevant document within the Top-K, 0.0 if none.
+
+"""
+
+class MRRTopK:
+    def __init__(self, k: int):
+        if k <= 0:
+            raise ValueError("k must be a positive integer")
+        self.k = k
+
+    def compute(
+        self,
+        retrieved_ids: Iterable[str],
+        relevant_ids: Iterable[str],
+    ) -> float:
+
+        relevant_set: Set[str] = set(relevant_ids)
+
+        # Erster Treffer innerhalb der Top-K bestimmt den Reciprocal Rank
+        for rank, doc_id in enumerate(list(retrieved_ids)[: self.k], start=1):
+            if doc_id in relevant_set:
+                return 1.0 / rank
+        return 0.0
@@ -1,4 +1,12 @@
-from typing import Iterable, Set
+from typing import Iterable, Optional, Sequence, Set
+
+import numpy as np
+
+try:
+    from metrics.retrievalquaility.batch import BatchScores, column_at, first_occurrence, hit_matrix, summarize
+except (ModuleNotFoundError, ImportError):
+    # Fallback for direct execution from this directory (see test_rq.py)
+    from batch import BatchScores, column_at, first_occurrence, hit_matrix, summarize
 
 """
 Compute Recall@K for a ranked list of retrieved documents. Class was initialially generated by ChatGPT by ChatGPT and edited by github copilot
@@ -46,3 +54,34 @@ class RecallTopK:
         # zu der Gesamtanzahl der relevanten Dokumente. Ergebnis wird als Float zurückgegeben und ist
         # im Bereich [0, 1]. 
         return len(retrieved_relevant) / len(relevant_set)
+
+    def compute_batch(
+        self,
+        retrieved_ids,
+        relevant_ids: Sequence[Iterable[str]],
+        ks: Optional[Iterable[int]] = None,
+    ) -> BatchScores:
+        """
+        Recall@K for many queries and several k values in one NumPy pass.
+        retrieved_ids: 2-D array of (integer-encoded) IDs or ranked lists per query.
+        Results are identical to compute() per query; ks defaults to [self.k].
+        """
+        ks = list(ks) if ks is not None else [self.k]
+        if any(k <= 0 for k in ks):
+            raise ValueError("k must be a positive integer")
+        relevant_ids = [set(rel) for rel in relevant_ids]
+
+        # Duplikate im Ranking zählen wie in compute() (Schnittmenge) nur einmal
+        hits = hit_matrix(retrieved_ids, relevant_ids) & first_occurrence(retrieved_ids)
+        found = np.cumsum(hits, axis=1)
+        n_relevant = np.array([len(rel) for rel in relevant_ids], dtype=np.int64)
+
+        per_query = {}
+        for k in ks:
+            per_query[k] = np.divide(
+                column_at(found, k),
+                n_relevant,
+                out=np.zeros(len(n_relevant), dtype=np.float64),
+                where=n_relevant > 0,
+            )
+        return summarize(per_query)
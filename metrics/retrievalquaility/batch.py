@@ -0,0 +1,104 @@
+import math
+from typing import Dict, Iterable, NamedTuple, Sequence
+
+import numpy as np
+
+"""
+Helpers for the vectorised compute_batch methods of RecallTopK and nDCGTopK.
+
+retrieved_ids is either a 2-D integer array (integer-encoded IDs, negative values = padding)
+or a sequence of ranked ID lists of possibly different length (None = padding).
+relevant_ids holds one collection of relevant IDs per query.
+"""
+
+
+class BatchScores(NamedTuple):
+    # k -> score per query (shape [n_queries])
+    per_query: Dict[int, np.ndarray]
+    # k -> mean over all queries
+    mean: Dict[int, float]
+
+
+def _encode(
+    retrieved_ids,
+    relevant_ids: Sequence[Iterable],
+) -> tuple[np.ndarray, list[list[int]], int]:
+    """
+    Maps IDs to non-negative integer codes; -1 marks padding.
+    """
+    if isinstance(retrieved_ids, np.ndarray) and retrieved_ids.dtype.kind in "iu":
+        codes = retrieved_ids.astype(np.int64)
+        relevant = [[int(doc_id) for doc_id in rel] for rel in relevant_ids]
+        vocab_size = max(
+            int(codes.max(initial=-1)),
+            max((max(rel, default=-1) for rel in relevant), default=-1),
+        ) + 1
+        return np.where(codes < 0, -1, codes), relevant, vocab_size
+
+    vocab: Dict = {}
+    rows = [list(row) for row in retrieved_ids]
+    width = max((len(row) for row in rows), default=0)
+    codes = np.full((len(rows), width), -1, dtype=np.int64)
+    for i, row in enumerate(rows):
+        for j, doc_id in enumerate(row):
+            if doc_id is not None:
+                codes[i, j] = vocab.setdefault(doc_id, len(vocab))
+
+    # Relevante IDs, die nie abgerufen wurden, können keinen Treffer erzeugen
+    relevant = [[vocab[doc_id] for doc_id in rel if doc_id in vocab] for rel in relevant_ids]
+    return codes, relevant, len(vocab)
+
+
+def hit_matrix(retrieved_ids, relevant_ids: Sequence[Iterable]) -> np.ndarray:
+    """
+    Boolean matrix [n_queries, n_ranks]: True where the retrieved ID is relevant for that query.
+    """
+    codes, relevant, vocab_size = _encode(retrieved_ids, relevant_ids)
+    if codes.shape[0] != len(relevant):
+        raise ValueError("retrieved_ids and relevant_ids must have the same number of queries")
+
+    # (query, doc) pairs as a single int64 key, so membership is one np.isin call
+    query_index = np.arange(codes.shape[0], dtype=np.int64)[:, None]
+    keys = query_index * vocab_size + codes
+    relevant_keys = np.fromiter(
+        (i * vocab_size + code for i, rel in enumerate(relevant) for code in rel),
+        dtype=np.int64,
+    )
+    return np.isin(keys, relevant_keys) & (codes >= 0)
+
+
+def first_occurrence(retrieved_ids) -> np.ndarray:
+    """
+    Boolean matrix: True at the first position of each ID within its row (padding = False).
+    """
+    codes, _, _ = _encode(retrieved_ids, [[] for _ in range(len(retrieved_ids))])
+    order = np.argsort(codes, axis=1, kind="stable")
+    sorted_codes = np.take_along_axis(codes, order, axis=1)
+    first_sorted = np.ones_like(sorted_codes, dtype=bool)
+    first_sorted[:, 1:] = sorted_codes[:, 1:] != sorted_codes[:, :-1]
+    first = np.empty_like(first_sorted)
+    np.put_along_axis(first, order, first_sorted, axis=1)
+    return first & (codes >= 0)
+
+
+def discounts(n: int) -> np.ndarray:
+    """
+    1 / log2(rank + 1) for rank 1..n, computed with math.log2 like nDCGTopK._dcg.
+    """
+    return np.array([1 / math.log2(i + 1) for i in range(1, n + 1)], dtype=np.float64)
+
+
+def column_at(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Column for cut-off k (1-based) of a cumulative matrix; rows shorter than k use the last column.
+    """
+    if values.shape[1] == 0:
+        return np.zeros(values.shape[0], dtype=np.float64)
+    return values[:, min(k, values.shape[1]) - 1]
+
+
+def summarize(per_query: Dict[int, np.ndarray]) -> BatchScores:
+    return BatchScores(
+        per_query=per_query,
+        mean={k: float(scores.mean()) if len(scores) else 0.0 for k, scores in per_query.items()},
+    )
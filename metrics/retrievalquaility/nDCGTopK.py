@@ -1,5 +1,13 @@
 import math
-from typing import Iterable, Dict, Set
+from typing import Iterable, Dict, Optional, Sequence, Set
+
+import numpy as np
+
+try:
+    from metrics.retrievalquaility.batch import BatchScores, column_at, discounts, hit_matrix, summarize
+except (ModuleNotFoundError, ImportError):
+    # Fallback for direct execution from this directory (see test_rq.py)
+    from batch import BatchScores, column_at, discounts, hit_matrix, summarize
 
 """
 Computes nDCG on the Top-k retrieved documents. Class was initialially generated by ChatGPT and edited by github copilot
@@ -64,3 +72,40 @@ class nDCGTopK:
 
         # Step 4: Compute nDCG as ratio of DCG to ideal DCG (normalization)
         return dcg / ideal_dcg
+
+    def compute_batch(
+        self,
+        retrieved_ids,
+        relevant_ids: Sequence[Iterable[str]],
+        ks: Optional[Iterable[int]] = None,
+    ) -> BatchScores:
+        """
+        nDCG@K for many queries and several k values in one NumPy pass.
+        retrieved_ids: 2-D array of (integer-encoded) IDs or ranked lists per query.
+        Results are identical to compute() per query; ks defaults to [self.k].
+        """
+        ks = list(ks) if ks is not None else [self.k]
+        if any(k <= 0 for k in ks):
+            raise ValueError("k must be a positive integer")
+        relevant_ids = [set(rel) for rel in relevant_ids]
+
+        hits = hit_matrix(retrieved_ids, relevant_ids)
+        # Discount-Tabelle einmal vorberechnen; cumsum summiert sequentiell wie _dcg
+        discount = discounts(hits.shape[1])
+        dcg = np.cumsum(np.where(hits, discount, 0.0), axis=1)
+        n_hits = np.cumsum(hits, axis=1)
+
+        # Ideal-DCG wie in compute(): die relevanten Treffer der Top-k nach vorne sortiert,
+        # hängt also nur von ihrer Anzahl ab
+        ideal_table = np.concatenate([[0.0], np.cumsum(discount)])
+
+        per_query = {}
+        for k in ks:
+            ideal_dcg = ideal_table[column_at(n_hits, k).astype(np.int64)]
+            per_query[k] = np.divide(
+                column_at(dcg, k),
+                ideal_dcg,
+                out=np.zeros(len(ideal_dcg), dtype=np.float64),
+                where=ideal_dcg > 0,
+            )
+        return summarize(per_query)
@@ -0,0 +1,158 @@
+import argparse
+import csv
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Sequence, Set, Tuple
+
+import numpy as np
+
+try:
+    from metrics.retrievalquaility.MRRTopK import MRRTopK
+    from metrics.retrievalquaility.RecallTopK import RecallTopK
+    from metrics.retrievalquaility.nDCGTopK import nDCGTopK
+except (ModuleNotFoundError, ImportError):
+    # Fallback for direct execution from this directory (see test_rq.py)
+    from MRRTopK import MRRTopK
+    from RecallTopK import RecallTopK
+    from nDCGTopK import nDCGTopK
+
+"""
+Run files: retrieved rankings stored once, scored as often as needed.
+
+A run file is a TSV with header query_id, doc_id, rank, score, source (one row per hit,
+rank starting at 1). A qrels file is a TSV with header query_id, doc_id (relevant pairs).
+Metric sweeps (other k values, other cut-offs) then work on the files alone, without
+touching the embedding server or Qdrant. Hybrid evaluations store one run per source
+(dense, lexical); fuse_runs() recombines them with RRF, so other fusion weights or
+RRF constants can be tried without searching again.
+
+Usage:
+  python -m metrics.retrievalquaility.runs run.tsv qrels.tsv --k 1 5 10 50
+"""
+
+RUN_FIELDS = ("query_id", "doc_id", "rank", "score", "source")
+QRELS_FIELDS = ("query_id", "doc_id")
+
+
+class RunHit(NamedTuple):
+    doc_id: str
+    rank: int
+    score: float
+    source: str
+
+
+# query_id -> hits ordered by rank
+Run = Dict[str, List[RunHit]]
+# query_id -> relevant doc_ids
+Qrels = Dict[str, Set[str]]
+
+
+def write_run(path: str, run: Mapping[str, Sequence[RunHit]]) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        writer.writerow(RUN_FIELDS)
+        for query_id, hits in run.items():
+            for hit in hits:
+                # repr erhält den Score bitgenau
+                writer.writerow((query_id, hit.doc_id, hit.rank, repr(float(hit.score)), hit.source))
+
+
+def read_run(path: str) -> Run:
+    run: Run = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            run.setdefault(row["query_id"], []).append(
+                RunHit(row["doc_id"], int(row["rank"]), float(row["score"]), row["source"])
+            )
+    for hits in run.values():
+        hits.sort(key=lambda hit: hit.rank)
+    return run
+
+
+def write_qrels(path: str, qrels: Mapping[str, Iterable[str]]) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        writer.writerow(QRELS_FIELDS)
+        for query_id, doc_ids in qrels.items():
+            for doc_id in sorted(doc_ids):
+                writer.writerow((query_id, doc_id))
+
+
+def read_qrels(path: str) -> Qrels:
+    qrels: Qrels = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            qrels.setdefault(row["query_id"], set()).add(row["doc_id"])
+    return qrels
+
+
+def fuse_runs(
+    runs: Sequence[Mapping[str, Sequence[RunHit]]],
+    k: int = 60,
+    weights: Sequence[float] | None = None,
+    limit: int | None = None,
+) -> Run:
+    """
+    Weighted Reciprocal Rank Fusion over run files: score(d) = sum(w_i / (k + rank_i(d))).
+    Hits are merged by doc_id; ties keep the order of first appearance.
+    """
+    if weights is None:
+        weights = [1.0] * len(runs)
+    if len(weights) != len(runs):
+        raise ValueError(f"{len(weights)} weights for {len(runs)} runs")
+
+    fused: Run = {}
+    query_ids = list(dict.fromkeys(qid for run in runs for qid in run))
+    for qid in query_ids:
+        scores: Dict[str, float] = {}
+        for run, weight in zip(runs, weights):
+            for hit in run.get(qid, ()):
+                scores[hit.doc_id] = scores.get(hit.doc_id, 0.0) + weight / (k + hit.rank)
+        ordered = sorted(scores, key=scores.__getitem__, reverse=True)
+        if limit is not None:
+            ordered = ordered[:limit]
+        fused[qid] = [RunHit(doc_id, rank, scores[doc_id], "rrf") for rank, doc_id in enumerate(ordered, start=1)]
+    return fused
+
+
+def score_run(
+    run: Mapping[str, Sequence[RunHit]],
+    qrels: Mapping[str, Set[str]],
+    ks: Sequence[int],
+) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """
+    Scores every query in qrels (queries missing from the run count as empty rankings).
+    Returns the query_ids and, per metric (recall@k, ndcg@k, mrr@max(k)), the per-query scores
+    in that order.
+    """
+    query_ids = list(qrels)
+    k_max = max(ks)
+    retrieved = [[hit.doc_id for hit in run.get(qid, ())] for qid in query_ids]
+    relevant = [qrels[qid] for qid in query_ids]
+
+    recall = RecallTopK(k_max).compute_batch(retrieved, relevant, ks)
+    ndcg = nDCGTopK(k_max).compute_batch(retrieved, relevant, ks)
+    mrr = MRRTopK(k_max)
+
+    scores: Dict[str, np.ndarray] = {}
+    scores.update({f"recall@{k}": recall.per_query[k] for k in ks})
+    scores.update({f"ndcg@{k}": ndcg.per_query[k] for k in ks})
+    scores[f"mrr@{k_max}"] = np.array(
+        [mrr.compute(ids, rel) for ids, rel in zip(retrieved, relevant)], dtype=np.float64
+    )
+    return query_ids, scores
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score a run file against qrels")
+    parser.add_argument("run")
+    parser.add_argument("qrels")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    args = parser.parse_args()
+
+    query_ids, scores = score_run(read_run(args.run), read_qrels(args.qrels), sorted(args.k))
+    print(f"{len(query_ids)} queries")
+    for name, values in scores.items():
+        print(f"{name:<12}{values.mean() if len(values) else 0.0:.4f}")
+
+
+if __name__ == "__main__":
+    main()
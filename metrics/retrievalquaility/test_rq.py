@@ -5,11 +5,73 @@ try:
 	# Prefer package-style import when run from project root or as a module
 	from metrics.retrievalquaility.RecallTopK import RecallTopK
 	from metrics.retrievalquaility.nDCGTopK import nDCGTopK
+	from metrics.retrievalquaility.MRRTopK import MRRTopK
 except (ModuleNotFoundError, ImportError):
 	# Fallback for direct execution (`./test_rq.py`) where the script's
 	# directory is on sys.path: import local modules by filename.
 	from RecallTopK import RecallTopK
 	from nDCGTopK import nDCGTopK
+	from MRRTopK import MRRTopK
+
+
+def test_compute_batch_matches_scalar() -> None:
+	import random
+
+	rnd = random.Random(0)
+	retrieved = [[f"doc{rnd.randrange(20)}" for _ in range(rnd.randrange(0, 15))] for _ in range(300)]
+	relevant = [{f"doc{rnd.randrange(20)}" for _ in range(rnd.randrange(0, 4))} for _ in range(300)]
+	ks = [1, 3, 5, 10, 20]
+
+	for metric in (RecallTopK, nDCGTopK):
+		batch = metric(k=5).compute_batch(retrieved, relevant, ks)
+		for k in ks:
+			scalar = [metric(k=k).compute(r, rel) for r, rel in zip(retrieved, relevant)]
+			assert batch.per_query[k].tolist() == scalar
+			assert abs(batch.mean[k] - sum(scalar) / len(scalar)) < 1e-12
+
+
+def test_score_run_from_files(tmp_path) -> None:
+	try:
+		from metrics.retrievalquaility.runs import RunHit, read_qrels, read_run, score_run, write_qrels, write_run
+	except (ModuleNotFoundError, ImportError):
+		from runs import RunHit, read_qrels, read_run, score_run, write_qrels, write_run
+
+	run = {
+		"q1": [RunHit("doc3", 1, 0.9, "kb"), RunHit("doc1", 2, 0.8, "kb")],
+		"q2": [RunHit("doc5", 1, 0.7, "kb")],
+	}
+	qrels = {"q1": {"doc1"}, "q2": {"doc9"}, "q3": {"doc2"}}
+	write_run(str(tmp_path / "run.tsv"), run)
+	write_qrels(str(tmp_path / "qrels.tsv"), qrels)
+
+	assert read_run(str(tmp_path / "run.tsv")) == run
+	query_ids, scores = score_run(read_run(str(tmp_path / "run.tsv")), read_qrels(str(tmp_path / "qrels.tsv")), [1, 2])
+	assert query_ids == ["q1", "q2", "q3"]
+	assert scores["recall@1"].tolist() == [0.0, 0.0, 0.0]
+	assert scores["recall@2"].tolist() == [1.0, 0.0, 0.0]
+	assert scores["mrr@2"].tolist() == [0.5, 0.0, 0.0]
+
+
+
+def test_fuse_runs_weighted_rrf() -> None:
+	try:
+		from metrics.retrievalquaility.runs import RunHit, fuse_runs
+	except (ModuleNotFoundError, ImportError):
+		from runs import RunHit, fuse_runs
+
+	dense = {"q1": [RunHit("doc1", 1, 0.9, "dense"), RunHit("doc2", 2, 0.8, "dense")]}
+	lexical = {
+		"q1": [RunHit("doc2", 1, 7.0, "lexical"), RunHit("doc3", 2, 5.0, "lexical")],
+		"q2": [RunHit("doc4", 1, 3.0, "lexical")],
+	}
+
+	fused = fuse_runs([dense, lexical], k=1)
+	assert [hit.doc_id for hit in fused["q1"]] == ["doc2", "doc1", "doc3"]
+	assert fused["q1"][0] == RunHit("doc2", 1, 1 / 3 + 1 / 2, "rrf")
+	assert [hit.doc_id for hit in fused["q2"]] == ["doc4"]
+
+	dense_heavy = fuse_runs([dense, lexical], k=1, weights=[4.0, 1.0], limit=1)
+	assert [hit.doc_id for hit in dense_heavy["q1"]] == ["doc1"]
 
 
 def main() -> None:
@@ -18,9 +80,15 @@ def main() -> None:
 
 	recall = RecallTopK(k=5)
 	ndcg = nDCGTopK(k=5)
+	mrr = MRRTopK(k=5)
 
 	print("Recall:", recall.compute(retrieved, relevant))
 	print("nDCG:", ndcg.compute(retrieved, relevant))
+	print("MRR:", mrr.compute(retrieved, relevant))
+
+	batch = ndcg.compute_batch([retrieved], [relevant], ks=[1, 5, 10])
+	print("nDCG@1/5/10 (batch):", batch.mean)
+	test_compute_batch_matches_scalar()
 
 
 if __name__ == "__main__":